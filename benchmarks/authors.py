@@ -0,0 +1,38 @@
+"""
+authors() on large-collaboration records: OpenURLs with 1,000 rft.au
+entries plus 1,000 positional aulast/aufirst pairs.
+"""
+
+import urllib
+
+from bibjsontools.openurl import OpenURLParser
+
+from benchmarks import timed
+
+AUTHORS = 1000
+RECORDS = 200
+
+
+def big_query(n):
+    parts = [u'rft.genre=article&rft.atitle=Observation+of+a+new+particle']
+    for i in range(n):
+        parts.append(u'rft.au=%s' % urllib.quote_plus('Author%d, A' % i))
+        parts.append(u'rft.aulast=Last%d&rft.aufirst=First%d' % (i, i))
+    return u'&'.join(parts)
+
+
+def main():
+    query = big_query(AUTHORS)
+    parser = OpenURLParser(query)
+    assert len(parser.authors()) == 2 * AUTHORS
+
+    def run():
+        for i in range(RECORDS):
+            parser.load(query)
+            parser.authors()
+
+    timed('authors() x %d authors' % AUTHORS, run, RECORDS)
+
+
+if __name__ == '__main__':
+    main()
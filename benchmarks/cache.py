@@ -0,0 +1,31 @@
+"""
+Repetitive resolver traffic with and without ParseCache.
+"""
+
+from bibjsontools.cache import ParseCache
+from bibjsontools.openurl import from_openurl
+
+from benchmarks import corpus, timed
+
+SIZE = 20000
+
+
+def main():
+    queries = corpus(SIZE)
+    cache = ParseCache(maxsize=1000)
+
+    def uncached():
+        for q in queries:
+            from_openurl(q)
+
+    def cached():
+        for q in queries:
+            cache.from_openurl(q)
+
+    base = timed('from_openurl', uncached, SIZE)
+    fast = timed('ParseCache.from_openurl', cached, SIZE)
+    print 'speedup: %.2fx  %r' % (base / fast, cache.stats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Tabulate 100k queries for reporting: parse to BibJSON and pull the report
+columns out of each dict, against parse_columns() filling the columns
+directly.
+"""
+
+from StringIO import StringIO
+
+from bibjsontools.columns import COLUMNS, parse_columns
+from bibjsontools.openurl import parse_many
+
+from benchmarks import corpus, timed
+
+SIZE = 100000
+
+
+def _row(bib):
+    ids = dict((i['type'], i['id']) for i in reversed(bib.get('identifier', [])))
+    return (bib['type'], bib.get('year'), bib.get('journal', {}).get('name'),
+            ids.get('issn'), ids.get('doi'), bib.get('_rfr'))
+
+
+def main():
+    queries = corpus(SIZE)
+
+    def per_record():
+        rows = [_row(bib) for bib in parse_many(queries, openurl=False)]
+        assert len(rows) == SIZE
+
+    def columnar():
+        batch = parse_columns(queries, COLUMNS)
+        batch.counts('journal')
+        batch.write_csv(StringIO())
+
+    base = timed('parse + dict rows', per_record, SIZE)
+    fast = timed('parse_columns + csv', columnar, SIZE)
+    print 'speedup: %.2fx' % (base / fast)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Reprocessing a log with DiskParseCache: a cold run that fills the cache,
+then a warm re-run, against parsing every line.  The log has 100k lines
+drawn from 20k distinct queries.
+"""
+
+import os
+import random
+import shutil
+import tempfile
+
+from bibjsontools.diskcache import DiskParseCache
+from bibjsontools.openurl import parse_many
+
+from benchmarks import timed
+from benchmarks.synthetic import synthetic_corpus
+
+SIZE = 100000
+DISTINCT = 20000
+
+
+def main():
+    distinct = synthetic_corpus(DISTINCT)
+    rand = random.Random(0)
+    lines = [rand.choice(distinct) for i in range(SIZE)]
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, 'cache.sqlite')
+
+    def plain():
+        for bib in parse_many(lines):
+            pass
+
+    def cached():
+        with DiskParseCache(path) as cache:
+            for bib in cache.parse_many(lines):
+                pass
+            print '  %(hits)d hits, %(misses)d misses, %(size)d stored' % cache.stats
+
+    try:
+        base = timed('parse_many', plain, SIZE)
+        cold = timed('DiskParseCache cold', cached, SIZE)
+        warm = timed('DiskParseCache warm', cached, SIZE)
+        print 'cache file: %.1f MB' % (os.path.getsize(path) / 1048576.0)
+        print 'speedup: %.2fx cold, %.2fx warm' % (base / cold, base / warm)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Local load generator for ResolverFrontEnd.  Sends bursts of queries without
+blocking, as a web server would under bursty traffic, and reports request
+latency percentiles and how many requests were turned away.
+"""
+
+import time
+from Queue import Full
+
+from bibjsontools.frontend import ResolverFrontEnd
+
+from benchmarks import corpus
+
+REQUESTS = 20000
+BURST = 500
+#Pause between bursts, in seconds.
+INTERVAL = 0.02
+
+
+def run(mode, workers, max_pending):
+    frontend = ResolverFrontEnd(workers=workers, mode=mode,
+                                max_pending=max_pending, openurl=False)
+    queries = corpus(REQUESTS)
+    pending = []
+    start = time.time()
+    try:
+        for i in range(0, REQUESTS, BURST):
+            for query in queries[i:i + BURST]:
+                try:
+                    pending.append(frontend.submit(query, block=False))
+                except Full:
+                    pass
+            time.sleep(INTERVAL)
+        for p in pending:
+            p.get()
+    finally:
+        frontend.close()
+    elapsed = time.time() - start
+    m = frontend.metrics.snapshot()
+    print '%-8s workers=%d pending<=%-5d %6.0f req/sec  p50 %6.1fms  p90 %6.1fms  p99 %6.1fms  rejected %d' % (
+        mode, workers, max_pending, m['completed'] / elapsed,
+        m['p50'] * 1000, m['p90'] * 1000, m['p99'] * 1000, m['rejected'])
+
+
+def main():
+    for mode in ('thread', 'process'):
+        for max_pending in (64, 1024):
+            run(mode, 2, max_pending)
+
+
+if __name__ == '__main__':
+    main()
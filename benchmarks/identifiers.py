@@ -0,0 +1,52 @@
+"""
+classify_identifier against the startswith chain identifiers() used to run
+for each value.
+"""
+
+from bibjsontools.openurl import classify_identifier
+
+from benchmarks import timed
+
+SIZE = 200000
+
+VALUES = [
+    u'info:doi/10.1039/b814549k',
+    u'doi:10.1007/978-3-540-89330-1_22',
+    u'info:pmid/1757671',
+    u'pmid:18539564',
+    u'urn:ISBN:9781429233231',
+    u'info:sid/Brown-Vufind',
+    u'info:oclcnum/43287739',
+    u'doi:',
+]
+
+
+def startswith_chain(v):
+    if v.startswith('info:doi/'):
+        return ('doi', 'doi:%s' % v[9:])
+    elif v.startswith('doi:'):
+        return ('doi', v)
+    elif v.startswith('info:pmid/'):
+        return ('pmid', v)
+    elif v.startswith('pmid'):
+        return ('pmid', 'info:%s' % v.replace(':', '/'))
+    return
+
+
+def main():
+    values = [VALUES[i % len(VALUES)] for i in range(SIZE)]
+
+    def chain():
+        for v in values:
+            startswith_chain(v)
+
+    def classifier():
+        for v in values:
+            classify_identifier(v)
+
+    timed('startswith chain (doi/pmid)', chain, SIZE)
+    timed('classify_identifier (all)', classifier, SIZE)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""
+Index and dedupe parsed records.  Each fixture is repeated with distinct
+DOIs so the index grows with the corpus; throughput should stay flat as
+SIZE goes up since inserts never compare records pairwise.
+"""
+
+from bibjsontools.index import BibIndex
+from bibjsontools.openurl import parse_many
+
+from benchmarks import timed
+
+SIZES = (10000, 100000, 500000)
+
+TEMPLATE = u'genre=article&issn=1757-9694&volume=%d&issue=1&spage=30&id=doi:10.1000/%d&atitle=Paper'
+
+
+def main():
+    for size in SIZES:
+        #Every other record repeats the previous DOI.
+        queries = [TEMPLATE % (i // 2, i // 2) for i in range(size)]
+        records = list(parse_many(queries, openurl=False))
+        index = BibIndex()
+
+        def run():
+            for i, bib in enumerate(records):
+                index.add(i, bib)
+
+        timed('BibIndex.add %d' % size, run, size)
+        assert len(list(index.clusters())) == (size + 1) // 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+Cost of instrumentation: parse a synthetic corpus with instrumentation
+never enabled, enabled, and enabled then disabled again, and print the
+per-stage breakdown.  Each case is run REPEAT times and the best kept.
+"""
+
+from bibjsontools import instrument
+from bibjsontools.openurl import parse_many
+
+from benchmarks import timed
+from benchmarks.synthetic import synthetic_corpus
+
+SIZE = 20000
+REPEAT = 3
+
+
+def main():
+    queries = synthetic_corpus(SIZE)
+
+    def run():
+        for bib in parse_many(queries):
+            pass
+
+    def best(label):
+        return min(timed(label, run, SIZE) for i in range(REPEAT))
+
+    base = best('not instrumented')
+    stats = instrument.enable()
+    on = best('instrumented')
+    instrument.disable()
+    off = best('enabled then disabled')
+    print 'overhead enabled: %+.1f%%, after disable: %+.1f%%' % (
+        100 * (on / base - 1), 100 * (off / base - 1))
+    print stats.report()
+
+
+if __name__ == '__main__':
+    main()
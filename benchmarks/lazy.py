@@ -0,0 +1,36 @@
+"""
+Cost of regenerating _openurl: eager, lazy (read for 1 in 10 records) and
+left out entirely.
+"""
+
+from bibjsontools.openurl import parse_many
+
+from benchmarks import corpus, timed
+
+SIZE = 20000
+
+
+def main():
+    queries = corpus(SIZE)
+
+    def eager():
+        for bib in parse_many(queries):
+            pass
+
+    def lazy():
+        for i, bib in enumerate(parse_many(queries, openurl='lazy')):
+            if i % 10 == 0:
+                bib['_openurl']
+
+    def omitted():
+        for bib in parse_many(queries, openurl=False):
+            pass
+
+    base = timed('eager _openurl', eager, SIZE)
+    for label, func in (('lazy, 10% read', lazy), ('no _openurl', omitted)):
+        elapsed = timed(label, func, SIZE)
+        print '  saving: %.0f%%' % (100 * (1 - elapsed / base))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Count key lookups made against the parsed query per record, next to the
+count when each field's alias list is probed in turn as before
+ALIAS_INDEX, and time parse() over already-tokenized fixtures so parse_qs
+is left out.
+"""
+
+from urlparse import parse_qs
+
+from bibjsontools.openurl import KEY_ALIASES, OpenURLParser
+
+from benchmarks import QUERIES, corpus, timed
+
+SIZE = 20000
+
+
+class CountingDict(dict):
+    """
+    dict that counts every key probe, including iteration.
+    """
+    probes = 0
+
+    def get(self, k, default=None):
+        CountingDict.probes += 1
+        return dict.get(self, k, default)
+
+    def __getitem__(self, k):
+        CountingDict.probes += 1
+        return dict.__getitem__(self, k)
+
+    def iteritems(self):
+        for k, v in dict.iteritems(self):
+            CountingDict.probes += 1
+            yield k, v
+
+
+class AliasScanParser(OpenURLParser):
+    """
+    Parser that reads each field by probing its alias list in the query
+    dict, as parse() did before ALIAS_INDEX.
+    """
+
+    def _field(self, field):
+        return self._find_key(KEY_ALIASES[field])
+
+    def _field_values(self, field):
+        return list(self._find_repeating_key(KEY_ALIASES[field]))
+
+    def _field_items(self, field):
+        return self._find_key_values(KEY_ALIASES[field])
+
+
+def lookups_per_record(parser_class, count_load=True):
+    total = 0
+    for q in QUERIES:
+        CountingDict.probes = 0
+        parser = parser_class('', query_dict=CountingDict(parse_qs(q)))
+        if not count_load:
+            #The alias scan doesn't need the slotting pass load() makes.
+            CountingDict.probes = 0
+        parser.parse()
+        total += CountingDict.probes
+    return total / float(len(QUERIES))
+
+
+def main():
+    print 'key lookups per record: %.1f (alias scan: %.1f)' % (
+        lookups_per_record(OpenURLParser),
+        lookups_per_record(AliasScanParser, count_load=False))
+
+    dicts = [parse_qs(q) for q in corpus(SIZE)]
+
+    def run():
+        for d in dicts:
+            OpenURLParser('', query_dict=d).parse()
+
+    def identifiers_only():
+        for d in dicts:
+            OpenURLParser('', query_dict=d).parse_fields(['identifier'])
+
+    timed('OpenURLParser.parse', run, SIZE)
+    timed('parse_fields identifier', identifiers_only, SIZE)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Memory held by parsed records: plain BibJSON dicts against BibRecord, each
+with and without a shared InternPool.  Each case is built in its own process
+and measured by the growth in peak resident size, since tracemalloc isn't
+available on Python 2.
+
+    python -m benchmarks.memory [size]
+"""
+
+import resource
+import sys
+from multiprocessing import Process, Queue
+
+from bibjsontools.openurl import parse_many
+from bibjsontools.pool import InternPool
+from bibjsontools.record import BibRecord
+
+from benchmarks import corpus, timed
+
+SIZE = 1000000
+
+CASES = [
+    ('dict', None, False),
+    ('dict + InternPool', None, True),
+    ('BibRecord', BibRecord, False),
+    ('BibRecord + InternPool', BibRecord, True),
+]
+
+
+def _rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(queue, label, size, record_class, shared):
+    queries = corpus(size)
+    pool = InternPool() if shared else None
+    before = _rss_kb()
+    held = []
+
+    def run():
+        held.extend(parse_many(queries, openurl=False,
+                               record_class=record_class, pool=pool))
+
+    timed(label, run, size)
+    queue.put((_rss_kb() - before, pool.stats['hit_rate'] if pool else None))
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else SIZE
+    base = None
+    for label, record_class, shared in CASES:
+        queue = Queue()
+        proc = Process(target=_measure, args=(queue, label, size, record_class, shared))
+        proc.start()
+        kb, hit_rate = queue.get()
+        proc.join()
+        if base is None:
+            base = kb
+        print '%-30s %8.0f MB %10.0f bytes/record %6.0f%% less' % (
+            label, kb / 1024.0, kb * 1024.0 / size, 100.0 * (base - kb) / base)
+        if hit_rate is not None:
+            print '%-30s %8.1f%% pool hit rate' % ('', 100 * hit_rate)
+
+
+if __name__ == '__main__':
+    main()
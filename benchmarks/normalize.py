@@ -0,0 +1,38 @@
+"""
+Normalizing raw date, volume and page columns record by record against
+BatchNormalizer with its memo tables.
+"""
+
+from bibjsontools.normalize import (BatchNormalizer, normalize_date,
+                                    normalize_pages, normalize_volume,
+                                    raw_columns)
+
+from benchmarks import timed
+from benchmarks.synthetic import synthetic_corpus
+
+SIZE = 200000
+
+
+def main():
+    raw = raw_columns(synthetic_corpus(SIZE))
+    rows = zip(raw['date'], raw['volume'], raw['spage'], raw['epage'], raw['pages'])
+    print 'distinct dates %d, volumes %d, page triples %d' % (
+        len(set(raw['date'])), len(set(raw['volume'])),
+        len(set(zip(raw['spage'], raw['epage'], raw['pages']))))
+
+    def per_record():
+        for date, volume, spage, epage, pages in rows:
+            normalize_date(date)
+            normalize_volume(volume)
+            normalize_pages(spage, epage, pages)
+
+    def batched():
+        BatchNormalizer().normalize(**raw)
+
+    base = timed('per record', per_record, SIZE)
+    fast = timed('BatchNormalizer', batched, SIZE)
+    print 'speedup: %.2fx' % (base / fast)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Bulk outbound OpenURL generation: the previous dict-then-quote_plus
+serializer, kept here as the baseline, against to_openurl and
+write_openurls into a buffer.
+"""
+
+import urllib
+from cStringIO import StringIO
+
+from bibjsontools.openurl import from_openurl, to_openurl, write_openurls
+
+from benchmarks import timed
+from benchmarks.synthetic import synthetic_corpus
+
+SIZE = 50000
+
+
+def legacy_to_openurl(bib):
+    out = {}
+    out['ctx_ver'] = 'Z39.88-2004'
+    btype = bib['type']
+    title = bib.get('title')
+    if (btype == 'article'):
+        out['rft_val_fmt'] = 'info:ofi/fmt:kev:mtx:journal'
+        out['rft.atitle'] = title
+        jrnl = bib.get('journal', {})
+        out['rft.jtitle'] = jrnl.get('name', '')
+        out['rft.stitle'] = jrnl.get('shortcode')
+        out['rft.genre'] = 'article'
+    elif (btype == 'book') or (btype == 'inbook'):
+        out['rft_val_fmt'] = 'info:ofi/fmt:kev:mtx:book'
+        out['rft.btitle'] = title
+        out['rft.genre'] = 'book'
+        if btype == 'inbook':
+            out['rft.genre'] = 'bookitem'
+            jrnl = bib.get('journal', {})
+            out['rft.btitle'] = jrnl.get('name')
+            out['title'] = jrnl.get('name')
+            out['rft.atitle'] = bib.get('title', 'unknown')
+    elif (btype == 'dissertation'):
+        out['rft.genre'] = 'dissertation'
+        out['rft.title'] = bib.get('title')
+    else:
+        out['rft.genre'] = 'unknown'
+        out['rft.title'] = bib.get('title')
+        jrnl = bib.get('journal', {})
+        out['rft.jtitle'] = jrnl.get('name')
+        out['rft.stitle'] = jrnl.get('shortcode')
+    out['rfr_id'] = "info:sid/%s" % (bib.get('_rfr', ''))
+    out['rft.date'] = bib.get('year', '')[:4]
+    for auth in bib.get('author', []):
+        full = auth.get('name')
+        last = auth.get('lastname')
+        if full:
+            out['rft.au'] = full
+        elif last:
+            out['rft.aulast'] = last
+    out['rft.volume'] = bib.get('volume')
+    out['rft.issue'] = bib.get('issue')
+    out['rft.spage'] = bib.get('start_page')
+    out['rft.end_page'] = bib.get('end_page')
+    out['rft.pages'] = bib.get('pages')
+    out['rft.pub'] = bib.get('publisher')
+    out['rft.place'] = bib.get('place_of_publication')
+    for idt in bib.get('identifier', []):
+        if idt['type'] in ('issn', 'isbn', 'eissn'):
+            out['rft.' + idt['type']] = idt['id']
+        elif idt['type'] == 'doi':
+            out['rft_id'] = 'info:doi/%s' % idt['id'].strip('doi:')
+        elif idt['type'] == 'oclc':
+            out['rft_id'] = 'http://www.worldcat.org/oclc/%s' % idt['id']
+    for k, v in out.items():
+        if not v:
+            del out[k]
+    kevs = []
+    for k, v in out.iteritems():
+        if isinstance(v, unicode):
+            v = v.encode('utf-8', 'ignore')
+        kevs.append('%s=%s' % (urllib.quote_plus(k, safe='/'), urllib.quote_plus(v, safe='/')))
+    return '&'.join(kevs)
+
+
+def main():
+    records = [from_openurl(q, openurl=False) for q in synthetic_corpus(SIZE)]
+
+    def legacy():
+        buf = StringIO()
+        for bib in records:
+            buf.write(legacy_to_openurl(bib))
+            buf.write('\n')
+
+    def joined():
+        buf = StringIO()
+        for bib in records:
+            buf.write(to_openurl(bib))
+            buf.write('\n')
+
+    def buffered():
+        write_openurls(records, StringIO(), base='http://resolver.example.edu/openurl')
+
+    base = timed('legacy serializer', legacy, SIZE)
+    fast = timed('to_openurl', joined, SIZE)
+    buf = timed('write_openurls', buffered, SIZE)
+    print 'speedup: %.2fx to_openurl, %.2fx write_openurls' % (base / fast, base / buf)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Throughput of count_works with exact and sketched shards at increasing
+worker counts.  The log has 100k requests for 20k distinct works with a
+skewed popularity.  Scaling is bounded by the cores available.
+"""
+
+import multiprocessing
+import random
+
+from bibjsontools.popular import count_works
+
+from benchmarks import timed
+from benchmarks.synthetic import synthetic_corpus
+
+SIZE = 100000
+DISTINCT = 20000
+WORKERS = (1, 2, 4)
+
+
+def main():
+    distinct = synthetic_corpus(DISTINCT)
+    rand = random.Random(0)
+    queries = [distinct[min(int(rand.paretovariate(0.8)), DISTINCT) - 1]
+               for i in range(SIZE)]
+    print 'cores: %d' % multiprocessing.cpu_count()
+    exact = None
+    for sketch in (None, 1000):
+        for workers in WORKERS:
+            label = '%s, %d worker%s' % ('sketch 1000' if sketch else 'exact', workers,
+                                         's' if workers > 1 else '')
+            result = []
+            timed(label, lambda: result.append(
+                count_works(queries, workers=workers, sketch_size=sketch)[0]), SIZE)
+            if not sketch:
+                exact = result[0]
+        top = [k for k, n in result[0].most_common(20)]
+        print '  top 20 matches exact: %s' % (top == [k for k, n in exact.most_common(20)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Export records as RIS: per-record convert() concatenated into one string,
+against streaming 100k records with write_ris.  Concatenating unicode is
+quadratic, so the baseline only runs over a slice of the records.
+"""
+
+import os
+import tempfile
+
+from bibjsontools import ris
+from bibjsontools.openurl import parse_many
+
+from benchmarks import QUERIES, timed
+
+SIZE = 100000
+BASELINE_SIZE = 5000
+
+
+def main():
+    fixtures = list(parse_many(QUERIES, openurl=False))
+    records = [fixtures[i % len(fixtures)] for i in range(SIZE)]
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+
+    def concatenated():
+        out = ''
+        for bib in records[:BASELINE_SIZE]:
+            out += ris.convert(bib) + 'ER  - \n'
+        f = open(path, 'wb')
+        f.write(out.encode('utf-8'))
+        f.close()
+
+    def streamed():
+        f = open(path, 'wb')
+        ris.write_ris(iter(records), f)
+        f.close()
+
+    try:
+        base = timed('convert + concatenate', concatenated, BASELINE_SIZE)
+        fast = timed('write_ris', streamed, SIZE)
+        print 'per-record speedup: %.2fx' % ((base / BASELINE_SIZE) / (fast / SIZE))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
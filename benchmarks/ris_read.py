@@ -0,0 +1,49 @@
+"""
+Read a 100k record RIS export: streaming with read_ris straight from the
+file, against reading the whole file into memory first.
+"""
+
+import os
+import tempfile
+
+from bibjsontools import ris
+from bibjsontools.openurl import parse_many
+
+from benchmarks import QUERIES, timed
+
+SIZE = 100000
+
+
+def main():
+    fixtures = list(parse_many(QUERIES, openurl=False))
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    f = open(path, 'wb')
+    ris.write_ris((fixtures[i % len(fixtures)] for i in range(SIZE)), f)
+    f.close()
+    held = {}
+
+    def upfront():
+        f = open(path, 'rb')
+        lines = f.read().splitlines(True)
+        f.close()
+        held['upfront'] = sum(len(l) for l in lines)
+        for bib in ris.read_ris(lines):
+            pass
+
+    def streamed():
+        f = open(path, 'rb')
+        for bib in ris.read_ris(f):
+            pass
+        f.close()
+
+    try:
+        timed('read whole file', upfront, SIZE)
+        timed('read_ris streaming', streamed, SIZE)
+        print 'bytes held up front: %d, streaming holds one record' % held['upfront']
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Pre-filtering a mixed web server log with LogScanner against decoding
+every line in Python before deciding whether to parse it.  One line in
+ten is a resolver hit.  Filtering rates without parsing are given for the
+decoding loop and for scanning plain and gzipped copies of the log.
+"""
+
+import gzip
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from bibjsontools.openurl import from_openurl
+from bibjsontools.scan import LogScanner
+
+from benchmarks import timed
+from benchmarks.synthetic import synthetic_corpus
+
+SIZE = 200000
+HITS = 20000
+
+NOISE = ('/static/site.css', '/images/logo.png', '/search?q=history+of+europe&page=2',
+         '/account/login?next=%2Fhome', '/catalog/record/1234567?format=full')
+
+
+def write_log(path):
+    rand = random.Random(0)
+    queries = iter(synthetic_corpus(HITS))
+    lines = []
+    for i in range(SIZE):
+        if i % (SIZE // HITS) == 0:
+            target = '/openurl?' + next(queries).encode('utf-8')
+        else:
+            target = rand.choice(NOISE)
+        lines.append('10.0.%d.%d - - [01/Mar/2014:10:00:00 -0500] "GET %s HTTP/1.1" 200 %d "-" '
+                     '"Mozilla/5.0 (X11; Linux x86_64)"\n' % (
+                         rand.randint(0, 255), rand.randint(0, 255), target,
+                         rand.randint(100, 90000)))
+    with open(path, 'wb') as f:
+        f.writelines(lines)
+    with open(path, 'rb') as f:
+        handle = gzip.open(path + '.gz', 'wb')
+        handle.write(f.read())
+        handle.close()
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, 'access.log')
+    try:
+        write_log(path)
+        size = os.path.getsize(path)
+        print 'log: %d lines, %.1f MB, %d OpenURL hits' % (SIZE, size / 1e6, HITS)
+
+        def decode_all():
+            for line in open(path, 'rb'):
+                line = line.decode('utf-8')
+                if (u'ctx_ver=' in line) or (u'rft.' in line) or (u'genre=' in line):
+                    query = line.split(u'?', 1)[1].split(u' ', 1)[0]
+                    from_openurl(query)
+
+        def scanned():
+            for bib in LogScanner().parse([path]):
+                pass
+
+        base = timed('decode every line', decode_all, SIZE)
+        fast = timed('LogScanner.parse', scanned, SIZE)
+        print 'speedup: %.2fx' % (base / fast)
+
+        start = time.time()
+        found = 0
+        for line in open(path, 'rb'):
+            line = line.decode('utf-8')
+            if (u'ctx_ver=' in line) or (u'rft.' in line) or (u'genre=' in line):
+                found += 1
+        elapsed = time.time() - start
+        print '%-30s %8.3fs %10.1f MB/sec  %d queries' % (
+            'filter only, decoding', elapsed, size / elapsed / 1e6, found)
+        for label, source in (('scan only, mmap', path), ('scan only, gzip', path + '.gz')):
+            scanner = LogScanner()
+            start = time.time()
+            found = sum(1 for q in scanner.queries([source]))
+            elapsed = time.time() - start
+            print '%-30s %8.3fs %10.1f MB/sec  %d queries' % (
+                label, elapsed, scanner.bytes_scanned / elapsed / 1e6, found)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
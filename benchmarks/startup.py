@@ -0,0 +1,72 @@
+"""
+Import time budget for short-lived workers.
+
+Python 2 has no -X importtime, so each import is timed in a fresh
+interpreter, taking the median of several runs less the median of a bare
+interpreter start.  Exits non-zero when an import goes over its budget:
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --scale 2    #allow a slow machine twice the budget
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 15
+
+#Milliseconds over a bare interpreter start.
+BUDGETS = [
+    ('import bibjsontools', 2),
+    ('from bibjsontools import from_openurl', 25),
+    ('import bibjsontools.ris', 25),
+    ('import bibjsontools.cli', 60),
+    ('import bibjsontools.normalize', 40),
+]
+
+
+def _median_ms(code, runs):
+    times = []
+    for i in range(runs):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', code], cwd=ROOT)
+        times.append(time.time() - start)
+    times.sort()
+    return times[len(times) // 2] * 1000
+
+
+def run(runs=RUNS):
+    """
+    List of (statement, milliseconds, budget).
+    """
+    #Make sure .pyc files are written before timing.
+    for statement, budget in BUDGETS:
+        subprocess.check_call([sys.executable, '-c', statement], cwd=ROOT)
+    base = _median_ms('pass', runs)
+    return [(statement, max(_median_ms(statement, runs) - base, 0.0), budget)
+            for statement, budget in BUDGETS]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check import times against budgets.')
+    parser.add_argument('--runs', type=int, default=RUNS)
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiply every budget by this (default 1)')
+    args = parser.parse_args(argv)
+    over = []
+    for statement, ms, budget in run(args.runs):
+        budget *= args.scale
+        line = '%-40s %7.1f ms  budget %5.1f ms' % (statement, ms, budget)
+        if ms > budget:
+            over.append(statement)
+            line += '  OVER'
+        print line
+    if over:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
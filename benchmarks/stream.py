@@ -0,0 +1,29 @@
+"""
+Compare one-call-per-query parsing with the parse_many generator.
+"""
+
+from bibjsontools.openurl import from_openurl, parse_many
+
+from benchmarks import corpus, timed
+
+SIZE = 20000
+
+
+def main():
+    queries = corpus(SIZE)
+
+    def per_call():
+        for q in queries:
+            from_openurl(q)
+
+    def streamed():
+        for bib in parse_many(queries):
+            pass
+
+    base = timed('from_openurl loop', per_call, SIZE)
+    fast = timed('parse_many', streamed, SIZE)
+    print 'speedup: %.2fx' % (base / fast)
+
+
+if __name__ == '__main__':
+    main()
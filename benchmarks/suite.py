@@ -0,0 +1,154 @@
+"""
+Benchmark suite for the core conversions over a synthetic corpus.
+
+For from_openurl, BibJSONToOpenURL.parse and ris.convert, reports
+records/sec, p50/p99 per-record latency and allocation cost.  Results can
+be saved as JSON and compared with an earlier run:
+
+    python -m benchmarks.suite --save before.json
+    python -m benchmarks.suite --compare before.json
+
+Comparing exits non-zero when a conversion's throughput has dropped by
+more than --threshold.
+
+Allocation cost is the tracemalloc peak where tracemalloc exists.  Python 2
+has no allocation tracing, so there it is the number of gc-tracked objects
+each conversion leaves alive, i.e. the containers in its result.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from bibjsontools import ris
+from bibjsontools.frontend import percentile
+from bibjsontools.openurl import BibJSONToOpenURL, from_openurl
+
+from benchmarks.synthetic import synthetic_corpus
+
+SIZE = 20000
+#Records used for the allocation measurement.
+ALLOC_SAMPLE = 2000
+
+CONVERSIONS = [
+    ('from_openurl', lambda q: from_openurl(q)),
+    ('BibJSONToOpenURL.parse', lambda bib: BibJSONToOpenURL(bib).parse()),
+    ('ris.convert', lambda bib: ris.convert(bib)),
+]
+
+
+def _inputs(name, queries, bibs):
+    return queries if name == 'from_openurl' else bibs
+
+
+def _latencies(func, inputs):
+    timer = time.time
+    out = []
+    append = out.append
+    for item in inputs:
+        start = timer()
+        func(item)
+        append(timer() - start)
+    return out
+
+
+def _allocations(func, inputs):
+    if tracemalloc is not None:
+        tracemalloc.start()
+        for item in inputs:
+            func(item)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return 'peak_bytes_per_record', float(peak) / len(inputs)
+    gc.collect()
+    gc.disable()
+    try:
+        before = len(gc.get_objects())
+        held = [func(item) for item in inputs]
+        created = len(gc.get_objects()) - before - 1
+    finally:
+        gc.enable()
+    del held
+    return 'objects_retained_per_record', float(created) / len(inputs)
+
+
+def run(size=SIZE, seed=0):
+    queries = synthetic_corpus(size, seed)
+    bibs = [from_openurl(q, openurl=False) for q in queries]
+    results = {}
+    for name, func in CONVERSIONS:
+        inputs = _inputs(name, queries, bibs)
+        start = time.time()
+        for item in inputs:
+            func(item)
+        elapsed = time.time() - start
+        latencies = _latencies(func, inputs)
+        alloc_key, alloc = _allocations(func, inputs[:ALLOC_SAMPLE])
+        results[name] = {
+            'records': len(inputs),
+            'records_per_sec': len(inputs) / elapsed,
+            'p50_us': percentile(latencies, 50) * 1e6,
+            'p99_us': percentile(latencies, 99) * 1e6,
+            alloc_key: alloc,
+        }
+    return {'python': platform.python_version(),
+            'size': size,
+            'seed': seed,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'results': results}
+
+
+def report(run_data, baseline=None, threshold=0.1):
+    """
+    Print a results table, with changes against baseline if given.  Returns
+    the names of conversions whose throughput regressed past threshold.
+    """
+    regressions = []
+    for name, _ in CONVERSIONS:
+        r = run_data['results'][name]
+        alloc = r.get('objects_retained_per_record', r.get('peak_bytes_per_record'))
+        line = '%-24s %10.0f records/sec  p50 %8.1fus  p99 %8.1fus  alloc %8.1f' % (
+            name, r['records_per_sec'], r['p50_us'], r['p99_us'], alloc)
+        old = (baseline or {}).get('results', {}).get(name)
+        if old:
+            change = r['records_per_sec'] / old['records_per_sec'] - 1
+            line += '  %+6.1f%%' % (100 * change)
+            if change < -threshold:
+                regressions.append(name)
+                line += '  REGRESSION'
+        print line
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the conversion benchmarks.')
+    parser.add_argument('--size', type=int, default=SIZE)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', metavar='FILE', help='write results as JSON')
+    parser.add_argument('--compare', metavar='FILE', help='compare against saved results')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='throughput drop counted as a regression (default 0.1)')
+    args = parser.parse_args(argv)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    data = run(args.size, args.seed)
+    regressions = report(data, baseline, args.threshold)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Synthetic OpenURL corpora shaped like the fixtures in test/openurl.py.
+
+Each shape is a template filled from a seeded random generator, so a corpus
+is the same from run to run but values don't repeat the way a cycled list
+of fixtures does.
+"""
+
+import random
+import urllib
+
+WORDS = (u'analysis', u'biological', u'change', u'education', u'europe',
+         u'genetic', u'health', u'history', u'introduction', u'javascript',
+         u'literature', u'methods', u'network', u'perception', u'policy',
+         u'semantics', u'social', u'studies', u'theory', u'voiceless',
+         u'\xe9tudes', u'pam\xe1tky', u'aufkl\xe4rung')
+SURNAMES = (u'Castillo', u'Dehrmann', u'Frogner', u'Kockel', u'Maffeis',
+            u'Mangla', u'Miles', u'Svendsen', u'Wallace', u'Dvorsk\xfd')
+FIRSTNAMES = (u'Akshay', u'BK', u'Matthew', u'Nicole', u'Ullrich', u'W',
+              u'Franti\u0161ek')
+
+
+def _q(v):
+    return urllib.quote_plus(v.encode('utf-8'))
+
+
+class Generator(object):
+
+    def __init__(self, seed=0):
+        self.rand = random.Random(seed)
+
+    def title(self, words=6):
+        return u' '.join(self.rand.choice(WORDS) for i in range(words)).capitalize()
+
+    def digits(self, n):
+        return ''.join(str(self.rand.randint(0, 9)) for i in range(n))
+
+    def issn(self):
+        return '%s-%s' % (self.digits(4), self.digits(4))
+
+    def isbn(self):
+        return '978' + self.digits(10)
+
+    def year(self):
+        return str(self.rand.randint(1850, 2014))
+
+    def article(self):
+        spage = self.rand.randint(1, 900)
+        return (u'rft_val_fmt=info:ofi/fmt:kev:mtx:journal&rfr_id=info:sid/www.isinet.com:WoK:UA'
+                u'&rft.spage=%d&rft.epage=%d&rft.issue=%d&rft.volume=%d&rft.date=%s'
+                u'&rft.title=%s&rft.stitle=%s&rft.atitle=%s&rft.aulast=%s&rft.au=%s'
+                u'&rft_id=info:doi/10.%s%%2F%s&rft.issn=%s&rft.genre=article' % (
+                    spage, spage + self.rand.randint(1, 40), self.rand.randint(1, 12),
+                    self.rand.randint(1, 80), self.year(), _q(self.title(2)),
+                    _q(self.title(2).upper()), _q(self.title(8)),
+                    _q(self.rand.choice(SURNAMES)),
+                    _q(u'%s, %s' % (self.rand.choice(SURNAMES), self.rand.choice(FIRSTNAMES))),
+                    self.digits(4), self.digits(7), self.issn()))
+
+    def book_chapter(self):
+        spage = self.rand.randint(1, 500)
+        return (u'sid=info:sid/sersol:RefinerQuery&genre=bookitem&isbn=%s&&title=%s'
+                u'&atitle=%s&volume=&part=&issue=&date=%s&spage=%d&epage=%d'
+                u'&aulast=%s&aufirst=%s' % (
+                    self.isbn(), _q(self.title(5)), _q(self.title(9)), self.year(),
+                    spage, spage + self.rand.randint(5, 40),
+                    _q(self.rand.choice(SURNAMES)), _q(self.rand.choice(FIRSTNAMES))))
+
+    def dissertation(self):
+        last, first = self.rand.choice(SURNAMES), self.rand.choice(FIRSTNAMES)
+        return (u'ctx_ver=Z39.88-2004&ctx_enc=info:ofi/enc:UTF-8'
+                u'&rfr_id=info:sid/ProQuest+Dissertations+%%26+Theses+Full+Text'
+                u'&rft_val_fmt=info:ofi/fmt:kev:mtx:dissertation&rft.genre=dissertations+%%26+theses'
+                u'&rft.jtitle=&rft.atitle=&rft.au=%s&rft.aulast=%s&rft.aufirst=%s&rft.date=%s-01-01'
+                u'&rft.volume=&rft.issue=&rft.spage=&rft.isbn=&rft.btitle=&rft.title=%s'
+                u'&rft.issn=&rft_id=info:doi/' % (
+                    _q(u'%s, %s' % (last, first)), _q(last), _q(first), self.year(),
+                    _q(self.title(10))))
+
+    def firstsearch(self):
+        oclc = self.digits(9)
+        isbn = self.isbn()
+        title = _q(self.title(6))
+        last, first = _q(self.rand.choice(SURNAMES)), _q(self.rand.choice(FIRSTNAMES))
+        return (u'sid=FirstSearch%%3AWorldCat&genre=book&isbn=%s&title=%s&date=%s'
+                u'&aulast=%s&aufirst=%s&id=doi%%3A'
+                u'&pid=%%3Caccession+number%%3E%s%%3C%%2Faccession+number%%3E%%3Cfssessid%%3E0%%3C%%2Ffssessid%%3E'
+                u'&url_ver=Z39.88-2004&rfr_id=info%%3Asid%%2Ffirstsearch.oclc.org%%3AWorldCat'
+                u'&rft_val_fmt=info%%3Aofi%%2Ffmt%%3Akev%%3Amtx%%3Abook&req_dat=%%3Csessionid%%3E0%%3C%%2Fsessionid%%3E'
+                u'&rfe_dat=%%3Caccessionnumber%%3E%s%%3C%%2Faccessionnumber%%3E'
+                u'&rft_id=info%%3Aoclcnum%%2F%s&rft_id=urn%%3AISBN%%3A%s&rft.aulast=%s&rft.aufirst=%s'
+                u'&rft.btitle=%s&rft.isbn=%s&rft.place=New+York&rft.pub=W.+W.+Norton+%%26+Co.'
+                u'&rft.genre=book&checksum=%s' % (
+                    isbn, title, self.year(), last, first, oclc, oclc, oclc, isbn,
+                    last, first, title, isbn, self.digits(32)))
+
+    def long_rfe_dat(self):
+        notes = u''.join(u'<dissnote>%s</dissnote>' % self.title(12) for i in range(20))
+        return u'%s&rfe_dat=%s' % (self.firstsearch(), _q(notes))
+
+SHAPES = ('article', 'book_chapter', 'dissertation', 'firstsearch', 'long_rfe_dat')
+
+#Relative frequency of each shape.
+WEIGHTS = {'article': 5, 'book_chapter': 2, 'dissertation': 1,
+           'firstsearch': 3, 'long_rfe_dat': 1}
+
+
+def synthetic_corpus(size, seed=0, shapes=SHAPES):
+    """
+    Return a list of `size` generated queries mixing the given shapes.
+    """
+    gen = Generator(seed)
+    pool = []
+    for shape in shapes:
+        pool.extend([getattr(gen, shape)] * WEIGHTS[shape])
+    return [gen.rand.choice(pool)() for i in range(size)]
@@ -0,0 +1,38 @@
+"""
+Query tokenizing: parse_qs against openurl.tokenize, and the effect on a
+full parse.
+"""
+
+from urlparse import parse_qs
+
+from bibjsontools.openurl import parse_many, tokenize
+
+from benchmarks import corpus, timed
+
+SIZE = 50000
+
+
+def main():
+    queries = corpus(SIZE)
+
+    def stdlib():
+        for q in queries:
+            parse_qs(q)
+
+    def fast():
+        for q in queries:
+            tokenize(q)
+
+    base = timed('parse_qs', stdlib, SIZE)
+    elapsed = timed('tokenize', fast, SIZE)
+    print 'speedup: %.2fx' % (base / elapsed)
+
+    def full():
+        for bib in parse_many(queries[:20000]):
+            pass
+
+    timed('parse_many', full, 20000)
+
+
+if __name__ == '__main__':
+    main()
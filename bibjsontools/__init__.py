@@ -1 +1,71 @@
-from openurl import *
+"""
+Tools for working with BibJSON.
+
+Importing the package loads nothing else.  The parsing API below and the
+submodules are imported on first use, so short-lived processes only pay
+for what they touch:
+
+    import bibjsontools
+    bib = bibjsontools.from_openurl(query)    #imports bibjsontools.openurl
+    bibjsontools.ris.convert(bib)             #imports bibjsontools.ris
+
+Python 2 has no module level __getattr__, so the package module is swapped
+in sys.modules for a ModuleType subclass that provides one.
+"""
+
+import sys
+from types import ModuleType
+
+#Names exported from the package, by the submodule they live in.
+EXPORTS = {
+    'openurl': ('BibJSONToOpenURL', 'LazyBibJSON', 'OpenURLParser', 'from_dict',
+                'from_openurl', 'from_openurl_stream', 'parse_many', 'to_openurl',
+                'write_openurls'),
+}
+
+SUBMODULES = frozenset(['cache', 'cli', 'columns', 'compat', 'diskcache', 'frontend', 'index',
+                        'instrument', 'normalize', 'openurl', 'optional', 'pool', 'popular',
+                        'record', 'ris', 'scan'])
+
+_SOURCES = dict((name, module) for module, names in EXPORTS.items() for name in names)
+
+
+def _public_names(module):
+    return [name for name, value in vars(module).items()
+            if not (name.startswith('_') or isinstance(value, ModuleType))]
+
+
+class _LazyPackage(ModuleType):
+
+    def __getattr__(self, name):
+        if name == '__all__':
+            #'from bibjsontools import *' exports every public openurl name,
+            #as the old 'from openurl import *' did.
+            value = sorted(set(_SOURCES) | set(_public_names(self.openurl)))
+            setattr(self, name, value)
+            return value
+        if name in SUBMODULES:
+            __import__('%s.%s' % (self.__name__, name))
+            #The import sets the attribute on the package.
+            return ModuleType.__getattribute__(self, name)
+        module = _SOURCES.get(name)
+        if (module is None) and not name.startswith('_'):
+            #Other public openurl names were exported by the old
+            #'from openurl import *'.
+            module = 'openurl'
+        if module is not None:
+            value = getattr(getattr(self, module), name)
+            setattr(self, name, value)
+            return value
+        raise AttributeError("'module' object has no attribute %r" % name)
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | SUBMODULES | set(_SOURCES))
+
+
+_package = _LazyPackage(__name__, __doc__)
+_package.__dict__.update(sys.modules[__name__].__dict__)
+#Keep the original module alive; Python 2 clears a module's globals when
+#it is collected, and the functions above still use them.
+_package._original = sys.modules[__name__]
+sys.modules[__name__] = _package
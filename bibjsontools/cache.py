@@ -0,0 +1,144 @@
+"""
+Opt-in LRU/TTL cache for OpenURL parsing.
+
+Link-resolver traffic repeats the same queries over and over, often with
+the parameters in a different order or with session keys that the parser
+never reads.  ParseCache keys results on a canonical form of the query so
+those all share one entry.
+"""
+
+import threading
+import time
+try:
+    from collections import OrderedDict
+except ImportError:
+    #Python 2.6
+    from ordereddict import OrderedDict
+
+from bibjsontools.openurl import (ALIAS_INDEX, EXTRA_KEYS, PARSED_KEYS,
+                                  LazyBibJSON, OpenURLParser, tokenize)
+
+def _build_prefix_map(index):
+    """
+    Map bare keys to their rft. form where the two are interchangeable:
+    they feed the same fields and sit next to each other in every alias
+    list, so renaming one never changes which value wins.
+    """
+    out = {}
+    for k, slots in index.items():
+        if not k.startswith('rft.'):
+            continue
+        bare = k[4:]
+        bare_slots = dict(index.get(bare, ()))
+        if (not bare_slots) or (bare in EXTRA_KEYS):
+            continue
+        if set(bare_slots) != set(field for field, rank in slots):
+            continue
+        if all(abs(bare_slots[field] - rank) == 1 for field, rank in slots):
+            out[bare] = k
+    return out
+
+PREFIX_MAP = _build_prefix_map(ALIAS_INDEX)
+
+def canonical_query(query_dict):
+    """
+    Return a hashable canonical form of a parsed query.  Keys the parser
+    never reads are dropped, bare keys are folded onto their rft. form when
+    only one of the two is present and the result is sorted by key.
+    """
+    out = {}
+    for k, v in query_dict.iteritems():
+        if (not v) or (k not in PARSED_KEYS):
+            continue
+        ck = PREFIX_MAP.get(k, k)
+        if (ck != k) and (ck in query_dict):
+            ck = k
+        out[ck] = tuple(v)
+    return tuple(sorted(out.items()))
+
+def copy_bibjson(bib, openurl=True):
+    """
+    Copy a parsed record deep enough that callers can't change the cached
+    one: the author and identifier lists and the journal dict are copied.
+    """
+    out = {}
+    for k, v in dict.iteritems(bib):
+        if k == '_openurl':
+            continue
+        if isinstance(v, list):
+            v = [dict(i) if isinstance(i, dict) else i for i in v]
+        elif isinstance(v, dict):
+            v = dict(v)
+        out[k] = v
+    if (openurl == 'lazy') and isinstance(bib, LazyBibJSON) and bib._pending:
+        return LazyBibJSON(out)
+    if openurl:
+        out['_openurl'] = bib['_openurl']
+    return out
+
+
+class ParseCache(object):
+    """
+    Bounded LRU cache, with optional TTL in seconds, in front of
+    from_openurl and from_dict.  Results are copied on the way out.
+    """
+
+    def __init__(self, maxsize=10000, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._parser = OpenURLParser('')
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'maxsize': self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def from_openurl(self, query, openurl=True):
+        """
+        Cached equivalent of openurl.from_openurl.
+        """
+        return self._lookup(tokenize(query), isinstance(query, unicode), openurl)
+
+    def from_dict(self, request_dict, openurl=True):
+        """
+        Cached equivalent of openurl.from_dict.
+        """
+        return self._lookup(request_dict, None, openurl)
+
+    def _lookup(self, data, is_unicode, openurl):
+        #str and unicode queries parse to different value types.
+        key = (is_unicode, canonical_query(data))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if (entry is not None) and (self.ttl is not None) and (entry[0] < now):
+                entry = None
+                self.evictions += 1
+            if entry is not None:
+                self.hits += 1
+                self._entries[key] = entry
+                bib = entry[1]
+            else:
+                self.misses += 1
+                self._parser.load('', query_dict=data)
+                bib = self._parser.parse(openurl='lazy')
+                self._entries[key] = (now + (self.ttl or 0), bib)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            return copy_bibjson(bib, openurl=openurl)
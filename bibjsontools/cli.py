@@ -0,0 +1,301 @@
+"""
+Command line bulk converter for OpenURL logs.
+
+Reads one OpenURL query per line from plain or gzipped files, or stdin, and
+writes newline-delimited BibJSON, OpenURL or RIS in input order.  Parsing is
+fanned out over a process pool in chunks.
+
+    bibjsontools --workers 4 --to ris resolver.log.gz > out.ris
+
+The count subcommand writes the most requested works instead, as tab
+separated count and work key lines.
+
+    bibjsontools count --workers 4 --top 100 resolver.log.gz
+"""
+
+import argparse
+import gzip
+import itertools
+import sys
+import time
+from collections import deque
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from bibjsontools import ris
+from bibjsontools.openurl import OpenURLParser
+
+FORMATS = ('bibjson', 'openurl', 'ris')
+
+#Per-process state, set up by _init_worker.
+_parser = None
+_format = None
+
+def _init_worker(fmt):
+    global _parser, _format
+    _parser = OpenURLParser('')
+    _format = fmt
+
+def query_from_line(line):
+    """
+    Pull the query string out of a log line.  Anything up to and including
+    the first ? is dropped so full resolver URLs work as well as bare queries.
+    """
+    line = line.strip()
+    if '?' in line:
+        line = line.split('?', 1)[1]
+    return line
+
+def _decoded(value):
+    """
+    Copy of a parsed record with byte strings decoded as UTF-8, replacing
+    bytes that aren't, e.g. Latin-1 escapes such as Caf%E9.
+    """
+    if isinstance(value, str):
+        return value.decode('utf-8', 'replace')
+    if isinstance(value, list):
+        return [_decoded(v) for v in value]
+    if isinstance(value, dict):
+        return dict((k, _decoded(v)) for k, v in value.iteritems())
+    return value
+
+def convert_line(line):
+    """
+    Convert one log line to the output format.  Returns None for blank lines
+    and False for lines that can't be parsed, which are reported on stderr.
+    """
+    query = query_from_line(line)
+    if not query:
+        return
+    try:
+        _parser.load(query)
+        if _format == 'bibjson':
+            bib = _parser.parse()
+            try:
+                out = json.dumps(bib)
+            except UnicodeDecodeError:
+                out = json.dumps(_decoded(bib))
+        elif _format == 'openurl':
+            out = _parser.parse()['_openurl']
+        else:
+            out = ''.join(ris.iter_ris([_parser.parse(openurl=False)]))
+    except Exception, e:
+        sys.stderr.write('skipped %r: %s\n' % (query[:100], e.__class__.__name__))
+        return False
+    if isinstance(out, unicode):
+        out = out.encode('utf-8')
+    return out
+
+def _convert_chunk(lines):
+    return [convert_line(line) for line in lines]
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _pooled(pool, lines, chunk_size, pending):
+    """
+    convert_line results from pool workers in input order.  At most pending
+    chunks are handed out ahead of the one being read, so input is only
+    read as fast as the workers get through it.
+    """
+    queued = deque()
+    for chunk in _chunks(lines, chunk_size):
+        queued.append(pool.apply_async(_convert_chunk, (chunk,)))
+        if len(queued) > pending:
+            for result in queued.popleft().get():
+                yield result
+    while queued:
+        for result in queued.popleft().get():
+            yield result
+
+def open_input(path):
+    if path == '-':
+        return sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+def read_lines(paths):
+    for path in paths:
+        handle = open_input(path)
+        try:
+            for line in handle:
+                yield line
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+
+class Progress(object):
+    """
+    Throughput reporting to stderr.
+    """
+
+    def __init__(self, every, stream=sys.stderr):
+        self.every = every
+        self.stream = stream
+        self.records = 0
+        self.errors = 0
+        self.start = time.time()
+
+    def rate(self):
+        elapsed = time.time() - self.start
+        return elapsed, (self.records / elapsed if elapsed else 0.0)
+
+    def update(self, ok):
+        self.records += 1
+        if not ok:
+            self.errors += 1
+        if self.every and (self.records % self.every == 0):
+            elapsed, rate = self.rate()
+            self.stream.write('%d records, %.0f records/sec\n' % (self.records, rate))
+
+    def done(self):
+        elapsed, rate = self.rate()
+        self.stream.write('%d records (%d skipped) in %.1fs, %.0f records/sec\n' % (
+            self.records, self.errors, elapsed, rate))
+
+
+def convert(lines, out, fmt='bibjson', workers=1, chunk_size=500, progress=None):
+    """
+    Convert an iterable of log lines and write the results to out, keeping
+    input order.  Returns the number of records written.
+    """
+    written = 0
+    pool = None
+    if workers > 1:
+        from multiprocessing import Pool
+        pool = Pool(workers, initializer=_init_worker, initargs=(fmt,))
+        results = _pooled(pool, lines, chunk_size, workers * 2)
+    else:
+        _init_worker(fmt)
+        results = itertools.imap(convert_line, lines)
+    try:
+        for result in results:
+            #Blank lines aren't records.
+            if result is None:
+                continue
+            if progress:
+                progress.update(result is not False)
+            if result is False:
+                continue
+            out.write(result)
+            if fmt != 'ris':
+                out.write('\n')
+            written += 1
+    finally:
+        if pool:
+            pool.terminate()
+    return written
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='bibjsontools',
+        description='Convert OpenURL logs to BibJSON, OpenURL or RIS.')
+    parser.add_argument('files', nargs='*', default=['-'],
+                        help='plain or .gz files with one OpenURL per line (default stdin)')
+    parser.add_argument('-t', '--to', choices=FORMATS, default='bibjson',
+                        help='output format (default bibjson)')
+    parser.add_argument('-o', '--output', default='-',
+                        help='output file (default stdout)')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='number of worker processes (default 1)')
+    parser.add_argument('-c', '--chunk-size', type=int, default=500,
+                        help='lines handed to a worker at a time (default 500)')
+    parser.add_argument('--progress', type=int, default=0, metavar='N',
+                        help='report throughput to stderr every N records')
+    parser.add_argument('-s', '--scan', action='store_true',
+                        help='only convert lines with OpenURL keys, for raw web server logs')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="don't print the summary line")
+    return parser
+
+def build_count_parser():
+    parser = argparse.ArgumentParser(
+        prog='bibjsontools count',
+        description='Count the most requested works in OpenURL logs.')
+    parser.add_argument('files', nargs='*', default=['-'],
+                        help='plain or .gz files with one OpenURL per line (default stdin)')
+    parser.add_argument('-n', '--top', type=int, default=100,
+                        help='number of works to list (default 100, 0 for all)')
+    parser.add_argument('-o', '--output', default='-',
+                        help='output file (default stdout)')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='number of worker processes (default 1)')
+    parser.add_argument('-c', '--chunk-size', type=int, default=1000,
+                        help='lines handed to a worker at a time (default 1000)')
+    parser.add_argument('--sketch', type=int, default=0, metavar='K',
+                        help='estimate counts tracking about K works per worker, '
+                             'for when exact counts don\'t fit in memory')
+    parser.add_argument('-s', '--scan', action='store_true',
+                        help='only count lines with OpenURL keys, for raw web server logs')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="don't print the summary line")
+    return parser
+
+def count_main(argv):
+    #Subcommands and options import what they need, keeping startup short.
+    from bibjsontools.popular import count_works
+    args = build_count_parser().parse_args(argv)
+    if args.scan:
+        from bibjsontools.scan import LogScanner
+        queries = LogScanner().queries(args.files)
+    else:
+        queries = itertools.imap(query_from_line, read_lines(args.files))
+    start = time.time()
+    counts, stats = count_works(queries,
+                                workers=args.workers,
+                                chunk_size=args.chunk_size,
+                                sketch_size=args.sketch)
+    out = sys.stdout if args.output == '-' else open(args.output, 'wb')
+    try:
+        for key, n in counts.most_common(args.top or None):
+            out.write(('%d\t%s\n' % (n, key)).encode('utf-8'))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if not args.quiet:
+        elapsed = time.time() - start
+        sys.stderr.write('%d records (%d skipped) in %.1fs, %.0f records/sec\n' % (
+            stats['records'], stats['skipped'], elapsed,
+            stats['records'] / elapsed if elapsed else 0.0))
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and (argv[0] == 'count'):
+        return count_main(argv[1:])
+    args = build_parser().parse_args(argv)
+    out = sys.stdout if args.output == '-' else open(args.output, 'wb')
+    progress = Progress(args.progress)
+    scanner = None
+    if args.scan:
+        from bibjsontools.scan import LogScanner
+        scanner = LogScanner()
+        lines = scanner.queries(args.files)
+    else:
+        lines = read_lines(args.files)
+    try:
+        convert(lines, out,
+                fmt=args.to,
+                workers=args.workers,
+                chunk_size=args.chunk_size,
+                progress=progress)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if not args.quiet:
+        progress.done()
+        if scanner:
+            sys.stderr.write(scanner.report() + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""
+Columnar batch parsing for reporting and analytics.
+
+parse_columns() reads OpenURLs straight into one buffer per output column
+without building a BibJSON dict per record.  Low-cardinality columns
+(type, year, journal, ISSN, referrer) are dictionary encoded: each value is
+stored once and the column holds an array of integer codes.
+
+    batch = parse_columns(open('resolver.log'))
+    batch.counts('journal').most_common(10)
+    batch.write_csv(open('report.csv', 'wb'))
+"""
+
+import csv
+import itertools
+from array import array
+
+from bibjsontools.compat import Counter
+from bibjsontools.openurl import OpenURLParser
+from bibjsontools.optional import installed
+
+#NumPy is only imported by to_numpy().
+HAVE_NUMPY = installed('numpy')
+
+def _first_identifier(id_type):
+    def get(p):
+        for idt in p.identifiers():
+            if idt['type'] == id_type:
+                return idt['id']
+    return get
+
+def _lowest_identifier(id_type):
+    #ISBNs and ISSNs are gathered from every alias into a set, so there is
+    #no first one; the lowest keeps the column the same from run to run.
+    def get(p):
+        ids = [idt['id'] for idt in p.identifiers() if idt['type'] == id_type]
+        if ids:
+            return min(ids)
+    return get
+
+def _journal_name(p):
+    journal = p.journal()
+    if journal:
+        return journal['name']
+
+def _cell(v, encoding):
+    if v is None:
+        return ''
+    if isinstance(v, unicode):
+        return v.encode(encoding)
+    return v
+
+#Column name -> getter on a loaded OpenURLParser.
+COLUMN_GETTERS = {
+    'type': lambda p: p.type,
+    '_rfr': lambda p: p.rfr(),
+    'title': lambda p: p._field('title'),
+    'journal': _journal_name,
+    'volume': lambda p: p._field('volume'),
+    'issue': lambda p: p._field('issue'),
+    'year': lambda p: p.year(),
+    'start_page': lambda p: p.pages()['start_page'],
+    'doi': _first_identifier('doi'),
+    'pmid': _first_identifier('pmid'),
+    'issn': _lowest_identifier('issn'),
+    'isbn': _lowest_identifier('isbn'),
+    'oclc': _first_identifier('oclc'),
+}
+
+COLUMNS = ('type', 'year', 'journal', 'issn', 'doi', '_rfr')
+
+#Columns with few distinct values, stored dictionary encoded.
+ENCODED = frozenset(['type', '_rfr', 'journal', 'year', 'issn'])
+
+
+class Column(object):
+    """
+    Plain column: one list entry per record, None when empty.
+    """
+
+    def __init__(self):
+        self.values = []
+
+    def append(self, v):
+        self.values.append(v)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def counts(self):
+        return Counter(v for v in self.values if v is not None)
+
+    def to_numpy(self):
+        import numpy
+        return numpy.array(self.values, dtype=object)
+
+
+class EncodedColumn(Column):
+    """
+    Dictionary encoded column.  values holds each distinct value once and
+    codes holds an index into it per record, -1 when empty.
+    """
+
+    def __init__(self):
+        self.values = []
+        self.codes = array('i')
+        self._index = {}
+
+    def append(self, v):
+        if v is None:
+            self.codes.append(-1)
+            return
+        code = self._index.get(v)
+        if code is None:
+            code = self._index[v] = len(self.values)
+            self.values.append(v)
+        self.codes.append(code)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        values = self.values
+        for code in self.codes:
+            yield values[code] if code >= 0 else None
+
+    def counts(self):
+        values = self.values
+        tally = Counter(self.codes)
+        return Counter(dict((values[code], n) for code, n in tally.iteritems() if code >= 0))
+
+    def to_numpy(self):
+        """
+        Return (codes, categories): an int32 array of codes and an object
+        array of the distinct values.
+        """
+        import numpy
+        codes = numpy.frombuffer(self.codes, dtype=numpy.int32).copy()
+        return codes, numpy.array(self.values, dtype=object)
+
+
+class ColumnBatch(object):
+    """
+    Struct-of-arrays batch of parsed OpenURLs.
+    """
+
+    def __init__(self, columns=COLUMNS):
+        for name in columns:
+            if name not in COLUMN_GETTERS:
+                raise ValueError('unknown column %r' % (name,))
+        self.names = tuple(columns)
+        self.columns = dict((name, EncodedColumn() if name in ENCODED else Column())
+                            for name in self.names)
+        self._parser = OpenURLParser('')
+        self._fill = [(COLUMN_GETTERS[name], self.columns[name].append)
+                      for name in self.names]
+
+    def __len__(self):
+        return len(self.columns[self.names[0]]) if self.names else 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def append(self, query):
+        """
+        Parse one OpenURL query string into the columns.
+        """
+        parser = self._parser
+        parser.load(query)
+        for get, append in self._fill:
+            append(get(parser) or None)
+
+    def extend(self, queries):
+        """
+        Parse an iterable of queries.  Blank entries are skipped.
+        """
+        for query in queries:
+            query = query.strip()
+            if query:
+                self.append(query)
+        return self
+
+    def counts(self, name):
+        """
+        Counter of the non-empty values in a column.
+        """
+        return self.columns[name].counts()
+
+    def rows(self):
+        """
+        Yield one tuple per record, in column order.
+        """
+        return itertools.izip(*[self.columns[name] for name in self.names])
+
+    def write_csv(self, fileobj, delimiter=',', header=True, encoding='utf-8'):
+        """
+        Write the batch as CSV, or TSV with delimiter='\\t'.  Returns the
+        number of records written.
+        """
+        writer = csv.writer(fileobj, delimiter=delimiter, lineterminator='\n')
+        if header:
+            writer.writerow(self.names)
+        written = 0
+        for row in self.rows():
+            writer.writerow([_cell(v, encoding) for v in row])
+            written += 1
+        return written
+
+    def write_tsv(self, fileobj, header=True, encoding='utf-8'):
+        return self.write_csv(fileobj, '\t', header, encoding)
+
+    def to_numpy(self):
+        """
+        Dict of column name -> NumPy array, or (codes, categories) for
+        dictionary encoded columns.  Requires NumPy.
+        """
+        if not HAVE_NUMPY:
+            raise ImportError('to_numpy requires numpy')
+        return dict((name, self.columns[name].to_numpy()) for name in self.names)
+
+def parse_columns(queries, columns=COLUMNS):
+    """
+    Parse an iterable of OpenURL queries into a ColumnBatch.
+    """
+    return ColumnBatch(columns).extend(queries)
@@ -0,0 +1,44 @@
+"""
+Fallbacks for Python 2.6, which lacks collections.Counter.
+"""
+
+from heapq import nlargest
+from operator import itemgetter
+
+
+class _Counter(dict):
+    """
+    The parts of the 2.7 collections.Counter the package uses: counting an
+    iterable or mapping, update, most_common and zero for missing keys.
+    """
+
+    def __init__(self, iterable=None, **kwargs):
+        dict.__init__(self)
+        self.update(iterable, **kwargs)
+
+    def __missing__(self, key):
+        return 0
+
+    def update(self, iterable=None, **kwargs):
+        if iterable is not None:
+            if hasattr(iterable, 'iteritems'):
+                for key, n in iterable.iteritems():
+                    self[key] = self[key] + n
+            else:
+                for key in iterable:
+                    self[key] = self[key] + 1
+        if kwargs:
+            self.update(kwargs)
+
+    def most_common(self, n=None):
+        if n is None:
+            return sorted(self.iteritems(), key=itemgetter(1), reverse=True)
+        return nlargest(n, self.iteritems(), key=itemgetter(1))
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, dict(self))
+
+try:
+    from collections import Counter
+except ImportError:
+    Counter = _Counter
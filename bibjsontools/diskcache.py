@@ -0,0 +1,255 @@
+"""
+Persistent parse cache on local disk, for reprocessing resolver logs.
+
+DiskParseCache stores parsed records in a SQLite file keyed on a hash of
+the canonical query (see cache.canonical_query) and PARSER_VERSION.  When
+the parser version changes the stored results are dropped on open, so a
+re-run only parses queries it hasn't seen under the current logic.
+
+Tokenizing a query to canonicalize it costs about as much as parsing it,
+so the exact query strings seen are also recorded against their canonical
+key and looked up first.
+
+    with DiskParseCache('/var/cache/bibjson.sqlite', maxsize=50000000) as cache:
+        for bib in cache.parse_many(open('resolver.log')):
+            ...
+
+A connection belongs to the thread that opened it; give each worker
+process its own DiskParseCache.  The entry count used for eviction is read
+when the cache is opened and then kept by the connection, so writes from
+other processes are only seen on the next open.
+"""
+
+import cPickle as pickle
+import hashlib
+import sqlite3
+
+from bibjsontools.cache import canonical_query
+from bibjsontools.openurl import (PARSER_VERSION, LazyBibJSON, OpenURLParser,
+                                  tokenize)
+
+#SQLite's default limit on bound parameters is 999.
+_IN_BATCH = 500
+
+def query_key(data, is_unicode):
+    """
+    Digest of a tokenized query under the current parser version.
+    """
+    canonical = (PARSER_VERSION, is_unicode, canonical_query(data))
+    return hashlib.sha1(repr(canonical)).digest()
+
+def raw_key(query):
+    """
+    Digest of the exact query string under the current parser version.
+    """
+    return hashlib.sha1(repr((PARSER_VERSION, query))).digest()
+
+def _finish(bib, openurl):
+    #Records are stored with _openurl.
+    if openurl == 'lazy':
+        del bib['_openurl']
+        return LazyBibJSON(bib)
+    if not openurl:
+        del bib['_openurl']
+    return bib
+
+def _chunks(items):
+    for i in range(0, len(items), _IN_BATCH):
+        chunk = items[i:i + _IN_BATCH]
+        yield ','.join('?' * len(chunk)), [sqlite3.Binary(k) for k in chunk]
+
+
+class DiskParseCache(object):
+    """
+    SQLite backed cache of parse results.  With maxsize set, the least
+    recently used entries are evicted once a write takes the cache past it.
+    """
+
+    def __init__(self, path, maxsize=None):
+        self.path = path
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._db = sqlite3.connect(path)
+        self._db.text_factory = str
+        self._setup()
+        self._parser = OpenURLParser('')
+
+    def _setup(self):
+        db = self._db
+        with db:
+            db.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+            db.execute('CREATE TABLE IF NOT EXISTS entries '
+                       '(key BLOB PRIMARY KEY, value BLOB, used INTEGER)')
+            db.execute('CREATE INDEX IF NOT EXISTS entries_used ON entries (used)')
+            db.execute('CREATE TABLE IF NOT EXISTS aliases (raw BLOB PRIMARY KEY, key BLOB)')
+            db.execute('CREATE INDEX IF NOT EXISTS aliases_key ON aliases (key)')
+            row = db.execute("SELECT value FROM meta WHERE name = 'parser_version'").fetchone()
+            if (row is None) or (row[0] != str(PARSER_VERSION)):
+                db.execute('DELETE FROM entries')
+                db.execute('DELETE FROM aliases')
+                db.execute("INSERT OR REPLACE INTO meta VALUES ('parser_version', ?)",
+                           (str(PARSER_VERSION),))
+        self._tick, self._count = db.execute('SELECT MAX(used), COUNT(*) FROM entries').fetchone()
+        self._tick = self._tick or 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self),
+                'maxsize': self.maxsize}
+
+    def close(self):
+        self._db.close()
+
+    def clear(self):
+        with self._db:
+            self._db.execute('DELETE FROM entries')
+            self._db.execute('DELETE FROM aliases')
+        self._count = 0
+
+    def get_many(self, keys):
+        """
+        Dict of key -> stored record for the canonical keys that are cached.
+        """
+        return dict((key, pickle.loads(blob))
+                    for key, blob in self._get_blobs(keys).iteritems())
+
+    def _get_blobs(self, keys):
+        found = {}
+        for marks, chunk in _chunks(list(set(keys))):
+            for key, value in self._db.execute(
+                    'SELECT key, value FROM entries WHERE key IN (%s)' % marks, chunk):
+                found[str(key)] = str(value)
+        self._touch(found)
+        return found
+
+    def _get_aliased(self, raws):
+        found = {}
+        used = {}
+        for marks, chunk in _chunks(list(set(raws))):
+            for raw, key, value in self._db.execute(
+                    'SELECT aliases.raw, entries.key, entries.value FROM aliases '
+                    'JOIN entries ON entries.key = aliases.key '
+                    'WHERE aliases.raw IN (%s)' % marks, chunk):
+                found[str(raw)] = str(value)
+                used[str(key)] = True
+        self._touch(used)
+        return found
+
+    def _touch(self, keys):
+        if keys:
+            self._tick += 1
+            with self._db:
+                self._db.executemany('UPDATE entries SET used = ? WHERE key = ?',
+                                     [(self._tick, sqlite3.Binary(k)) for k in keys])
+
+    def put_many(self, items):
+        """
+        Store (key, record) pairs.  Records should include _openurl.
+        """
+        self._put_blobs([(key, pickle.dumps(bib, 2)) for key, bib in items], ())
+
+    def _put_blobs(self, items, aliases):
+        self._tick += 1
+        rows = [(sqlite3.Binary(key), sqlite3.Binary(blob), self._tick)
+                for key, blob in items]
+        added = 0
+        with self._db:
+            if rows:
+                added = self._db.executemany('INSERT OR IGNORE INTO entries VALUES (?, ?, ?)',
+                                             rows).rowcount
+            if added < len(rows):
+                #Some keys were already stored; overwrite them.
+                self._db.executemany('UPDATE entries SET value = ?, used = ? WHERE key = ?',
+                                     [(value, used, key) for key, value, used in rows])
+            self._db.executemany('INSERT OR REPLACE INTO aliases VALUES (?, ?)',
+                                 [(sqlite3.Binary(raw), sqlite3.Binary(key))
+                                  for raw, key in aliases])
+        self._count += added
+        self._evict()
+
+    def _evict(self):
+        if self.maxsize is None:
+            return
+        over = self._count - self.maxsize
+        if over > 0:
+            with self._db:
+                victims = [(key,) for key, in self._db.execute(
+                    'SELECT key FROM entries ORDER BY used LIMIT ?', (over,))]
+                self._db.executemany('DELETE FROM entries WHERE key = ?', victims)
+                self._db.executemany('DELETE FROM aliases WHERE key = ?', victims)
+            self._count -= len(victims)
+            self.evictions += len(victims)
+
+    def parse_many(self, queries, openurl=True, batch_size=1000):
+        """
+        Parse an iterable of OpenURL queries, yielding records in input
+        order.  Queries are looked up and stored batch_size at a time and
+        only the ones missing from the cache are parsed.  Blank entries are
+        skipped.
+        """
+        batch = []
+        for query in queries:
+            query = query.strip()
+            if not query:
+                continue
+            batch.append(query)
+            if len(batch) >= batch_size:
+                for bib in self._parse_batch(batch, openurl):
+                    yield bib
+                batch = []
+        for bib in self._parse_batch(batch, openurl):
+            yield bib
+
+    def from_openurl(self, query, openurl=True):
+        """
+        Cached equivalent of openurl.from_openurl.
+        """
+        return self._parse_batch([query], openurl)[0]
+
+    def _parse_batch(self, queries, openurl):
+        if not queries:
+            return []
+        raws = [raw_key(query) for query in queries]
+        blobs = self._get_aliased(raws)
+        #Canonicalize the queries that weren't seen verbatim.
+        keys = {}
+        for raw, query in zip(raws, queries):
+            if (raw not in blobs) and (raw not in keys):
+                data = tokenize(query)
+                keys[raw] = (query_key(data, isinstance(query, unicode)), data)
+        found = self._get_blobs([key for key, data in keys.itervalues()])
+        new = {}
+        out = []
+        parser = self._parser
+        for raw in raws:
+            blob = blobs.get(raw)
+            if blob is None:
+                key, data = keys[raw]
+                blob = found.get(key) or new.get(key)
+                if blob is None:
+                    self.misses += 1
+                    parser.load('', query_dict=data)
+                    bib = parser.parse()
+                    new[key] = blob = pickle.dumps(bib, 2)
+                    out.append(_finish(bib, openurl))
+                    continue
+            self.hits += 1
+            out.append(_finish(pickle.loads(blob), openurl))
+        if keys:
+            aliases = [(raw, key) for raw, (key, data) in keys.iteritems()]
+            self._put_blobs(new.iteritems(), aliases)
+        return out
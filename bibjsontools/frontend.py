@@ -0,0 +1,204 @@
+"""
+Concurrent front end for parsing inside request handlers.
+
+ResolverFrontEnd hands queries to a thread or process pool so a server's
+accept loop isn't held up by parsing.  The number of queries in flight is
+bounded: once max_pending is reached submit() blocks, or raises Queue.Full
+with block=False, so bursts are pushed back on the caller instead of
+queueing without limit.  Every request gets a timeout and the front end
+keeps counts and latency percentiles.
+
+    frontend = ResolverFrontEnd(workers=4, mode='process', timeout=0.5)
+    bib = frontend.parse(request.GET)
+    pending = frontend.submit(query, callback=respond)
+"""
+
+import threading
+import time
+from collections import deque
+from multiprocessing import Pool, TimeoutError
+from multiprocessing.pool import ThreadPool
+from Queue import Full
+
+from bibjsontools.openurl import from_dict, from_openurl
+
+MODES = ('thread', 'process')
+
+def _run(query, openurl):
+    """
+    Parse in a worker.  Errors are returned rather than raised so the
+    completion callback always fires.
+    """
+    try:
+        if isinstance(query, dict):
+            return True, from_dict(query, openurl=openurl)
+        return True, from_openurl(query, openurl=openurl)
+    except Exception, e:
+        return False, e
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile of a sequence, p from 0 to 100.  None if empty.
+    """
+    if not values:
+        return
+    values = sorted(values)
+    rank = int(round(p / 100.0 * (len(values) - 1)))
+    return values[rank]
+
+
+class Metrics(object):
+    """
+    Request counts and the latencies, in seconds, of the most recent
+    completed requests.
+    """
+
+    def __init__(self, window=10000):
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, ok, latency):
+        with self._lock:
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+            self.latencies.append(latency)
+
+    def snapshot(self):
+        latencies = list(self.latencies)
+        return {'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'timed_out': self.timed_out,
+                'rejected': self.rejected,
+                'p50': percentile(latencies, 50),
+                'p90': percentile(latencies, 90),
+                'p99': percentile(latencies, 99)}
+
+
+class PendingParse(object):
+    """
+    Handle for a submitted query.
+    """
+
+    def __init__(self, metrics, timeout):
+        self.timeout = timeout
+        self._metrics = metrics
+        self._done = threading.Event()
+        self._outcome = None
+
+    def _set(self, outcome):
+        self._outcome = outcome
+        self._done.set()
+
+    def ready(self):
+        return self._done.is_set()
+
+    def get(self, timeout=None):
+        """
+        Wait for the parsed record.  Raises multiprocessing.TimeoutError if
+        it isn't ready within timeout, or the request's default timeout.
+        Parse errors are re-raised here.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        #Event.wait only returns the flag from Python 2.7.
+        self._done.wait(timeout)
+        if not self._done.is_set():
+            with self._metrics._lock:
+                self._metrics.timed_out += 1
+            raise TimeoutError('query not parsed within %ss' % timeout)
+        ok, value = self._outcome
+        if not ok:
+            raise value
+        return value
+
+
+class ResolverFrontEnd(object):
+    """
+    Bounded pool of parsers.  mode is 'thread' or 'process'; threads keep
+    the caller responsive but share the GIL, processes parse in parallel.
+    """
+
+    def __init__(self, workers=4, mode='thread', max_pending=None,
+                 timeout=None, openurl=True):
+        if mode not in MODES:
+            raise ValueError('mode must be one of %s' % (', '.join(MODES),))
+        self.mode = mode
+        self.workers = workers
+        self.max_pending = max_pending or (workers * 16)
+        self.timeout = timeout
+        self.openurl = openurl
+        self.metrics = Metrics()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        if mode == 'process':
+            self._pool = Pool(workers)
+        else:
+            self._pool = ThreadPool(workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Stop the workers.  Queries still in flight are abandoned.
+        """
+        self._pool.terminate()
+        self._pool.join()
+
+    def submit(self, query, block=True, callback=None, timeout=None):
+        """
+        Queue a query string or request dict.  Returns a PendingParse.
+        callback, if given, is called with the PendingParse from a pool
+        thread once the query has been parsed.
+        """
+        if not self._slots.acquire(block):
+            with self.metrics._lock:
+                self.metrics.rejected += 1
+            raise Full('%d queries already pending' % self.max_pending)
+        with self.metrics._lock:
+            self.metrics.submitted += 1
+        pending = PendingParse(self.metrics, timeout or self.timeout)
+        start = time.time()
+
+        def done(outcome):
+            self._slots.release()
+            self.metrics.record(outcome[0], time.time() - start)
+            pending._set(outcome)
+            if callback:
+                callback(pending)
+
+        try:
+            self._pool.apply_async(_run, (query, self.openurl), callback=done)
+        except Exception:
+            self._slots.release()
+            raise
+        return pending
+
+    def parse(self, query, timeout=None):
+        """
+        Parse one query through the pool and wait for it.
+        """
+        return self.submit(query, timeout=timeout).get()
+
+    def parse_batch(self, queries, timeout=None):
+        """
+        Parse an iterable of queries through the pool, yielding results in
+        input order.  At most max_pending queries are in flight at once.
+        """
+        window = deque()
+        for query in queries:
+            if len(window) >= self.max_pending:
+                yield window.popleft().get()
+            window.append(self.submit(query, timeout=timeout))
+        while window:
+            yield window.popleft().get()
@@ -0,0 +1,163 @@
+"""
+Identifier index and duplicate detection over BibJSON records.
+
+Records are grouped when they share a normalized DOI, PMID, OCLC number,
+ISBN, or ISSN + volume + issue + start page.  Records with none of those
+fall back to a title/year fingerprint.  Every lookup is a hash probe and
+clusters are merged with a union-find, so nothing is compared pairwise.
+"""
+
+import re
+
+from bibjsontools.openurl import classify_identifier
+
+#Identifier types that identify a work on their own.
+WORK_ID_TYPES = ('doi', 'pmid', 'oclc', 'isbn')
+
+_NON_WORD = re.compile(r'\W+', re.U)
+
+def fingerprint(bib):
+    """
+    Title/year fingerprint for records without identifiers, or None.
+    """
+    title = bib.get('title')
+    if (not title) or (title == u'Unknown'):
+        return
+    title = _NON_WORD.sub(u'', title.lower())
+    if not title:
+        return
+    return (title, bib.get('year'))
+
+def match_keys(bib):
+    """
+    Hashable keys a record can be matched on.
+    """
+    keys = []
+    issns = []
+    for idt in bib.get('identifier', []):
+        found = classify_identifier(idt['id'], idt['type'])
+        if not found:
+            continue
+        id_type, v = found
+        if id_type in WORK_ID_TYPES:
+            if id_type == 'doi':
+                #DOIs are case insensitive.
+                v = v.lower()
+            keys.append((id_type, v))
+        elif id_type in ('issn', 'eissn'):
+            issns.append(v)
+    volume = bib.get('volume')
+    spage = bib.get('start_page')
+    if volume and spage and (spage != '?'):
+        for issn in issns:
+            keys.append(('issn', issn, volume, bib.get('issue'), spage))
+    if not keys:
+        fp = fingerprint(bib)
+        if fp:
+            keys.append(('title',) + fp)
+    return keys
+
+
+class BibIndex(object):
+    """
+    Maps normalized identifiers to clusters of record ids.  Records can be
+    added one at a time; a record matching several existing clusters merges
+    them.
+    """
+
+    def __init__(self):
+        self.keys = {}
+        self._parent = {}
+        self._members = {}
+
+    def __len__(self):
+        return len(self._parent)
+
+    def _root(self, record_id):
+        parent = self._parent
+        root = record_id
+        while parent[root] != root:
+            root = parent[root]
+        #Path compression.
+        while parent[record_id] != root:
+            parent[record_id], record_id = root, parent[record_id]
+        return root
+
+    def _union(self, a, b):
+        a, b = self._root(a), self._root(b)
+        if a == b:
+            return a
+        #Merge the smaller cluster into the larger one.
+        if len(self._members[a]) < len(self._members[b]):
+            a, b = b, a
+        self._parent[b] = a
+        self._members[a].extend(self._members.pop(b))
+        return a
+
+    def add(self, record_id, bib):
+        """
+        Index a record.  Returns the id of the cluster it joined.
+        """
+        if record_id in self._parent:
+            raise ValueError('record %r is already indexed' % (record_id,))
+        self._parent[record_id] = record_id
+        self._members[record_id] = [record_id]
+        root = record_id
+        for key in match_keys(bib):
+            seen = self.keys.get(key)
+            if seen is None:
+                self.keys[key] = record_id
+            else:
+                root = self._union(seen, root)
+        return root
+
+    def lookup(self, key):
+        """
+        Cluster id for a match key, e.g. ('doi', 'doi:10.1000/182'), or None.
+        """
+        seen = self.keys.get(key)
+        if seen is None:
+            return
+        return self._root(seen)
+
+    def find(self, bib):
+        """
+        Set of cluster ids an unindexed record would match.
+        """
+        out = set()
+        for key in match_keys(bib):
+            root = self.lookup(key)
+            if root is not None:
+                out.add(root)
+        return out
+
+    def cluster(self, record_id):
+        """
+        Record ids in the same cluster as record_id.
+        """
+        return list(self._members[self._root(record_id)])
+
+    def clusters(self):
+        """
+        Yield each cluster as a list of record ids.
+        """
+        for members in self._members.itervalues():
+            yield list(members)
+
+    def dedupe(self, stream):
+        """
+        Index (record_id, bib) pairs from stream, then yield the clusters.
+        Clusters can still merge until the stream ends, so they are only
+        emitted once it has been read.
+        """
+        for record_id, bib in stream:
+            self.add(record_id, bib)
+        for members in self.clusters():
+            yield members
+
+def dedupe(stream):
+    """
+    Group (record_id, bib) pairs that refer to the same work.  Yields lists
+    of record ids.
+    """
+    return BibIndex().dedupe(stream)
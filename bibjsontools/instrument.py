@@ -0,0 +1,156 @@
+"""
+Opt-in per-stage timing for the parser.
+
+enable() swaps timing wrappers onto the parsing stages and disable() puts
+the originals back, so nothing is added to the hot path while it is off.
+
+    from bibjsontools import instrument
+    stats = instrument.enable(callback=lambda stage, secs: statsd.timing(stage, secs * 1000))
+    ...
+    stats.snapshot()['identifiers']['calls']
+    instrument.disable()
+
+Times are inclusive: parse includes the stages it calls, and memoized
+stages count every call, including the ones answered from the memo.
+"""
+
+import threading
+from timeit import default_timer
+
+from bibjsontools import openurl
+from bibjsontools.openurl import BibJSONToOpenURL, OpenURLParser
+
+#Stage name -> (owner, attribute).  Module functions are patched on the
+#openurl module, which is where the parser looks them up.
+STAGES = (
+    ('tokenize', openurl, 'tokenize'),
+    ('fold', OpenURLParser, '_fold'),
+    ('type', OpenURLParser, 'type'),
+    ('identifiers', OpenURLParser, 'identifiers'),
+    ('classify_identifier', openurl, 'classify_identifier'),
+    ('pull_oclc', openurl, 'pull_oclc'),
+    ('titles', OpenURLParser, 'titles'),
+    ('authors', OpenURLParser, 'authors'),
+    ('pages', OpenURLParser, 'pages'),
+    ('parse', OpenURLParser, 'parse'),
+    ('openurl', BibJSONToOpenURL, 'parse'),
+)
+
+
+class Stats(object):
+    """
+    Call counts and cumulative seconds per stage.  Callbacks are called with
+    (stage, seconds) after every timed call.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.seconds = {}
+        self.callbacks = []
+        self._lock = threading.Lock()
+
+    def record(self, stage, elapsed):
+        with self._lock:
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + elapsed
+        for callback in self.callbacks:
+            callback(stage, elapsed)
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.seconds.clear()
+
+    def snapshot(self):
+        """
+        Dict of stage -> {'calls', 'seconds', 'mean_us'}.
+        """
+        with self._lock:
+            out = {}
+            for stage, calls in self.calls.items():
+                seconds = self.seconds[stage]
+                out[stage] = {'calls': calls,
+                              'seconds': seconds,
+                              'mean_us': seconds / calls * 1e6}
+            return out
+
+    def report(self):
+        """
+        Stages as text, slowest first.
+        """
+        lines = []
+        snap = self.snapshot()
+        for stage in sorted(snap, key=lambda s: -snap[s]['seconds']):
+            s = snap[stage]
+            lines.append('%-20s %10d calls %10.3fs %10.1fus/call' % (
+                stage, s['calls'], s['seconds'], s['mean_us']))
+        return '\n'.join(lines)
+
+#Stats for the current enable(), None when disabled.
+stats = None
+_originals = []
+
+def _timed(stage, func, sink):
+    record = sink.record
+
+    def wrapper(*args, **kwargs):
+        start = default_timer()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record(stage, default_timer() - start)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+def enable(callback=None):
+    """
+    Start timing the parser stages.  Returns the Stats being filled.  If
+    already enabled, adds callback to the current Stats.
+    """
+    global stats
+    if stats is None:
+        sink = Stats()
+        for stage, owner, name in STAGES:
+            original = owner.__dict__[name]
+            if isinstance(original, property):
+                wrapped = property(_timed(stage, original.fget, sink))
+            else:
+                wrapped = _timed(stage, original, sink)
+            _originals.append((owner, name, original))
+            setattr(owner, name, wrapped)
+        stats = sink
+    if callback is not None:
+        stats.callbacks.append(callback)
+    return stats
+
+def disable():
+    """
+    Put the original stages back.  Returns the final Stats, or None if
+    instrumentation wasn't enabled.
+    """
+    global stats
+    while _originals:
+        owner, name, original = _originals.pop()
+        setattr(owner, name, original)
+    final, stats = stats, None
+    return final
+
+
+class instrumented(object):
+    """
+    Context manager that enables instrumentation for a block.
+
+        with instrumented() as stats:
+            list(parse_many(queries))
+        print stats.report()
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+
+    def __enter__(self):
+        return enable(self.callback)
+
+    def __exit__(self, *exc):
+        disable()
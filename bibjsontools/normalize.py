@@ -0,0 +1,260 @@
+"""
+Batch normalization of raw dates, volumes and pages.
+
+parse() keeps dates and pages much as they arrive: year is date[:4] and
+pages is a 'start - end' string with EOA and ? placeholders.  For sorting
+and range queries over many records, BatchNormalizer turns lists of raw
+rft.date, volume, spage, epage and pages values into ISO dates and integer
+years, volumes and start/end pages.  The same raw values repeat heavily in
+resolver traffic, so each distinct value is only worked out once.
+
+Integer columns use MISSING for absent or unreadable values, so they stay
+integer typed.  Columns are NumPy arrays when NumPy is installed and lists
+otherwise.
+
+    raw = raw_columns(open('resolver.log'))
+    cols = BatchNormalizer().normalize(**raw)
+    cols['start_page'], cols['date']
+"""
+
+import calendar
+import re
+
+from bibjsontools.openurl import OpenURLParser
+from bibjsontools.optional import installed
+
+#NumPy is only imported once a normalizer builds arrays.
+HAVE_NUMPY = installed('numpy')
+
+#Integer value for missing or unreadable input.
+MISSING = -1
+#Distinct values remembered per kind of field.
+MEMO_SIZE = 100000
+#Largest value an integer array holds; junk numbers past it are MISSING.
+INT_MAX = 2 ** 63 - 1
+
+#2010, 2010-02, 2010-02-11, 2010/2/11, 2013-01-01T00:00:00Z
+_SEPARATED_DATE = re.compile(r'\s*(\d{4})(?:[-/.](\d{1,2})(?:[-/.](\d{1,2}))?)?(?!\d)')
+#201002, 20100211
+_COMPACT_DATE = re.compile(r'\s*(\d{4})(\d{2})(\d{2})?\s*$')
+#A year anywhere, e.g. 'Spring 2009' or '02/11/2010'.
+_YEAR = re.compile(r'(?<!\d)(1\d{3}|20\d{2})(?!\d)')
+_MONTH = re.compile(r'\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)', re.I)
+_MONTHS = dict((name, i + 1) for i, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec')))
+
+#25-57, 25 - 57, S12-S20, 123-45, 25 to 57, and en or em dashes.
+_PAGE_RANGE = re.compile(u'\\s*(?:pp?\\.\\s*)?[A-Za-z]*(\\d+)\\s*(?:-+|\u2013|\u2014|to)\\s*[A-Za-z]*(\\d+)')
+#25, p. 25, S12, e1001
+_PAGE = re.compile(r'\s*(?:pp?\.\s*)?[A-Za-z]*(\d+)')
+#16, v. 16, vol 16, 16(5)
+_VOLUME = re.compile(r'\s*(?:v(?:ol)?\.?\s*)?(\d+)', re.I)
+_ROMAN = re.compile(r'\s*([ivxlcdm]+)\s*$', re.I)
+_ROMAN_VALUES = {'i': 1, 'v': 5, 'x': 10, 'l': 50, 'c': 100, 'd': 500, 'm': 1000}
+
+#Memo sentinel; None is a valid result.
+_UNSET = object()
+
+def normalize_date(value):
+    """
+    ISO 8601 form of a raw date, to the precision it gives: 2010,
+    2010-02 or 2010-02-11.  None if no year can be found.
+    """
+    if not value:
+        return
+    match = _COMPACT_DATE.match(value) or _SEPARATED_DATE.match(value)
+    if match:
+        year, month, day = match.groups()
+    else:
+        match = _YEAR.search(value)
+        if match is None:
+            return
+        year, day = match.group(1), None
+        month = _MONTH.search(value)
+        month = month and str(_MONTHS[month.group(1).lower()])
+    year = int(year)
+    if not year:
+        return
+    month = int(month) if month else 0
+    if not 1 <= month <= 12:
+        return '%04d' % year
+    day = int(day) if day else 0
+    if not 1 <= day <= calendar.monthrange(year, month)[1]:
+        return '%04d-%02d' % (year, month)
+    return '%04d-%02d-%02d' % (year, month, day)
+
+def normalize_volume(value):
+    """
+    Volume number as an int, reading roman numerals.  MISSING if there
+    isn't one.
+    """
+    if not value:
+        return MISSING
+    match = _VOLUME.match(value)
+    if match:
+        return int(match.group(1))
+    match = _ROMAN.match(value)
+    if match:
+        total = 0
+        digits = [_ROMAN_VALUES[c] for c in match.group(1).lower()]
+        for i, v in enumerate(digits):
+            if (i + 1 < len(digits)) and (v < digits[i + 1]):
+                total -= v
+            else:
+                total += v
+        return total
+    return MISSING
+
+def _expand(start, end):
+    """
+    End page from the digits of a range that ends before it starts,
+    reading 123-45 as 123-145.  MISSING if that doesn't help.
+    """
+    if len(end) < len(start):
+        full = int(start[:len(start) - len(end)] + end)
+        if full >= int(start):
+            return full
+    return MISSING
+
+def normalize_pages(spage, epage=None, pages=None):
+    """
+    (start, end) integer pages from raw spage, epage and pages values.
+    Placeholders such as ? and EOA, and anything else without a number,
+    give MISSING.
+    """
+    start = end = MISSING
+    start_text = spage and _PAGE.match(spage)
+    end_text = epage and _PAGE.match(epage)
+    if start_text:
+        start_text = start_text.group(1)
+        start = int(start_text)
+    if end_text:
+        end_text = end_text.group(1)
+        end = int(end_text)
+    if pages and ((start == MISSING) or (end == MISSING)):
+        match = _PAGE_RANGE.match(pages)
+        if match:
+            if start == MISSING:
+                start_text = match.group(1)
+                start = int(start_text)
+            if end == MISSING:
+                end_text = match.group(2)
+                end = int(end_text)
+        elif start == MISSING:
+            match = _PAGE.match(pages)
+            if match:
+                start_text = match.group(1)
+                start = int(start_text)
+    if (start != MISSING) and (end != MISSING) and (end < start):
+        end = _expand(start_text, end_text)
+    return start, end
+
+def _date_year(value):
+    iso = normalize_date(value)
+    return iso, (int(iso[:4]) if iso else MISSING)
+
+
+class BatchNormalizer(object):
+    """
+    Normalizes columns of raw values.  Each distinct raw value is worked
+    out once and remembered, up to memo_size values per kind of field.
+
+    arrays picks the output type: NumPy arrays when True, lists when False
+    and NumPy arrays if NumPy is installed when None.
+    """
+
+    def __init__(self, arrays=None, memo_size=MEMO_SIZE):
+        if arrays is None:
+            arrays = HAVE_NUMPY
+        elif arrays and not HAVE_NUMPY:
+            raise ImportError('arrays=True requires numpy')
+        self.arrays = arrays
+        self.memo_size = memo_size
+        self._memos = {}
+
+    def _map(self, name, func, keys):
+        memo = self._memos.setdefault(name, {})
+        size = self.memo_size
+        out = []
+        append = out.append
+        for key in keys:
+            v = memo.get(key, _UNSET)
+            if v is _UNSET:
+                v = func(*key) if isinstance(key, tuple) else func(key)
+                if len(memo) < size:
+                    memo[key] = v
+            append(v)
+        return out
+
+    def _ints(self, values):
+        if self.arrays:
+            import numpy
+            return numpy.array([v if v <= INT_MAX else MISSING for v in values],
+                               dtype=numpy.int64)
+        return values
+
+    def _objects(self, values):
+        if self.arrays:
+            import numpy
+            return numpy.array(values, dtype=object)
+        return values
+
+    def dates(self, values):
+        """
+        (ISO dates, years) for a sequence of raw dates.
+        """
+        pairs = self._map('date', _date_year, values)
+        return (self._objects([p[0] for p in pairs]),
+                self._ints([p[1] for p in pairs]))
+
+    def volumes(self, values):
+        return self._ints(self._map('volume', normalize_volume, values))
+
+    def pages(self, spages, epages=None, pages=None):
+        """
+        (start pages, end pages) for parallel sequences of raw spage,
+        epage and pages values.  epages and pages may be left out.
+        """
+        n = len(spages)
+        keys = zip(spages, epages or [None] * n, pages or [None] * n)
+        pairs = self._map('pages', normalize_pages, keys)
+        return (self._ints([p[0] for p in pairs]),
+                self._ints([p[1] for p in pairs]))
+
+    def normalize(self, date=None, volume=None, spage=None, epage=None, pages=None):
+        """
+        Dict of normalized columns, date, year, volume, start_page and
+        end_page, for whichever raw columns are given.
+        """
+        out = {}
+        if date is not None:
+            out['date'], out['year'] = self.dates(date)
+        if volume is not None:
+            out['volume'] = self.volumes(volume)
+        if spage is not None:
+            out['start_page'], out['end_page'] = self.pages(spage, epage, pages)
+        elif pages is not None:
+            out['start_page'], out['end_page'] = self.pages([None] * len(pages),
+                                                            epage, pages)
+        return out
+
+#Raw fields read by raw_columns, by parser field name.
+RAW_FIELDS = ('date', 'volume', 'spage', 'epage', 'pages')
+
+def raw_columns(queries):
+    """
+    Dict of raw field -> list of values, None where absent, for an
+    iterable of OpenURL queries.  Blank queries are skipped.
+    """
+    out = dict((name, []) for name in RAW_FIELDS)
+    columns = [(out[name], name) for name in RAW_FIELDS]
+    parser = OpenURLParser('')
+    field = parser._field
+    for query in queries:
+        query = query.strip()
+        if not query:
+            continue
+        parser.load(query)
+        for column, name in columns:
+            column.append(field(name))
+    return out
@@ -2,25 +2,388 @@
 Converting OpenURLs to BibJSON and back.
 """
 
-import urllib
-try:
-    from urlparse import parse_qs
-except ImportError:
-    from cgi import parse_qs
+import re
+#urllib itself pulls in socket and ssl, so it isn't imported; quoting is
+#done by quote_value.
+from urlparse import unquote
+
+#Version of the parsing logic.  Bump it whenever parse() output changes so
+#results saved by persistent caches are thrown away.
+PARSER_VERSION = 2
 
 #List of keys that should be present in any bibjson object.
 REQUIRED_KEYS = ['title']
 
+#Canonical field slots and the OpenURL keys that feed them, in order of
+#preference.  The first alias with a value wins.
+KEY_ALIASES = {
+    'genre': ('rft.genre', 'genre'),
+    'format': ('rft_val_fmt',),
+    'atitle': ('rft.atitle', 'atitle'),
+    'btitle': ('rft.btitle', 'btitle'),
+    #Article or book titles will be set to bibjson title.
+    #These are in order of prefernce, short titles are last.
+    'title': ('rft.atitle',
+              'atitle',
+              'rft.btitle',
+              'btitle',
+              'rft.title',
+              'title',
+              #Abbreviated or short journal title. This is used for journal title abbreviations, where known, i.e. "J Am Med Assn"
+              'stitle',
+              'rft.stitle'),
+    'jtitle': ('rft.jtitle',
+               'jtitle',
+               'rft.btitle',
+               'btitle',
+               'rft.title',
+               'title'),
+    'stitle': ('rft.stitle', 'stitle'),
+    #Identifiers - using both the standard and what's found in typical OpenURLs
+    #OCLC numbers in pid and rfe_dat are handled by pull_oclc.
+    'id': ('rft.id', 'rft_id', 'id', 'doi', 'pmid'),
+    'isbn': ('rft.isbn', 'isbn'),
+    'issn': ('rft.issn', 'issn'),
+    'eissn': ('rft.eissn', 'eissn'),
+    'author': ('rft.au', 'au', 'rft.aulast', 'aulast', 'rft.auinitm', 'auinitm'),
+    'aulast': ('rft.aulast', 'aulast'),
+    'aufirst': ('rft.aufirst', 'aufirst'),
+    'auinitm': ('rft.auinitm', 'auinitm'),
+    'pages': ('rft.pages', 'pages'),
+    'spage': ('rft.spage', 'spage'),
+    'epage': ('rft.epage', 'epage'),
+    'rfr': ('rfr_id', 'sid', 'id'),
+    'publisher': ('rft.pub', 'pub', 'rft.publisher', 'publisher'),
+    'place': ('rft.place', 'place'),
+    'volume': ('rft.volume', 'volume'),
+    'issue': ('rft.issue', 'issue'),
+    'date': ('rft.date', 'date'),
+}
+
+def _build_alias_index(aliases):
+    """
+    Invert KEY_ALIASES into key -> ((field, rank), ...) so a query can be
+    folded into field slots in a single pass over its keys.
+    """
+    index = {}
+    for field, keys in aliases.items():
+        for rank, k in enumerate(keys):
+            index.setdefault(k, []).append((field, rank))
+    return dict((k, tuple(v)) for k, v in index.items())
+
+ALIAS_INDEX = _build_alias_index(KEY_ALIASES)
+
+#Keys read directly, outside of the alias table (see pull_oclc).
+EXTRA_KEYS = frozenset(['rfr_id', 'rfe_dat', 'pid'])
+
+#Every key the parser reads.  Anything else in a query is skipped.
+PARSED_KEYS = frozenset(ALIAS_INDEX) | EXTRA_KEYS
+
+def _unquote(v):
+    """
+    Percent-decode a query value.  Escapes in a unicode value are read as
+    UTF-8, or as Latin-1 when they aren't valid UTF-8, so u'Caf%C3%A9' and
+    u'Caf%E9' both give u'Caf\xe9'.  Byte strings decode to byte strings.
+    """
+    v = v.replace('+', ' ')
+    if isinstance(v, unicode):
+        try:
+            return unquote(v.encode('utf-8')).decode('utf-8')
+        except UnicodeDecodeError:
+            pass
+    return unquote(v)
+
+def tokenize(query):
+    """
+    Split a query into a dict of key -> list of values, like parse_qs, but
+    only for the keys the parser reads.  Values of other parameters, often
+    large rfe_dat/pid style blobs and session ids, are never decoded.
+
+    Queries may be byte strings or unicode; see _unquote for how escapes
+    in each are read.
+    """
+    out = {}
+    if ';' in query:
+        #parse_qs treats ; as a separator too.
+        query = query.replace(';', '&')
+    for chunk in query.split('&'):
+        k, sep, v = chunk.partition('=')
+        if not v:
+            continue
+        if k not in PARSED_KEYS:
+            if ('%' not in k) and ('+' not in k):
+                continue
+            #Percent-encoded key names are rare but legal.
+            k = _unquote(k)
+            if k not in PARSED_KEYS:
+                continue
+        if ('+' in v) or ('%' in v):
+            v = _unquote(v)
+        if k in out:
+            out[k].append(v)
+        else:
+            out[k] = [v]
+    return out
+
+#Author keys holding a full name or a last name.
+FULL_NAME_KEYS = frozenset(['rft.au', 'au'])
+LAST_NAME_KEYS = frozenset(['rft.aulast', 'aulast'])
+
+def _at(values, i):
+    if i < len(values):
+        return values[i]
+
+def _author(name, last, first, initm):
+    """
+    Author dict, with the name put together from last and first if there
+    isn't a full one.
+    """
+    au = {}
+    if name:
+        au['name'] = name
+    if last:
+        au['lastname'] = last
+    if first:
+        au['firstname'] = first
+    if initm:
+        au['_minitial'] = initm
+    #Put the full name (minus middlename) together now if we can.
+    if not name:
+        #If there isn't a first and last name, just use last.
+        name = "%s, %s" % (last or '', (first or '').strip())
+        au['name'] = name.rstrip(', ')
+    return au
+
+def memoized(method):
+    """
+    Cache the result of a no-argument parser method on the instance.  The
+    cache is cleared whenever the parser loads a new query.
+    """
+    name = method.__name__
+    def wrapper(self):
+        cache = self._cache
+        if name in cache:
+            return cache[name]
+        value = cache[name] = method(self)
+        return value
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+def _own_containers(d):
+    """
+    Give a result its own identifier, author and journal containers.  The
+    memoized ones stay with the parser, so changing a returned record can't
+    alter a later parse of the same query.
+    """
+    for k in ('identifier', 'author'):
+        if d.get(k):
+            d[k] = [dict(v) for v in d[k]]
+    if d.get('journal'):
+        d['journal'] = dict(d['journal'])
+
+#BibJSON keys and how to pull each one from a parser.  Used for partial
+#parsing so that only the facets a caller asks for are computed.
+FIELD_GETTERS = {
+    'type': lambda p: p.type,
+    '_rfr': lambda p: p.rfr(),
+    'identifier': lambda p: p.identifiers(),
+    'title': lambda p: p._field('title'),
+    'journal': lambda p: p.journal(),
+    'author': lambda p: p.authors(),
+    'publisher': lambda p: p._field('publisher'),
+    'place_of_publication': lambda p: p._field('place'),
+    'volume': lambda p: p._field('volume'),
+    'issue': lambda p: p._field('issue'),
+    'year': lambda p: p.year(),
+    'pages': lambda p: p.pages()['pages'],
+    'start_page': lambda p: p.pages()['start_page'],
+    'end_page': lambda p: p.pages()['end_page'],
+}
+
+#String fields that repeat across records, shared through an InternPool.
+SHARED_FIELDS = ('_rfr', 'publisher', 'place_of_publication', 'volume',
+                 'issue', 'year')
+
+
+class LazyBibJSON(dict):
+    """
+    BibJSON dict that builds its _openurl on first use.  Looking up
+    _openurl, iterating, comparing or serializing to JSON fills it in; other
+    key access behaves like a plain dict and never pays for it.
+
+    dict(b), {}.update(b) and f(**b) read the underlying dict directly and
+    leave _openurl out if it hasn't been built yet.  Use b.copy() for a
+    plain dict with every key.
+    """
+    __slots__ = ('_pending',)
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self._pending = not dict.__contains__(self, '_openurl')
+
+    def _materialize(self):
+        if self._pending:
+            self._pending = False
+            dict.__setitem__(self, '_openurl', BibJSONToOpenURL(self).parse())
+
+    def __missing__(self, k):
+        if (k == '_openurl') and self._pending:
+            self._materialize()
+            return dict.__getitem__(self, k)
+        raise KeyError(k)
+
+    def get(self, k, default=None):
+        if k == '_openurl':
+            self._materialize()
+        return dict.get(self, k, default)
+
+    def __contains__(self, k):
+        if k == '_openurl':
+            self._materialize()
+        return dict.__contains__(self, k)
+
+    def has_key(self, k):
+        return self.__contains__(k)
+
+    def __delitem__(self, k):
+        if k == '_openurl':
+            self._pending = False
+        dict.__delitem__(self, k)
+
+    def __setitem__(self, k, v):
+        if k == '_openurl':
+            self._pending = False
+        dict.__setitem__(self, k, v)
+
+    def pop(self, k, *default):
+        if k == '_openurl':
+            self._materialize()
+        return dict.pop(self, k, *default)
+
+    def setdefault(self, k, default=None):
+        if k == '_openurl':
+            self._materialize()
+        return dict.setdefault(self, k, default)
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        #A supplied _openurl replaces the built one.
+        if self._pending and dict.__contains__(self, '_openurl'):
+            self._pending = False
+
+    def __eq__(self, other):
+        self._materialize()
+        if isinstance(other, LazyBibJSON):
+            other._materialize()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __reduce__(self):
+        self._materialize()
+        return (dict, (dict(self),))
+
+#Whole-dict operations materialize _openurl before handing off to dict.
+def _materializing(name):
+    method = getattr(dict, name)
+    def wrapper(self, *args):
+        self._materialize()
+        return method(self, *args)
+    wrapper.__name__ = name
+    return wrapper
+
+for _name in ('__iter__', '__len__', '__repr__', 'copy',
+              'keys', 'values', 'items', 'iterkeys', 'itervalues',
+              'iteritems', 'viewkeys', 'viewvalues', 'viewitems', 'popitem'):
+    #Python 2.6 dicts have no views.
+    if hasattr(dict, _name):
+        setattr(LazyBibJSON, _name, _materializing(_name))
+del _name
+
 
 class OpenURLParser(object):
 
-    def __init__(self, openurl, query_dict=None):
+    def __init__(self, openurl, query_dict=None, pool=None):
+        #Optional pool.InternPool shared across parses.
+        self.pool = pool
+        self.load(openurl, query_dict=query_dict)
+
+    def load(self, openurl, query_dict=None):
+        """
+        Point the parser at a new query.  Lets batch callers reuse one
+        parser rather than building a new one for every record.
+        """
         if query_dict:
+            self.query = None
             self.data = query_dict
         else:
             self.query = openurl
-            self.data = parse_qs(openurl)
+            self.data = tokenize(openurl)
+        self.fields = self._fold(self.data)
+        self._cache = {}
+
+    def _fold(self, data):
+        """
+        Fold the query into canonical field slots.  Each slot is a list of
+        (rank, key, values) tuples, keeping only keys that have values.
+        """
+        slots = {}
+        index = ALIAS_INDEX
+        for k, v in data.iteritems():
+            if (not v) or (k not in index):
+                continue
+            for field, rank in index[k]:
+                if field in slots:
+                    slots[field].append((rank, k, v))
+                else:
+                    slots[field] = [(rank, k, v)]
+        return slots
+
+    def _field(self, field):
+        """
+        First value for a canonical field, honoring alias precedence.
+        """
+        slot = self.fields.get(field)
+        if slot:
+            return min(slot)[2][0]
+        return
+
+    def _field_values(self, field):
+        """
+        Unique set of values across every alias of a canonical field.
+        """
+        out = set()
+        for rank, k, v in self.fields.get(field, ()):
+            out.update(v)
+        return out
+
+    def _field_list(self, field):
+        """
+        All values of the highest ranked key for a canonical field.
+        """
+        slot = self.fields.get(field)
+        if slot:
+            return min(slot)[2]
+        return ()
+
+    def _field_keys(self, field):
+        """
+        Dict of key -> values for a canonical field.
+        """
+        return dict((k, v) for rank, k, v in self.fields.get(field, ()))
+
+    def _field_items(self, field):
+        """
+        List of key,values tuples for a canonical field, in alias order.
+        """
+        return [(k, v) for rank, k, v in sorted(self.fields.get(field, ()))]
 
+    #The _find_* helpers look keys up in the raw query dict, as the parser
+    #did before KEY_ALIASES.  The parser itself uses _field and friends;
+    #these stay for existing callers and are the reference the alias
+    #precedence is tested against.
     def _find_key(self, key_list, this_dict=None):
         """
         Utility to get the first matching value from a list of possible keys.
@@ -63,14 +426,15 @@ class OpenURLParser(object):
         return out
 
     @property
+    @memoized
     def type(self):
         """
         Determine the type of citation.  Defaults to book.
         """
         #Defaulting to type of book.
         btype = 'book'
-        genre = self._find_key(['rft.genre', 'genre'])
-        format = self._find_key(['rft_val_fmt'])
+        genre = self._field('genre')
+        format = self._field('format')
 
         if format:
             if 'journal' in format:
@@ -91,79 +455,44 @@ class OpenURLParser(object):
                 elif 'dissertation' in genre:
                     return 'dissertation'
         #Try to guess based on incoming values.
-        elif self._find_key(['rft.atitle', 'atitle']):
+        elif self._field('atitle'):
             btype = 'article'
-        elif self._find_key(['rft.btitle', 'btitle']):
+        elif self._field('btitle'):
             btype = 'book'
         return btype
 
+    @memoized
     def identifiers(self):
         """
         Pull the identifiers.  This should be common to all types.
         """
         out = []
-        #Identifiers - using both the standard and what's found in typical OpenURLs
-        ids = self._find_key_values(['rft.id',
-                                     'rft_id',
-                                     'id',
-                                     'doi',
-                                     'pmid',
-                                     'pid',
-                                     'rfe_dat'])
-        for k, values in ids:
+        for k, values in self._field_items('id'):
+            #Bare doi= and pmid= values are taken at their word.
+            hint = ID_KEY_HINTS.get(k)
             for v in values:
                 #Remove line breaks from values.
                 v = v.replace('\n', '')
-                if v == '':
-                    continue
-                d = {}
-                d['id'] = None
-                d['type'] = None
-                #DOIS and PMIDS in the id
-                if (k == 'rft.id') or (k == 'rft_id') or (k == 'id'):
-                    if v.startswith('info:doi/'):
-                        #referent['doi'] = v.lstrip('info:doi/')
-                        d['type'] = 'doi'
-                        d['id'] = "doi:%s" % v.lstrip('info:doi/')
-                    elif v.startswith('doi:'):
-                        d['type'] = 'doi'
-                        d['id'] = "%s" % v
-                    elif v.startswith('info:pmid/'):
-                        d['type'] = 'pmid'
-                        d['id'] = v
-                    #Handle pubmed IDs coming in like this pmid:18539564
-                    elif v.startswith('pmid'):
-                        d['type'] = 'pmid'
-                        d['id'] = 'info:%s' % v.replace(':', '/')
-                #OCLC
-                #elif (((k == 'rfe_dat') or (k =='pid')) and ('accessionnumber' in v)):
-                #    d['type'] = 'oclc'
-                #    d['id'] = v.replace('<accessionnumber>', '').replace('</accessionnumber>', '')
-                #Other ids from the wild
-                elif k == 'pmid':
-                    d['type'] = 'pmid'
-                    d['id'] = v
-                elif k == 'doi':
-                    d['type'] = 'doi'
-                    d['id'] = "doi:%s" % v
-                #Check for blank dois
-                if d['id'] == "doi:":
-                    continue
-                #If we found an id add it to the output.
-                if d['id']:
-                    out.append(d)
+                found = classify_identifier(v, hint)
+                #Only DOIs and PMIDs are taken from the id keys.
+                if found and (found[0] in ('doi', 'pmid')):
+                    if hint == 'pmid':
+                        #pmid= values are passed through as given; lookups
+                        #normalize them with classify_identifier.
+                        found = (found[0], v)
+                    out.append({'type': found[0], 'id': found[1]})
         #ISBNS and ISSNs are more straightforward so will handle them separately.
-        for isbn in self._find_repeating_key(['rft.isbn', 'isbn']):
+        for isbn in self._field_values('isbn'):
             #These are repated on occassion
             for isn in isbn.split():
                 out.append({'type': 'isbn',
                             'id': isn})
-        for issn in self._find_repeating_key(['rft.issn', 'issn']):
+        for issn in self._field_values('issn'):
             #These are repated on occassion
             for isn in issn.split():
                 out.append({'type': 'issn',
                             'id': isn})
-        for eissn in self._find_repeating_key(['rft.eissn', 'eissn']):
+        for eissn in self._field_values('eissn'):
             out.append({'type': 'eissn',
                         'id': eissn})
         #OCLCs
@@ -172,93 +501,81 @@ class OpenURLParser(object):
             out.append({'type': 'oclc', 'id': oclc})
         return out
 
+    @memoized
     def titles(self):
         out = {}
-        #Article or book titles will be set to bibjson title.
-        #These are in order of prefernce, short titles are last.
-        out['title'] = self._find_key(
-            [
-                'rft.atitle',
-                'atitle',
-                'rft.btitle',
-                'btitle',
-                'rft.title',
-                'title',
-                #Abbreviated or short journal title. This is used for journal title abbreviations, where known, i.e. "J Am Med Assn"
-                'stitle',
-                'rft.stitle'
-            ]
-        )
+        out['title'] = self._field('title')
         #Journal title
+        journal = self.journal()
+        if journal:
+            out['journal'] = journal
+        return out
+
+    @memoized
+    def journal(self):
+        """
+        Journal or containing book title for articles and book chapters.
+        """
         if self.type in ['article', 'inbook']:
-            jtitle = self._find_key(['rft.jtitle',
-                                     'jtitle',
-                                     'rft.btitle',
-                                     'btitle',
-                                     'rft.title',
-                                     'title'])
+            jtitle = self._field('jtitle')
             if jtitle:
                 ti = {'name': jtitle}
                 #Try to pull short title code.
-                stitle = self.data.get('rft.stitle', None)
-                if not stitle:
-                    stitle = self.data.get('stitle', None)
-                if stitle:
-                    ti['shortcode'] = stitle[0]
-                out['journal'] = ti
-        return out
+                stitle = self._field('stitle')
+                if stitle is not None:
+                    ti['shortcode'] = stitle
+                return ti
+        return
 
+    @memoized
     def authors(self):
         """
         Pull authors.  Less straightforward than you might think.
+
+        Full names from au are taken as they are.  Each aulast value is
+        paired with the aufirst and auinitm values at the same position,
+        from the same rft. or bare family of keys where there is one.
         """
         out = []
-        authors = self._find_key_values([
-                                        'rft.au',
-                                        'au',
-                                        'rft.aulast',
-                                        'aulast',
-                                        'rft.auinitm',
-                                        'auinitm'])
-        for k,values in authors:
-            for v in values:
-                if (k == 'rft.au') or (k == 'au') or\
-                    (k == 'rft.aulast') or (k == 'aulast'):
-                    #If it's a full name, set here.
-                    if (k == 'rft.au') or (k == 'au'):
-                        au = {'name': v}
-                    else:
-                        au = {}
-                    aulast = self._find_key(['rft.aulast', 'aulast'])
-                    if aulast:
-                        au['lastname'] = aulast
-                    aufirst = self._find_key(['rft.aufirst', 'aufirst'])
-                    if aufirst:
-                        au['firstname'] = aufirst
-                    auinitm = self._find_key( ['rft.auinitm', 'auinitm'] )
-                    if auinitm:
-                        au['_minitial'] = auinitm
-                    #Put the full name (minus middlename) together now if we can.
-                    if not au.has_key('name'):
-                        #If there isn't a first and last name, just use last.
-                        last = au.get('lastname', '')
-                        first = au.get('firstname', '')
-                        name = "%s, %s" % (last, first.strip())
-                        au['name'] = name.rstrip(', ')
-                    #Don't duplicate authors
-                    if au not in out:
-                        out.append(au)
+        seen = set()
+        firsts = self._field_keys('aufirst')
+        initms = self._field_keys('auinitm')
+        best_first = self._field_list('aufirst')
+        best_initm = self._field_list('auinitm')
+        for k, values in self._field_items('author'):
+            if k in FULL_NAME_KEYS:
+                #The first last/first/middle values are added to full names.
+                last = self._field('aulast')
+                first = _at(best_first, 0)
+                initm = _at(best_initm, 0)
+                pairs = [(v, last, first, initm) for v in values]
+            elif k in LAST_NAME_KEYS:
+                prefix = k[:-len('aulast')]
+                first_values = firsts.get(prefix + 'aufirst', best_first)
+                initm_values = initms.get(prefix + 'auinitm', best_initm)
+                pairs = [(None, v, _at(first_values, i), _at(initm_values, i))
+                         for i, v in enumerate(values)]
+            else:
+                continue
+            for name, last, first, initm in pairs:
+                au = _author(name, last, first, initm)
+                #Don't duplicate authors
+                key = tuple(sorted(au.iteritems()))
+                if key not in seen:
+                    seen.add(key)
+                    out.append(au)
         return out
 
+    @memoized
     def pages(self):
         """
         Try to set start, end page and pages.
         """
         out = {}
         #Pages
-        out['pages'] = self._find_key(['rft.pages', 'pages'])
-        start = self._find_key(['rft.spage', 'spage'])
-        end = self._find_key(['rft.epage', 'epage'])
+        out['pages'] = self._field('pages')
+        start = self._field('spage')
+        end = self._field('epage')
         if (not out['pages']):
             if start:
                 #Default end_page is EOA - end of article
@@ -284,17 +601,62 @@ class OpenURLParser(object):
         Get the referring site.
         """
         #try the usual suspects
-        r = self._find_key(['rfr_id', 'sid', 'id'])
+        r = self._field('rfr')
         if r:
             return r
 
+    def year(self):
+        """
+        Four digit year from the date.
+        """
+        year = self._field('date')
+        if year:
+            return year[:4]
+        return
 
-    def parse(self):
+    def parse_fields(self, fields):
+        """
+        Partial parse.  Return only the requested BibJSON fields, computing
+        just the facets needed for them.  Empty fields are left out, except
+        required keys which are set to Unknown as in parse().
+        """
+        if '_openurl' in fields:
+            d = self.parse()
+            return dict((k, d[k]) for k in fields if k in d)
+        d = {}
+        for k in fields:
+            v = FIELD_GETTERS[k](self)
+            if v:
+                d[k] = v
+            elif k in REQUIRED_KEYS:
+                d[k] = u'Unknown'
+        _own_containers(d)
+        if self.pool is not None:
+            self._share(d)
+        return d
+
+    def _share(self, d):
+        """
+        Swap the repetitive string values in d for their pooled copies.
+        """
+        intern = self.pool.intern
+        for k in SHARED_FIELDS:
+            if k in d:
+                d[k] = intern(d[k])
+        journal = d.get('journal')
+        if journal:
+            for k in journal:
+                journal[k] = intern(journal[k])
+
+    def parse(self, openurl=True, record_class=None):
         """
         Create and return the bibjson.
+
+        openurl controls the regenerated _openurl key: True adds it, False
+        leaves it out and 'lazy' returns a LazyBibJSON that only builds it
+        if it is used.  record_class, e.g. record.BibRecord, is built from
+        the dict with its from_bibjson() in place of returning the dict.
         """
-        #from pprint import pprint
-        #pprint(self.data)
         d = {}
         d['type'] = self.type
         #Referrer
@@ -303,17 +665,15 @@ class OpenURLParser(object):
         d.update(self.titles())
         d['author'] = self.authors()
         #Publisher
-        d['publisher'] = self._find_key(['rft.pub', 'pub', 'rft.publisher', 'publisher'])
+        d['publisher'] = self._field('publisher')
         #Place - not sure how BibJSON would officially handle this
-        d['place_of_publication'] = self._find_key(['rft.place', 'place'])
+        d['place_of_publication'] = self._field('place')
         #Volume
-        d['volume'] = self._find_key(['rft.volume', 'volume'])
+        d['volume'] = self._field('volume')
         #Issue
-        d['issue'] = self._find_key(['rft.issue', 'issue'])
+        d['issue'] = self._field('issue')
         #Date/Year
-        year = self._find_key(['rft.date', 'date'])
-        if year:
-            d['year'] = year[:4]
+        d['year'] = self.year()
         #Pages
         d.update(self.pages())
         #Remove empty keys - except those in the required keys list.
@@ -324,24 +684,110 @@ class OpenURLParser(object):
                     d[k] = u'Unknown'
                 else:
                     del d[k]
+        _own_containers(d)
+        if self.pool is not None:
+            self._share(d)
+        if record_class is not None:
+            if openurl and (openurl != 'lazy'):
+                d['_openurl'] = BibJSONToOpenURL(d).parse()
+            return record_class.from_bibjson(d, openurl=openurl)
+        if openurl == 'lazy':
+            return LazyBibJSON(d)
         #add the original openurl
-        d['_openurl'] = BibJSONToOpenURL(d).parse()
+        if openurl:
+            d['_openurl'] = BibJSONToOpenURL(d).parse()
         return d
 
-def from_openurl(query):
+def from_openurl(query, openurl=True, record_class=None, pool=None):
     """
     Alias/shortcut to parse the provided query.
     """
-    b = OpenURLParser(query)
-    return b.parse()
+    b = OpenURLParser(query, pool=pool)
+    return b.parse(openurl=openurl, record_class=record_class)
 
-def from_dict(request_dict):
+def from_dict(request_dict, openurl=True, record_class=None, pool=None):
     """
     Alias/shortcut to handle dictionary inputs.
     Use for this is passing Django request.GET as dict.
     """
-    b = OpenURLParser('', query_dict=request_dict)
-    return b.parse()
+    b = OpenURLParser('', query_dict=request_dict, pool=pool)
+    return b.parse(openurl=openurl, record_class=record_class)
+
+def parse_many(queries, openurl=True, record_class=None, pool=None):
+    """
+    Lazily parse an iterable of OpenURL query strings, yielding one BibJSON
+    dict per query.  Blank entries are skipped and a single parser is reused
+    for the whole batch so memory stays flat regardless of input size.
+    Pass a pool.InternPool to share repeated strings between records.
+    """
+    parser = OpenURLParser('', pool=pool)
+    for query in queries:
+        query = query.strip()
+        if not query:
+            continue
+        parser.load(query)
+        yield parser.parse(openurl=openurl, record_class=record_class)
+
+def from_openurl_stream(fileobj, openurl=True, record_class=None, pool=None):
+    """
+    Parse a line-delimited file of OpenURL queries, e.g. a link-resolver log
+    that has been cut down to query strings.  Returns a generator.
+    """
+    return parse_many(fileobj, openurl=openurl, record_class=record_class,
+                      pool=pool)
+
+#Outbound KEV keys, quoted once with their = sign.
+OPENURL_KEYS = ('ctx_ver', 'rft_val_fmt', 'rfr_id', 'rft.genre', 'title',
+                'rft.atitle', 'rft.btitle', 'rft.title', 'rft.jtitle',
+                'rft.stitle', 'rft.au', 'rft.aulast', 'rft.date', 'rft.volume',
+                'rft.issue', 'rft.spage', 'rft.end_page', 'rft.pages',
+                'rft.pub', 'rft.place', 'rft.issn', 'rft.eissn', 'rft.isbn',
+                'rft_id')
+KEY_RANK = dict((k, i) for i, k in enumerate(OPENURL_KEYS))
+
+#Values made only of characters quote_plus leaves alone, plus spaces.
+_QUOTE_SAFE = re.compile(r'[\w.\- /]*\Z').match
+#Everything else, escaped a byte at a time as quote_plus would.
+_QUOTE_UNSAFE = re.compile(r'[^\w.\- /]')
+_ESCAPES = dict((chr(i), '%%%02X' % i) for i in range(256))
+
+def _escape(match):
+    return _ESCAPES[match.group()]
+
+#Quoted forms of short values that repeat: genres, formats, dates, volumes.
+_QUOTED = {}
+QUOTED_CACHE_SIZE = 10000
+
+def quote_value(v):
+    """
+    quote_plus a KEV value, encoding unicode as UTF-8.  ASCII values that
+    need no escaping skip the escaping pass and short values are cached.
+    """
+    #Keyed on the type too, so a Latin-1 str is never compared with unicode.
+    key = (type(v), v)
+    quoted = _QUOTED.get(key)
+    if quoted is not None:
+        return quoted
+    if _QUOTE_SAFE(v):
+        if isinstance(v, unicode):
+            quoted = v.encode('ascii').replace(' ', '+')
+        else:
+            quoted = v.replace(' ', '+')
+    else:
+        if isinstance(v, unicode):
+            quoted = v.encode('utf-8', 'ignore')
+        else:
+            quoted = v
+        quoted = _QUOTE_UNSAFE.sub(_escape, quoted).replace(' ', '+')
+    if len(v) <= 32:
+        #Start over when full, so the cache follows the values in use.
+        if len(_QUOTED) >= QUOTED_CACHE_SIZE:
+            _QUOTED.clear()
+        _QUOTED[key] = quoted
+    return quoted
+
+KEY_PREFIXES = dict((k, quote_value(k) + '=') for k in OPENURL_KEYS)
+
 
 class BibJSONToOpenURL(object):
     def __init__(self, bibjson):
@@ -364,103 +810,170 @@ class BibJSONToOpenURL(object):
         pages => 361--71
         end_page => 71
         """
+        prefixes = KEY_PREFIXES
+        return '&'.join([prefixes[k] + quote_value(v) for k, v in self.pairs()])
+
+    def write(self, fileobj):
+        """
+        Write the OpenURL to a file-like object, or any buffer with a
+        write method.
+        """
+        fileobj.write(self.parse())
+
+    def pairs(self):
+        """
+        (key, value) pairs in a fixed key order, leaving out empty values.
+        Every author and identifier is kept.
+        """
         bib = self.data
-        out = {}
-        out['ctx_ver'] = 'Z39.88-2004'
+        out = [('ctx_ver', 'Z39.88-2004')]
+        add = out.append
         btype = bib['type']
         title = bib.get('title')
+        jrnl = bib.get('journal') or {}
         #By default we will treat unknowns as articles for now.
         if (btype == 'article'):
-            out['rft_val_fmt'] = 'info:ofi/fmt:kev:mtx:journal'
-            out['rft.atitle'] = title
-            jrnl = bib.get('journal', {})
-            out['rft.jtitle'] = jrnl.get('name', '')
-            out['rft.stitle'] = jrnl.get('shortcode')
-            out['rft.genre'] = 'article'
-        elif (btype == 'book') or (btype == 'inbook'):
-            out['rft_val_fmt'] = 'info:ofi/fmt:kev:mtx:book'
-            out['rft.btitle'] = title
-            out['rft.genre'] = 'book'
-            if btype == 'inbook':
-                out['rft.genre'] = 'bookitem'
-                jrnl = bib.get('journal', {})
-                out['rft.btitle'] = jrnl.get('name')
-                #For Illiad add as title
-                out['title'] = jrnl.get('name')
-                out['rft.atitle'] = bib.get('title', 'unknown')
+            add(('rft_val_fmt', 'info:ofi/fmt:kev:mtx:journal'))
+            add(('rft.genre', 'article'))
+            add(('rft.atitle', title))
+            add(('rft.jtitle', jrnl.get('name', '')))
+            add(('rft.stitle', jrnl.get('shortcode')))
+        elif (btype == 'book'):
+            add(('rft_val_fmt', 'info:ofi/fmt:kev:mtx:book'))
+            add(('rft.genre', 'book'))
+            add(('rft.btitle', title))
+        elif (btype == 'inbook'):
+            add(('rft_val_fmt', 'info:ofi/fmt:kev:mtx:book'))
+            add(('rft.genre', 'bookitem'))
+            #For Illiad add as title
+            add(('title', jrnl.get('name')))
+            add(('rft.atitle', bib.get('title', 'unknown')))
+            add(('rft.btitle', jrnl.get('name')))
         elif (btype == 'dissertation'):
-            out['rft.genre'] = 'dissertation'
-            out['rft.title'] = bib.get('title')
+            add(('rft.genre', 'dissertation'))
+            add(('rft.title', title))
         else:
             #Try to fill in a title for unkowns
-            out['rft.genre'] = 'unknown'
-            out['rft.title'] = bib.get('title')
-            jrnl = bib.get('journal', {})
-            out['rft.jtitle'] = jrnl.get('name')
-            out['rft.stitle'] = jrnl.get('shortcode')
+            add(('rft.genre', 'unknown'))
+            add(('rft.title', title))
+            add(('rft.jtitle', jrnl.get('name')))
+            add(('rft.stitle', jrnl.get('shortcode')))
 
-        out['rfr_id'] = "info:sid/%s" % (bib.get('_rfr', ''))
+        add(('rfr_id', "info:sid/%s" % (bib.get('_rfr', ''))))
 
         #Do the common attributes
-        out['rft.date'] = bib.get('year', '')[:4]
-        authors = bib.get('author', [])
-        for auth in authors:
+        for auth in bib.get('author', ()):
             full = auth.get('name')
             last = auth.get('lastname')
             if full:
-                out['rft.au'] = full
+                add(('rft.au', full))
             elif last:
-                out['rft.aulast'] = last
-        out['rft.volume'] = bib.get('volume')
-        out['rft.issue'] = bib.get('issue')
-        out['rft.spage'] = bib.get('start_page')
-        out['rft.end_page'] = bib.get('end_page')
-        out['rft.pages'] = bib.get('pages')
-        out['rft.pub'] = bib.get('publisher')
-        out['rft.place'] = bib.get('place_of_publication')
-        identifiers = bib.get('identifier', [])
-        for idt in identifiers:
-            if idt['type'] == 'issn':
-                out['rft.issn'] = idt['id']
-            elif idt['type'] == 'isbn':
-                out['rft.isbn'] = idt['id']
-            elif idt['type'] == 'eissn':
-                out['rft.eissn'] = idt['id']
-            elif idt['type'] == 'doi':
-                out['rft_id'] = 'info:doi/%s' % idt['id'].strip('doi:')
-            elif idt['type'] == 'pmid':
+                add(('rft.aulast', last))
+        add(('rft.date', bib.get('year', '')[:4]))
+        add(('rft.volume', bib.get('volume')))
+        add(('rft.issue', bib.get('issue')))
+        add(('rft.spage', bib.get('start_page')))
+        add(('rft.end_page', bib.get('end_page')))
+        add(('rft.pages', bib.get('pages')))
+        add(('rft.pub', bib.get('publisher')))
+        add(('rft.place', bib.get('place_of_publication')))
+        for idt in bib.get('identifier', ()):
+            id_type, v = idt['type'], idt['id']
+            if id_type in ('issn', 'isbn', 'eissn'):
+                add(('rft.' + id_type, v))
+            elif id_type == 'doi':
+                if v.startswith('doi:'):
+                    v = v[4:]
+                add(('rft_id', 'info:doi/%s' % v))
+            elif id_type == 'pmid':
                 #don't add the info:pmid if not necessary
-                v = idt['id']
-                if v.startswith('info:pmid'):
-                    out['rft_id'] = v
-                else:
-                    out['rft_id'] = 'info:pmid/%s' % idt['id']
-            elif idt['type'] == 'oclc':
-                out['rft_id'] = 'http://www.worldcat.org/oclc/%s' % idt['id']
-        #Remove empty keys
-        for k,v in out.items():
-            if (not v) or (v == ''):
-                del out[k]
-        #Handle unicode and url quoting.
-        #See - http://stackoverflow.com/questions/120951/how-can-i-normalize-a-url-in-python
-        #http://stackoverflow.com/a/8152242
-        kevs = []
-        for k,v in out.iteritems():
-            if isinstance(v, unicode):
-                v = v.encode('utf-8', 'ignore')
-            _k = urllib.quote_plus(k, safe='/')
-            _v = urllib.quote_plus(v, safe='/')
-            kevs.append('%s=%s' % (_k, _v))
-        return '&'.join(kevs)
+                if not v.startswith('info:pmid'):
+                    v = 'info:pmid/%s' % v
+                add(('rft_id', v))
+            elif id_type == 'oclc':
+                add(('rft_id', 'http://www.worldcat.org/oclc/%s' % v))
+        #Remove empty values and keep keys in OPENURL_KEYS order.
+        rank = KEY_RANK
+        out = [(k, v) for k, v in out if v]
+        out.sort(key=lambda kv: rank[kv[0]])
+        return out
+
+
+
+#Identifier forms seen in the wild.  Each alternative has one named group;
+#IDENTIFIER_GROUPS maps that group onto the identifier type.
+IDENTIFIER_PATTERN = re.compile(r"""
+    ^\s*(?:
+        (?:info:doi/|doi:\s*|https?://(?:dx\.)?doi\.org/)(?P<doi>\S.*?)
+      | (?P<doi_bare>10\.\d{4,9}/\S+)
+      | (?:info:pmid/|pmid[:/]?\s*)(?P<pmid>\d+)
+      | (?:info:oclcnum/|\(ocolc\)\s*(?:ocm|ocn|on)?|ocm|ocn|on|https?://(?:www\.)?worldcat\.org/oclc/)(?P<oclc>\d+)
+      | (?:urn:isbn:|isbn:?\s*)(?P<isbn>[\dX][\dX -]{8,15}[\dX])
+      | (?:urn:issn:|issn:?\s*)(?P<issn>\d{4}-?\d{3}[\dX])
+      | (?:eissn:?\s*)(?P<eissn>\d{4}-?\d{3}[\dX])
+    )\s*$""", re.I | re.X)
+
+IDENTIFIER_GROUPS = {
+    'doi': 'doi',
+    'doi_bare': 'doi',
+    'pmid': 'pmid',
+    'oclc': 'oclc',
+    'isbn': 'isbn',
+    'issn': 'issn',
+    'eissn': 'eissn',
+}
+
+#Prefix used to read an unadorned value when its type is already known.
+IDENTIFIER_HINTS = {
+    'doi': 'doi:',
+    'pmid': 'info:pmid/',
+    'oclc': 'info:oclcnum/',
+    'isbn': 'urn:isbn:',
+    'issn': 'urn:issn:',
+    'eissn': 'eissn:',
+}
 
+#OpenURL keys whose values are known to be a given type.
+ID_KEY_HINTS = {
+    'doi': 'doi',
+    'pmid': 'pmid',
+}
 
+def _normalize_identifier(id_type, v):
+    if id_type == 'doi':
+        return 'doi:%s' % v
+    elif id_type == 'pmid':
+        return 'info:pmid/%s' % v
+    elif id_type == 'isbn':
+        return v.replace('-', '').replace(' ', '').upper()
+    elif id_type in ('issn', 'eissn'):
+        v = v.replace('-', '').upper()
+        return '%s-%s' % (v[:4], v[4:])
+    return v
+
+def classify_identifier(value, hint=None):
+    """
+    Work out the type of an identifier string and normalize it in one pass.
+    Returns a (type, id) tuple or None.  DOIs come back as doi:..., PMIDs as
+    info:pmid/..., OCLC numbers as digits, ISBNs without hyphens and ISSNs
+    as NNNN-NNNN.  hint is a type to assume for bare values, e.g. 'pmid'.
+    """
+    match = IDENTIFIER_PATTERN.match(value)
+    if (match is None) and (hint in IDENTIFIER_HINTS):
+        match = IDENTIFIER_PATTERN.match(IDENTIFIER_HINTS[hint] + value)
+    if match is None:
+        return
+    group = match.lastgroup
+    id_type = IDENTIFIER_GROUPS[group]
+    return (id_type, _normalize_identifier(id_type, match.group(group)))
+
+OCLC_NUMBER = re.compile(r'\d+')
 
 def pull_oclc(odict):
     """
     Pull OCLC numbers from incoming FirstSearch/Worldcat urls.
     """
-    import re
-    oclc_reg = re.compile('\d+')
+    oclc_reg = OCLC_NUMBER
     oclc = None
     if odict.get('rfr_id', ['null'])[0].rfind('firstsearch') > -1:
         oclc = odict.get('rfe_dat', ['null'])[0]
@@ -486,3 +999,17 @@ def pull_oclc(odict):
 def to_openurl(bib):
     out = BibJSONToOpenURL(bib)
     return out.parse()
+
+def write_openurls(records, fileobj, base=None):
+    """
+    Write one OpenURL per line for an iterable of BibJSON records, prefixed
+    with base and ? if a resolver base URL is given.  Returns the number of
+    records written.
+    """
+    write = fileobj.write
+    prefix = (base + '?') if base else ''
+    count = 0
+    for bib in records:
+        write(prefix + BibJSONToOpenURL(bib).parse() + '\n')
+        count += 1
+    return count
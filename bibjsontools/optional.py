@@ -0,0 +1,24 @@
+"""
+Checks for optional dependencies that don't import them.
+
+NumPy takes longer to import than the rest of the package together, so
+modules that can use it check for it here and import it only when arrays
+are actually built.
+"""
+
+import imp
+import sys
+
+def installed(name):
+    """
+    True if the top level module name can be imported.
+    """
+    if name in sys.modules:
+        return sys.modules[name] is not None
+    try:
+        handle, path, description = imp.find_module(name)
+    except ImportError:
+        return False
+    if handle:
+        handle.close()
+    return True
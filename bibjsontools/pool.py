@@ -0,0 +1,75 @@
+"""
+Bounded string intern pool.
+
+Referrers, journal titles, publishers and years repeat across resolver
+traffic, but every parse allocates fresh copies of them.  Sharing an
+InternPool between parses makes records that are held in memory point at
+one copy of each value.
+
+    pool = InternPool(maxsize=50000)
+    records = list(parse_many(queries, pool=pool))
+    pool.stats['hit_rate']
+"""
+
+import threading
+try:
+    from collections import OrderedDict
+except ImportError:
+    #Python 2.6
+    from ordereddict import OrderedDict
+
+
+class InternPool(object):
+    """
+    Maps each string to a canonical copy.  The least recently used entries
+    are dropped once maxsize is reached; strings handed out before that
+    stay valid, they just aren't shared with later ones.
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, v):
+        return v in self._entries
+
+    @property
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (float(self.hits) / lookups) if lookups else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def intern(self, v):
+        """
+        Return the pooled copy of v.  Empty values are returned as they are.
+        """
+        if not v:
+            return v
+        with self._lock:
+            shared = self._entries.pop(v, None)
+            #u'x' == 'x', so check the type as well as the value.
+            if (shared is not None) and (shared.__class__ is v.__class__):
+                self.hits += 1
+            else:
+                self.misses += 1
+                shared = v
+                if self._entries and (len(self._entries) >= self.maxsize):
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            self._entries[shared] = shared
+            return shared
@@ -0,0 +1,317 @@
+"""
+Request counts per work, for "most requested" reports.
+
+Each query is reduced to a stable work key built from the parser's
+identifiers and titles, so the same article asked for by DOI from one
+source and by ISSN, volume and start page from another counts as the same
+work when the links carry the same identifiers.
+
+count_works spreads the queries over worker processes.  Every worker
+counts into its own shard and the shards are merged once the input is
+exhausted, so the workers share nothing while they run.  Counts are exact
+by default; with sketch_size set each shard is a HeavyHitters summary of
+bounded size instead.
+
+    counts, stats = count_works(queries, workers=4)
+    for key, n in counts.most_common(50):
+        print n, key
+"""
+
+import hashlib
+import itertools
+import struct
+from array import array
+from multiprocessing import Process, Queue
+from Queue import Empty, Full
+
+from bibjsontools.compat import Counter
+from bibjsontools.index import match_keys
+from bibjsontools.openurl import OpenURLParser
+
+#Fields read to build a work key.
+KEY_FIELDS = ('type', 'identifier', 'title', 'year', 'volume', 'issue', 'start_page')
+#Preferred match key types, most specific first.
+KEY_RANK = {'doi': 0, 'pmid': 1, 'oclc': 2, 'isbn': 3, 'issn': 4, 'title': 5}
+#Types whose normalized ids carry their own prefix, doi:... and info:pmid/...
+SELF_DESCRIBING = ('doi', 'pmid')
+#Seconds to wait on the worker queues before checking the workers are alive.
+WORKER_POLL = 1.0
+
+def work_key(parser):
+    """
+    Work key for the query loaded in parser, e.g. u'doi:10.1039/b814549k'
+    or u'issn:1757-9694:1:1:30', or None when there is nothing to identify
+    it by.  Chapters are keyed on the book's ISBN and their start page.
+    """
+    bib = parser.parse_fields(KEY_FIELDS)
+    keys = match_keys(bib)
+    if not keys:
+        return
+    key = min(keys, key=lambda k: (KEY_RANK[k[0]], k))
+    if (key[0] == 'isbn') and (bib.get('type') == 'inbook'):
+        key += (bib.get('start_page'),)
+    elif key[0] in SELF_DESCRIBING:
+        key = key[1:]
+    return u':'.join([part or u'' for part in key])
+
+
+class ExactCounts(Counter):
+    """
+    Exact count per key.
+    """
+
+    def add(self, key, count=1):
+        self[key] += count
+
+
+class SpaceSaving(object):
+    """
+    Space-Saving summary of the most frequent keys, in bounded memory.
+
+    Each tracked key has an estimated count and the most it can be over by.
+    Keys are dropped once more than twice `size` are tracked, and a key
+    seen again afterwards starts from the largest count dropped, so
+    estimates never undercount.  Summaries can be merged.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.counts = {}
+        #Upper bound on the count of any untracked key.
+        self.floor = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, key, count=1):
+        entry = self.counts.get(key)
+        if entry is not None:
+            entry[0] += count
+            return
+        self.counts[key] = [self.floor + count, self.floor]
+        if len(self.counts) > 2 * self.size:
+            self._prune()
+
+    def _prune(self):
+        ranked = sorted(self.counts.iteritems(), key=lambda item: -item[1][0])
+        if len(ranked) > self.size:
+            self.floor = max(self.floor, ranked[self.size][1][0])
+        self.counts = dict(ranked[:self.size])
+
+    def update(self, other):
+        """
+        Merge another summary into this one.
+        """
+        counts = self.counts
+        for key, (count, error) in other.counts.iteritems():
+            entry = counts.get(key)
+            if entry is None:
+                counts[key] = [count + self.floor, error + self.floor]
+            else:
+                entry[0] += count
+                entry[1] += error
+        for key, entry in counts.iteritems():
+            if key not in other.counts:
+                entry[0] += other.floor
+                entry[1] += other.floor
+        self.floor += other.floor
+        if len(counts) > self.size:
+            self._prune()
+
+    def most_common(self, n=None):
+        """
+        List of (key, estimated count, error), highest count first.
+        """
+        ranked = sorted(((k, c, e) for k, (c, e) in self.counts.iteritems()),
+                        key=lambda item: (-item[1], item[0]))
+        return ranked[:n] if n is not None else ranked
+
+
+class CountMinSketch(object):
+    """
+    Count-Min sketch: count estimates for any key in fixed memory.
+    Estimates never undercount.  Rows are indexed from a SHA-1 of the key,
+    so sketches built in different processes can be merged.
+    """
+
+    MAX_DEPTH = 5
+
+    def __init__(self, width=1 << 16, depth=4):
+        if not 0 < depth <= self.MAX_DEPTH:
+            raise ValueError('depth must be between 1 and %d' % self.MAX_DEPTH)
+        self.width = width
+        self.depth = depth
+        self.tables = [array('l', [0]) * width for i in range(depth)]
+
+    def _cells(self, key):
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        words = struct.unpack('<5I', hashlib.sha1(key).digest())
+        return [w % self.width for w in words[:self.depth]]
+
+    def add(self, key, count=1):
+        for table, cell in zip(self.tables, self._cells(key)):
+            table[cell] += count
+
+    def estimate(self, key):
+        return min([table[cell] for table, cell in zip(self.tables, self._cells(key))])
+
+    def update(self, other):
+        """
+        Merge a sketch of the same width and depth into this one.
+        """
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError('sketch dimensions differ')
+        for table, other_table in zip(self.tables, other.tables):
+            for i, v in enumerate(other_table):
+                if v:
+                    table[i] += v
+
+
+class HeavyHitters(object):
+    """
+    Space-Saving candidates with Count-Min estimates.  The reported count
+    for a key is the lower of the two estimates.
+    """
+
+    def __init__(self, size=1000, width=1 << 16, depth=4):
+        self.top = SpaceSaving(size)
+        self.sketch = CountMinSketch(width, depth)
+
+    def add(self, key, count=1):
+        self.top.add(key, count)
+        self.sketch.add(key, count)
+
+    def update(self, other):
+        self.top.update(other.top)
+        self.sketch.update(other.sketch)
+
+    def most_common(self, n=None):
+        """
+        List of (key, estimated count), highest count first.
+        """
+        estimate = self.sketch.estimate
+        ranked = sorted(((key, min(count, estimate(key)))
+                         for key, count, error in self.top.most_common()),
+                        key=lambda item: (-item[1], item[0]))
+        return ranked[:n] if n is not None else ranked
+
+def new_counts(sketch_size=None):
+    """
+    Empty shard: ExactCounts, or HeavyHitters tracking sketch_size keys.
+    """
+    if sketch_size:
+        return HeavyHitters(sketch_size)
+    return ExactCounts()
+
+def count_queries(queries, counts, parser=None):
+    """
+    Add the work key of each query to counts.  Returns (records, skipped),
+    where skipped queries are blank, unparseable or have no work key.
+    """
+    parser = parser or OpenURLParser('')
+    records = skipped = 0
+    for query in queries:
+        records += 1
+        if isinstance(query, str):
+            #Keys are unicode.  tokenize reads the escapes in a unicode
+            #query as UTF-8, so Caf%C3%A9 still gives u'Caf\xe9'.
+            query = query.decode('utf-8', 'replace')
+        query = query.strip()
+        key = None
+        if query:
+            try:
+                parser.load(query)
+                key = work_key(parser)
+            except Exception:
+                pass
+        if key is None:
+            skipped += 1
+        else:
+            counts.add(key)
+    return records, skipped
+
+def _count_shard(tasks, results, sketch_size):
+    counts = new_counts(sketch_size)
+    parser = OpenURLParser('')
+    records = skipped = 0
+    for chunk in iter(tasks.get, None):
+        r, s = count_queries(chunk, counts, parser)
+        records += r
+        skipped += s
+    results.put((counts, records, skipped))
+
+def _check_workers(procs):
+    """
+    Raise if a worker died, rather than waiting on it forever.
+    """
+    for proc in procs:
+        if proc.exitcode not in (None, 0):
+            raise RuntimeError('count worker %s exited with code %d' % (proc.name, proc.exitcode))
+    if not any(proc.is_alive() for proc in procs):
+        raise RuntimeError('count workers exited before returning their counts')
+
+def _put(tasks, item, procs):
+    while True:
+        try:
+            return tasks.put(item, timeout=WORKER_POLL)
+        except Full:
+            _check_workers(procs)
+
+def _get(results, procs):
+    while True:
+        try:
+            return results.get(timeout=WORKER_POLL)
+        except Empty:
+            _check_workers(procs)
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def count_works(queries, workers=1, chunk_size=1000, sketch_size=None):
+    """
+    Count the works requested in an iterable of queries.  Returns the
+    merged counts and a stats dict of records read and skipped.
+
+    With more than one worker the queries are handed out chunk_size at a
+    time to worker processes, each keeping its own shard of counts, and the
+    shards are merged at the end.  RuntimeError is raised if a worker
+    process dies.
+    """
+    if workers <= 1:
+        counts = new_counts(sketch_size)
+        records, skipped = count_queries(queries, counts)
+        return counts, {'records': records, 'skipped': skipped}
+    #Bounded so reading the input can't run far ahead of the workers.
+    tasks = Queue(workers * 2)
+    results = Queue()
+    procs = [Process(target=_count_shard, args=(tasks, results, sketch_size))
+             for i in range(workers)]
+    for proc in procs:
+        proc.daemon = True
+        proc.start()
+    try:
+        for chunk in _chunks(queries, chunk_size):
+            _put(tasks, chunk, procs)
+        for proc in procs:
+            _put(tasks, None, procs)
+        counts = new_counts(sketch_size)
+        stats = {'records': 0, 'skipped': 0}
+        #Shards have to be read before the workers can exit.
+        for proc in procs:
+            shard, records, skipped = _get(results, procs)
+            counts.update(shard)
+            stats['records'] += records
+            stats['skipped'] += skipped
+        for proc in procs:
+            proc.join()
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+    return counts, stats
@@ -0,0 +1,178 @@
+"""
+Compact record type for holding large numbers of parsed records in memory.
+
+BibRecord and its author, identifier and journal parts use __slots__
+instead of per-instance dicts, authors and identifiers are tuples and the
+low-cardinality strings (type, referrer, identifier type) are shared.  They
+answer the read-only dict methods the rest of the package uses, so they can
+be passed to BibJSONToOpenURL and ris.convert as they are.  Keys without a
+slot, such as the keywords read_ris gives, are kept in a dict of extras.
+
+    from bibjsontools.record import BibRecord
+    rec = OpenURLParser(query).parse(record_class=BibRecord)
+"""
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from bibjsontools.pool import InternPool
+
+#Shared copies of type and referrer strings.  intern() only takes byte
+#strings.
+STRINGS = InternPool(maxsize=10000)
+_shared = STRINGS.intern
+
+#Placeholder for an _openurl that hasn't been built yet.
+_PENDING = object()
+
+
+class _Compact(object):
+    """
+    Read-only mapping access over the slots that are set, and over the
+    extras dict holding any other keys.
+    """
+    __slots__ = ('_extra',)
+
+    def __init__(self, **kwargs):
+        slots = self.__slots__
+        for k in slots:
+            setattr(self, k, kwargs.pop(k, None))
+        self._extra = kwargs or None
+
+    def _value(self, k):
+        return getattr(self, k)
+
+    def __getitem__(self, k):
+        v = self.get(k)
+        if v is None:
+            raise KeyError(k)
+        return v
+
+    def get(self, k, default=None):
+        if k in self.__slots__:
+            v = self._value(k)
+        elif self._extra:
+            v = self._extra.get(k)
+        else:
+            v = None
+        if v is None:
+            return default
+        return v
+
+    def __contains__(self, k):
+        return self.get(k) is not None
+
+    has_key = __contains__
+
+    def keys(self):
+        return [k for k, v in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        out = []
+        for k in self.__slots__:
+            v = self._value(k)
+            if v is not None:
+                out.append((k, v))
+        if self._extra:
+            out.extend((k, v) for k, v in self._extra.iteritems() if v is not None)
+        return out
+
+    iteritems = items
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, _Compact):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.to_dict())
+
+    def __getstate__(self):
+        return tuple(self._value(k) for k in self.__slots__) + (self._extra,)
+
+    def __setstate__(self, state):
+        slots = self.__slots__
+        for k, v in zip(slots, state):
+            setattr(self, k, v)
+        self._extra = state[len(slots)] if len(state) > len(slots) else None
+
+
+class Author(_Compact):
+    __slots__ = ('name', 'lastname', 'firstname', '_minitial')
+
+
+class Identifier(_Compact):
+    __slots__ = ('type', 'id')
+
+    def __init__(self, type=None, id=None, **extra):
+        _Compact.__init__(self, type=_shared(type), id=id, **extra)
+
+
+class Journal(_Compact):
+    __slots__ = ('name', 'shortcode')
+
+
+class BibRecord(_Compact):
+    """
+    Slotted equivalent of a parsed BibJSON dict.
+    """
+    __slots__ = ('type', '_rfr', 'identifier', 'title', 'journal', 'author',
+                 'publisher', 'place_of_publication', 'volume', 'issue',
+                 'year', 'pages', 'start_page', 'end_page', '_openurl')
+
+    @classmethod
+    def from_bibjson(cls, bib, openurl=True):
+        """
+        Build a record from a BibJSON dict.  With openurl='lazy' the
+        _openurl key is generated the first time it is read.
+        """
+        rec = cls(**bib)
+        rec.type = _shared(rec.type)
+        rec._rfr = _shared(rec._rfr)
+        if rec.identifier is not None:
+            rec.identifier = tuple(Identifier(**i) for i in rec.identifier)
+        if rec.author is not None:
+            rec.author = tuple(Author(**a) for a in rec.author)
+        if rec.journal is not None:
+            rec.journal = Journal(**rec.journal)
+        if (openurl == 'lazy') and (rec._openurl is None):
+            rec._openurl = _PENDING
+        return rec
+
+    def _value(self, k):
+        v = getattr(self, k)
+        if v is _PENDING:
+            from bibjsontools.openurl import BibJSONToOpenURL
+            self._openurl = None
+            v = self._openurl = BibJSONToOpenURL(self).parse()
+        return v
+
+    def to_dict(self):
+        """
+        Plain BibJSON dict, with the nested parts converted too.
+        """
+        out = {}
+        for k, v in self.items():
+            if isinstance(v, tuple):
+                v = [i.to_dict() for i in v]
+            elif isinstance(v, Journal):
+                v = v.to_dict()
+            out[k] = v
+        return out
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
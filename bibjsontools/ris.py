@@ -1,9 +1,11 @@
 """
-Convert from BibJSON to RIS.
+Convert from BibJSON to RIS and read RIS back into BibJSON.
 Adapted from https://github.com/okfn/bibserver/blob/master/parserscrapers_plugins/RISParser.py
 """
 
-from bibjsontools import from_openurl
+import re
+
+from bibjsontools.openurl import from_openurl
 
 FIELD_MAP = {
 	'access date': 'Y2',
@@ -59,45 +61,249 @@ FIELD_MAP = {
 	'year': 'PY'
 }
 
+TYPE_TAGS = {
+	'article': 'JOUR',
+	'book': 'BOOK',
+}
+
+IDENTIFIER_TAGS = {
+	'doi': 'DO',
+	'issn': 'SN',
+	'eissn': 'SN',
+	'isbn': 'SN',
+}
+
+def _field(tag):
+	"""
+	Emitter for a plain field.  List values are written once per item.
+	"""
+	def emit(tags, v):
+		if isinstance(v, (list, tuple)):
+			for item in v:
+				if item:
+					tags.append((tag, item))
+		elif v:
+			tags.append((tag, v))
+	return emit
+
+def _authors(tags, v):
+	for author in v:
+		name = author.get('name')
+		if name:
+			tags.append(('AU', name))
+
+def _journal(tags, v):
+	name = v.get('name')
+	if name:
+		tags.append(('JF', name))
+
+def _identifiers(tags, v):
+	for idt in v:
+		tag = IDENTIFIER_TAGS.get(idt['type'])
+		if tag:
+			tags.append((tag, idt['id']))
+
+def _build_dispatch(field_map):
+	"""
+	BibJSON key -> emitter, built once from FIELD_MAP with the structured
+	fields overridden.
+	"""
+	dispatch = dict((k, _field(tag)) for k, tag in field_map.items())
+	dispatch['author'] = _authors
+	dispatch['journal'] = _journal
+	dispatch['identifier'] = _identifiers
+	return dispatch
+
+DISPATCH = _build_dispatch(FIELD_MAP)
+
+def tags(bib):
+	"""
+	Ordered list of (tag, value) pairs for a record, TY first.  Repeated
+	tags such as AU, SN and KW are all kept.
+	"""
+	out = [('TY', TYPE_TAGS.get(bib['type'], 'GENERIC'))]
+	for k,v in bib.items():
+		emit = DISPATCH.get(k)
+		if emit:
+			emit(out, v)
+	return out
+
+def ris_lines(bib):
+	"""
+	Yield the RIS lines for one record.  The ER terminator is left to the
+	caller.
+	"""
+	for k,v in tags(bib):
+		yield "%s  - %s\n" % (k, v)
+
 def convert(bib):
 	"""
 	Convert BibJSON to the RIS format for import into various utilities.
-	To do: add some test cases. 
 	"""
-	ris = {}
-	if bib['type'] == 'article':
-		ris['TY'] = 'JOUR'
-	elif bib['type'] == 'book':
-		ris['TY'] = 'BOOK'
-	else:
-		ris['TY'] = 'GENERIC'
+	return ''.join(ris_lines(bib))
 
-	for k,v in bib.items():
-		if k == 'author':
-			for author in v:
-				name = author.get('name')
-				if name:
-					ris['AU'] = name
-		elif k == 'journal':
-			ris['JF'] = v.get('name')
-		elif k == 'identifier':
-			for idt in v:
-				this = idt['id']
-				if idt['type'] == 'doi':
-					ris['DO'] = this
-				elif idt['type'] == 'issn':
-					ris['SN'] = this
-				elif idt['type'] == 'isbn':
-					ris['SN'] = this
-				#elif idt['type'] == 'pmid':
-				#	ris[]
+def _encoded(bib, encoding):
+	for line in ris_lines(bib):
+		if encoding and isinstance(line, unicode):
+			line = line.encode(encoding)
+		yield line
+
+def iter_ris(records, encoding='utf-8'):
+	"""
+	Yield RIS lines for an iterable of BibJSON records, closing each record
+	with ER.  Unicode is encoded with encoding unless it is None.
+	"""
+	for bib in records:
+		for line in _encoded(bib, encoding):
+			yield line
+		yield 'ER  - \n'
+
+def write_ris(records, fileobj, encoding='utf-8'):
+	"""
+	Stream BibJSON records to a file object as RIS.  Nothing is held in
+	memory beyond the current record.  Returns the number of records written.
+	"""
+	write = fileobj.write
+	count = 0
+	for bib in records:
+		for line in _encoded(bib, encoding):
+			write(line)
+		write('ER  - \n')
+		count += 1
+	return count
+
+
+#Reading RIS.
+
+RIS_LINE = re.compile(r'^([A-Z][A-Z0-9])  -(?: (.*))?$')
+
+RIS_TYPES = {
+	'JOUR': 'article',
+	'JFULL': 'article',
+	'MGZN': 'article',
+	'NEWS': 'article',
+	'EJOUR': 'article',
+	'BOOK': 'book',
+	'EBOOK': 'book',
+	'CHAP': 'inbook',
+	'ECHAP': 'inbook',
+	'THES': 'dissertation',
+}
+
+#Tags that FIELD_MAP doesn't cover or that need a BibJSON key of their own.
+READ_OVERRIDES = {
+	'A1': 'author',
+	'T1': 'title',
+	'BT': 'title',
+	'JO': 'journal',
+	'JA': 'journal',
+	'T2': 'journal',
+	'Y1': 'year',
+	'EP': 'end_page',
+	'CY': 'place_of_publication',
+}
+
+def _build_reverse_index(field_map):
+	"""
+	RIS tag -> BibJSON key.  Where FIELD_MAP sends two names to one tag
+	the first in sorted order wins, e.g. IS reads back as issue.
+	"""
+	index = {}
+	for k, tag in sorted(field_map.items()):
+		index.setdefault(tag, k.strip().replace(' ', '_'))
+	index.update(READ_OVERRIDES)
+	return index
+
+REVERSE_MAP = _build_reverse_index(FIELD_MAP)
+
+def _standard_number(v):
+	"""
+	SN holds either an ISSN or an ISBN; tell them apart by length.
+	"""
+	digits = v.replace('-', '').strip()
+	if len(digits) == 8:
+		return {'type': 'issn', 'id': v}
+	return {'type': 'isbn', 'id': v}
+
+def _add(bib, k, v):
+	"""
+	Fold one tagged value into a record being built.
+	"""
+	if k == 'author':
+		au = {'name': v}
+		if ',' in v:
+			last, first = v.split(',', 1)
+			au['lastname'] = last.strip()
+			if first.strip():
+				au['firstname'] = first.strip()
+		bib.setdefault('author', []).append(au)
+	elif k == 'issn':
+		bib.setdefault('identifier', []).append(_standard_number(v))
+	elif k == 'doi':
+		if not v.startswith('doi:'):
+			v = 'doi:%s' % v
+		bib.setdefault('identifier', []).append({'type': 'doi', 'id': v})
+	elif k == 'journal':
+		bib.setdefault('journal', {'name': v})
+	elif k == 'keyword':
+		bib.setdefault('keyword', []).append(v)
+	elif k == 'year':
+		bib.setdefault('year', v[:4])
+	elif k == 'pages':
+		bib.setdefault('pages', v)
+		if '-' in v:
+			start, end = v.split('-', 1)
+			bib.setdefault('start_page', start.strip())
+			bib.setdefault('end_page', end.strip())
 		else:
-			ris_k = FIELD_MAP.get(k, None)
-			if ris_k:
-				ris_v = bib.get(k)
-				ris[ris_k] = ris_v
-
-	out = ''
-	for k,v in ris.items():
-		out += "%s  - %s\n" % (k, v)
-	return out
\ No newline at end of file
+			bib.setdefault('start_page', v)
+	else:
+		bib.setdefault(k, v)
+
+def _finish(bib):
+	if ('pages' in bib) and ('end_page' in bib) and ('-' not in bib['pages']):
+		bib['pages'] = '%s - %s' % (bib['pages'], bib['end_page'])
+	if not bib.get('title'):
+		bib['title'] = u'Unknown'
+	return bib
+
+def read_ris(fileobj):
+	"""
+	Incrementally read RIS from a file object, yielding one BibJSON dict per
+	record, shaped like OpenURLParser.parse() output.  Only the record being
+	read is held in memory.  Untagged lines continue the previous value.
+	"""
+	bib = None
+	last = None
+	for line in fileobj:
+		line = line.rstrip('\r\n')
+		#Byte order mark, as bytes from a binary file or decoded from a text one.
+		if isinstance(line, unicode):
+			if line.startswith(u'\ufeff'):
+				line = line[1:]
+		elif line.startswith('\xef\xbb\xbf'):
+			line = line[3:]
+		match = RIS_LINE.match(line)
+		if not match:
+			#Continuation of a long value.
+			if (last is not None) and line.strip():
+				last[1].append(line.strip())
+			continue
+		tag, v = match.group(1), (match.group(2) or '').strip()
+		if last is not None:
+			_add(bib, last[0], ' '.join(last[1]))
+			last = None
+		if tag == 'TY':
+			bib = {'type': RIS_TYPES.get(v, 'book')}
+		elif tag == 'ER':
+			if bib is not None:
+				yield _finish(bib)
+			bib = None
+		elif (bib is not None) and v:
+			k = REVERSE_MAP.get(tag)
+			if k:
+				last = (k, [v])
+	if last is not None:
+		_add(bib, last[0], ' '.join(last[1]))
+	if bib is not None:
+		yield _finish(bib)
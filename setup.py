@@ -8,15 +8,29 @@ try:
     import json
 except ImportError:
     install_requires.append('simplejson')
+#Backports of the standard library modules added in Python 2.7.
+try:
+    import argparse
+except ImportError:
+    install_requires.append('argparse')
+try:
+    from collections import OrderedDict
+except ImportError:
+    install_requires.append('ordereddict')
 
 setup(
     name='bibjsontools',
     version='0.3',
     author='Ted Lawless',
     author_email='lawlesst@gmail.com',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks']),
     package_data={'bibjsontools': ['test/data/*.*']},
     install_requires=install_requires,
+    entry_points={
+        'console_scripts': [
+            'bibjsontools = bibjsontools.cli:main',
+        ],
+    },
 )
 
 
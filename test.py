@@ -1,11 +1,39 @@
 import unittest
 from test import openurl
 from test import ris
+from test import cache
+from test import cli
+from test import index
+from test import record
+from test import columns
+from test import pool
+from test import frontend
+from test import instrument
+from test import diskcache
+from test import scan
+from test import popular
+from test import normalize
+from test import startup
+from test import compat
 
 def suite():
     test_suite = unittest.TestSuite()
     test_suite.addTest(openurl.suite())
     test_suite.addTest(ris.suite())
+    test_suite.addTest(cache.suite())
+    test_suite.addTest(cli.suite())
+    test_suite.addTest(index.suite())
+    test_suite.addTest(record.suite())
+    test_suite.addTest(columns.suite())
+    test_suite.addTest(pool.suite())
+    test_suite.addTest(frontend.suite())
+    test_suite.addTest(instrument.suite())
+    test_suite.addTest(diskcache.suite())
+    test_suite.addTest(scan.suite())
+    test_suite.addTest(popular.suite())
+    test_suite.addTest(normalize.suite())
+    test_suite.addTest(startup.suite())
+    test_suite.addTest(compat.suite())
     return test_suite
 
 runner = unittest.TextTestRunner()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import unittest
+from urlparse import parse_qs
+
+from bibjsontools.cache import ParseCache, canonical_query
+from bibjsontools.openurl import from_openurl
+
+Q = u'rft_val_fmt=info:ofi/fmt:kev:mtx:journal&rfr_id=info:sid/pss.sagepub.com&rft.spage=569&rft.issue=4&rft.epage=582&rft.aulast=Nolen-Hoeksema&ctx_tim=2010-11-27T19:38:39.6-08:00&rft.volume=100&rft.stitle=J%20Abnorm%20Psychol&rft.atitle=Responses%20to%20depression&rft_id=info:pmid/1757671&rft.jtitle=Journal%20of%20abnormal%20psychology&rft.genre=article'
+
+class TestCanonicalQuery(unittest.TestCase):
+
+    def test_order_and_unused_keys(self):
+        a = parse_qs(u'atitle=A&issn=1234&ctx_tim=1')
+        b = parse_qs(u'ctx_tim=2&issn=1234&atitle=A')
+        self.assertEqual(canonical_query(a), canonical_query(b))
+
+    def test_prefix(self):
+        a = parse_qs(u'rft.atitle=A&volume=2')
+        b = parse_qs(u'atitle=A&rft.volume=2')
+        self.assertEqual(canonical_query(a), canonical_query(b))
+
+    def test_prefix_kept_when_both_present(self):
+        #Precedence between the two forms matters here.
+        a = parse_qs(u'rft.atitle=A&atitle=B')
+        b = parse_qs(u'rft.atitle=B&atitle=A')
+        self.assertNotEqual(canonical_query(a), canonical_query(b))
+
+    def test_id_not_folded(self):
+        #Bare id is also a referrer key so it can't become rft.id.
+        a = parse_qs(u'id=doi:10.1/x')
+        b = parse_qs(u'rft.id=doi:10.1/x')
+        self.assertNotEqual(canonical_query(a), canonical_query(b))
+
+
+class TestParseCache(unittest.TestCase):
+
+    def test_hits_and_misses(self):
+        cache = ParseCache()
+        first = cache.from_openurl(Q)
+        reordered = '&'.join(reversed(Q.split('&')))
+        second = cache.from_openurl(reordered)
+        self.assertEqual(first, second)
+        self.assertEqual(first, from_openurl(Q))
+        self.assertEqual(cache.stats['hits'], 1)
+        self.assertEqual(cache.stats['misses'], 1)
+
+    def test_defensive_copy(self):
+        cache = ParseCache()
+        bib = cache.from_openurl(Q)
+        bib['author'][0]['name'] = 'Changed'
+        bib['identifier'].append({'type': 'doi', 'id': 'doi:x'})
+        bib['title'] = 'Changed'
+        again = cache.from_openurl(Q)
+        self.assertEqual(again, from_openurl(Q))
+
+    def test_eviction(self):
+        cache = ParseCache(maxsize=2)
+        for q in (u'title=a', u'title=b', u'title=c'):
+            cache.from_openurl(q)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats['evictions'], 1)
+        cache.from_openurl(u'title=a')
+        self.assertEqual(cache.stats['misses'], 4)
+
+    def test_ttl(self):
+        cache = ParseCache(ttl=-1)
+        cache.from_openurl(u'title=a')
+        cache.from_openurl(u'title=a')
+        self.assertEqual(cache.stats['hits'], 0)
+        self.assertEqual(cache.stats['evictions'], 1)
+
+    def test_openurl_modes(self):
+        cache = ParseCache()
+        self.assertTrue('_openurl' not in cache.from_openurl(Q, openurl=False))
+        lazy = cache.from_openurl(Q, openurl='lazy')
+        self.assertEqual(lazy['_openurl'], from_openurl(Q)['_openurl'])
+
+    def test_from_dict(self):
+        cache = ParseCache()
+        d = {u'rft.btitle': [u'A book'], u'rft.genre': [u'book']}
+        self.assertEqual(cache.from_dict(d)['title'], u'A book')
+        cache.from_openurl(u'btitle=A+book&genre=book')
+        self.assertEqual(cache.stats['hits'], 0)
+
+
+def suite():
+    suite1 = unittest.makeSuite(TestCanonicalQuery, 'test')
+    suite2 = unittest.makeSuite(TestParseCache, 'test')
+    return unittest.TestSuite((suite1, suite2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from StringIO import StringIO
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from bibjsontools import cli
+from bibjsontools.openurl import from_openurl
+
+LINES = [
+    'sid=google&auinit=S&aulast=Maffeis&atitle=An+operational+semantics+for+JavaScript&id=doi:10.1007/978-3-540-89330-1_22\n',
+    '\n',
+    'http://resolver.example.edu/openurl?volume=16&genre=article&spage=538&sid=EBSCO:aph&title=Current+Pharmaceutical+Design&date=20100211&issue=5&issn=13816128\n',
+    'sid=FirstSearch%3AWorldCat&genre=book&isbn=9780385475723&title=The+blind+assassin&aulast=Atwood&aufirst=Margaret\n',
+]
+
+class TestConvert(unittest.TestCase):
+
+    def run_convert(self, **kwargs):
+        return self.run_convert_lines(LINES, **kwargs)
+
+    def run_convert_lines(self, lines, **kwargs):
+        out = StringIO()
+        written = cli.convert(lines, out, **kwargs)
+        return written, out.getvalue()
+
+    def test_bibjson(self):
+        written, text = self.run_convert()
+        self.assertEqual(written, 3)
+        bibs = [json.loads(l) for l in text.splitlines()]
+        self.assertEqual(bibs[0]['title'], 'An operational semantics for JavaScript')
+        self.assertEqual(bibs[1]['journal']['name'], 'Current Pharmaceutical Design')
+        self.assertEqual(bibs[2]['title'], 'The blind assassin')
+
+    def test_workers_keep_order(self):
+        single = self.run_convert(fmt='openurl')
+        pooled = self.run_convert(fmt='openurl', workers=2, chunk_size=1)
+        self.assertEqual(single, pooled)
+        first = single[1].splitlines()[0]
+        self.assertEqual(first, from_openurl(LINES[0].strip())['_openurl'])
+
+    def test_ris(self):
+        written, text = self.run_convert(fmt='ris')
+        self.assertEqual(text.count('ER  - \n'), 3)
+        self.assertTrue('TI  - The blind assassin\n' in text)
+
+    def test_undecodable_escapes(self):
+        written, text = self.run_convert_lines(['atitle=Caf%E9&genre=article\n',
+                                                'atitle=%ce%b17+Nicotinic&genre=article\n'])
+        self.assertEqual(written, 2)
+        titles = [json.loads(l)['title'] for l in text.splitlines()]
+        self.assertEqual(titles, [u'Caf\ufffd', u'\u03b17 Nicotinic'])
+        written, text = self.run_convert_lines([u'atitle=Caf\xe9'], fmt='ris')
+        self.assertTrue(isinstance(text, str))
+        self.assertTrue('TI  - Caf\xc3\xa9\n' in text)
+
+    def test_errors_reported(self):
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            cli._init_worker('bibjson')
+            def fail(query):
+                raise ValueError(query)
+            cli._parser.load = fail
+            self.assertEqual(cli.convert_line('genre=book\n'), False)
+            self.assertEqual(cli.convert_line('  \n'), None)
+            report = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assertEqual(report, "skipped 'genre=book': ValueError\n")
+
+    def test_progress(self):
+        stream = StringIO()
+        progress = cli.Progress(2, stream=stream)
+        cli.convert(LINES, StringIO(), progress=progress)
+        #The blank line isn't a record.
+        self.assertEqual(progress.records, 3)
+        self.assertEqual(progress.errors, 0)
+        self.assertTrue(stream.getvalue().startswith('2 records'))
+
+    def test_workers_read_ahead_bounded(self):
+        read = [0]
+        def lines():
+            for i in xrange(20000):
+                read[0] += 1
+                yield LINES[i % len(LINES)]
+        class Out(object):
+            first = None
+            def write(self, data):
+                if self.first is None:
+                    self.first = read[0]
+        out = Out()
+        written = cli.convert(lines(), out, workers=2, chunk_size=10)
+        self.assertEqual(written, 15000)
+        #Two workers keep at most four chunks queued ahead.
+        self.assertTrue(out.first <= 60, out.first)
+
+
+class TestMain(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_gzip_input(self):
+        path = os.path.join(self.tmp, 'resolver.log.gz')
+        handle = gzip.open(path, 'wb')
+        handle.writelines(LINES)
+        handle.close()
+        out = os.path.join(self.tmp, 'out.json')
+        cli.main(['-q', '-o', out, path])
+        self.assertEqual(len(open(out).read().splitlines()), 3)
+
+    def test_scan(self):
+        path = os.path.join(self.tmp, 'access.log')
+        with open(path, 'wb') as f:
+            f.write('10.0.0.1 - - "GET /favicon.ico HTTP/1.1" 404\n')
+            f.write('10.0.0.2 - - "GET /openurl?%s HTTP/1.1" 200\n' % LINES[2].split('?')[1].strip())
+        out = os.path.join(self.tmp, 'out.json')
+        cli.main(['-q', '-s', '-o', out, path])
+        bibs = [json.loads(l) for l in open(out).read().splitlines()]
+        self.assertEqual(len(bibs), 1)
+        self.assertEqual(bibs[0]['journal']['name'], 'Current Pharmaceutical Design')
+
+    def test_scan_matches_plain(self):
+        query = 'genre=article&atitle=Caf%C3%A9+society&title=Revue&aulast=Dupr%C3%A9'
+        plain = os.path.join(self.tmp, 'resolver.log')
+        with open(plain, 'wb') as f:
+            f.write(query + '\n')
+        raw = os.path.join(self.tmp, 'access.log')
+        with open(raw, 'wb') as f:
+            f.write('10.0.0.2 - - "GET /openurl?%s HTTP/1.1" 200\n' % query)
+        outputs = []
+        for fmt in ('openurl', 'bibjson'):
+            for args in ([plain], ['-s', raw]):
+                out = os.path.join(self.tmp, 'out')
+                cli.main(['-q', '-t', fmt, '-o', out] + args)
+                outputs.append(open(out, 'rb').read())
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertTrue('rft.atitle=Caf%C3%A9+society' in outputs[0])
+        self.assertEqual(outputs[2], outputs[3])
+        self.assertEqual(json.loads(outputs[2])['title'], u'Caf\xe9 society')
+
+    def test_count(self):
+        path = os.path.join(self.tmp, 'resolver.log')
+        with open(path, 'wb') as f:
+            f.writelines(LINES * 3 + [LINES[0]])
+        out = os.path.join(self.tmp, 'top.tsv')
+        cli.main(['count', '-q', '-n', '2', '-o', out, path])
+        rows = [l.split('\t') for l in open(out).read().splitlines()]
+        self.assertEqual(rows[0], ['4', 'doi:10.1007/978-3-540-89330-1_22'])
+        self.assertEqual(len(rows), 2)
+
+
+def suite():
+    suite1 = unittest.makeSuite(TestConvert, 'test')
+    suite2 = unittest.makeSuite(TestMain, 'test')
+    return unittest.TestSuite((suite1, suite2))
+
+if __name__ == '__main__':
+    unittest.main()
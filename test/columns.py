@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import unittest
+from StringIO import StringIO
+
+from bibjsontools.columns import HAVE_NUMPY, ColumnBatch, parse_columns
+from bibjsontools.openurl import from_openurl
+
+QUERIES = [
+    u'volume=16&genre=article&spage=538&sid=EBSCO:aph&title=Current+Pharmaceutical+Design&date=20100211&issue=5&issn=13816128&atitle=Targeting+%ce%b17+Nicotinic',
+    u'rft_val_fmt=info:ofi/fmt:kev:mtx:journal&rfr_id=info:sid/www.isinet.com:WoK:UA&rft.spage=30&rft.title=INTEGRATIVE%20BIOLOGY&rft.date=2009&rft.atitle=Manipulation&rft_id=info:doi/10%2E1039%2Fb814549k&rft.issn=1757-9694&rft.genre=article',
+    u'',
+    u'volume=17&genre=article&sid=EBSCO:aph&title=Current+Pharmaceutical+Design&date=2011&issn=13816128&atitle=Another',
+    u'isbn=9781429233231&title=Introduction+to+Genetic+Analysis.&genre=book',
+]
+
+class TestColumnBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.batch = parse_columns(QUERIES)
+
+    def test_matches_parse(self):
+        self.assertEqual(len(self.batch), 4)
+        bibs = [from_openurl(q) for q in QUERIES if q]
+        self.assertEqual(list(self.batch['type']), [b['type'] for b in bibs])
+        self.assertEqual(list(self.batch['year']), [b.get('year') for b in bibs])
+        self.assertEqual(list(self.batch['_rfr']), [b.get('_rfr') for b in bibs])
+        self.assertEqual(list(self.batch['journal']),
+                         [b.get('journal', {}).get('name') for b in bibs])
+        self.assertEqual(list(self.batch['doi']), [None, u'doi:10.1039/b814549k', None, None])
+
+    def test_dictionary_encoding(self):
+        journal = self.batch['journal']
+        self.assertEqual(journal.values, [u'Current Pharmaceutical Design', u'INTEGRATIVE BIOLOGY'])
+        self.assertEqual(list(journal.codes), [0, 1, 0, -1])
+        self.assertEqual(self.batch.counts('journal')[u'Current Pharmaceutical Design'], 2)
+        self.assertEqual(self.batch.counts('type'), {'article': 3, 'book': 1})
+
+    def test_csv(self):
+        out = StringIO()
+        self.assertEqual(self.batch.write_csv(out), 4)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], 'type,year,journal,issn,doi,_rfr')
+        self.assertEqual(lines[1], 'article,2010,Current Pharmaceutical Design,13816128,,EBSCO:aph')
+        out = StringIO()
+        self.batch.write_tsv(out, header=False)
+        self.assertEqual(out.getvalue().splitlines()[3], 'book\t\t\t\t\t')
+
+    def test_several_issns(self):
+        queries = []
+        for a, b in ((u'1757-9694', u'1381-6128'), (u'0000-0001', u'9999-9999')):
+            queries += [u'genre=article&issn=%s&rft.issn=%s' % (a, b),
+                        u'genre=article&issn=%s&rft.issn=%s' % (b, a)]
+        batch = ColumnBatch(['issn']).extend(queries)
+        self.assertEqual(list(batch['issn']),
+                         [u'1381-6128', u'1381-6128', u'0000-0001', u'0000-0001'])
+
+    def test_columns(self):
+        batch = ColumnBatch(['title', 'isbn']).extend(QUERIES)
+        self.assertEqual(list(batch.rows())[-1],
+                         (u'Introduction to Genetic Analysis.', u'9781429233231'))
+        self.assertRaises(ValueError, ColumnBatch, ['author'])
+
+    if HAVE_NUMPY:
+        def test_numpy(self):
+            arrays = self.batch.to_numpy()
+            codes, categories = arrays['journal']
+            self.assertEqual(list(codes), [0, 1, 0, -1])
+            self.assertEqual(list(categories[codes[codes >= 0]]),
+                             [u'Current Pharmaceutical Design', u'INTEGRATIVE BIOLOGY',
+                              u'Current Pharmaceutical Design'])
+
+
+def suite():
+    suite1 = unittest.makeSuite(TestColumnBatch, 'test')
+    return unittest.TestSuite((suite1,))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from bibjsontools.compat import _Counter
+
+class TestCounter(unittest.TestCase):
+
+    def test_counting(self):
+        c = _Counter([u'a', u'b', u'a'])
+        self.assertEqual(c[u'a'], 2)
+        self.assertEqual(c[u'missing'], 0)
+        c.update(_Counter([u'b', u'c']))
+        c.update({u'c': 2})
+        self.assertEqual(c, {u'a': 2, u'b': 2, u'c': 3})
+        self.assertEqual(c.most_common(1), [(u'c', 3)])
+        self.assertEqual(c.most_common()[0], (u'c', 3))
+        self.assertEqual(len(c.most_common()), 3)
+
+    def test_subclass(self):
+        class Counts(_Counter):
+            def add(self, key, count=1):
+                self[key] += count
+        c = Counts()
+        c.add(u'x')
+        c.add(u'x', 2)
+        self.assertEqual(c.most_common(), [(u'x', 3)])
+
+
+def suite():
+    suite1 = unittest.makeSuite(TestCounter, 'test')
+    return unittest.TestSuite((suite1,))
+
+if __name__ == '__main__':
+    unittest.main()
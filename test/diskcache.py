@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from bibjsontools import diskcache
+from bibjsontools.diskcache import DiskParseCache
+from bibjsontools.openurl import LazyBibJSON, from_openurl
+
+QUERIES = [
+    u'volume=16&genre=article&spage=538&sid=EBSCO:aph&title=Current+Pharmaceutical+Design&date=20100211&issue=5&issn=13816128&atitle=Targeting+%ce%b17+Nicotinic',
+    u'sid=google&auinit=S&aulast=Maffeis&atitle=An+operational+semantics+for+JavaScript&id=doi:10.1007/978-3-540-89330-1_22',
+    u'isbn=9781429233231&title=Introduction+to+Genetic+Analysis.&genre=book',
+]
+
+class TestDiskParseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_parse_many(self):
+        #Reordered parameters share an entry.
+        lines = QUERIES + [u'', QUERIES[0], u'&'.join(reversed(QUERIES[0].split(u'&')))]
+        expected = [from_openurl(q) for q in lines if q]
+        with DiskParseCache(self.path) as cache:
+            self.assertEqual(list(cache.parse_many(lines, batch_size=2)), expected)
+            self.assertEqual(len(cache), 3)
+            self.assertEqual((cache.hits, cache.misses), (2, 3))
+        #A second run only reads from disk.
+        with DiskParseCache(self.path) as cache:
+            self.assertEqual(list(cache.parse_many(lines)), expected)
+            self.assertEqual((cache.hits, cache.misses), (5, 0))
+            lazy = cache.from_openurl(QUERIES[1], openurl='lazy')
+            self.assertTrue(isinstance(lazy, LazyBibJSON))
+            self.assertEqual(lazy, from_openurl(QUERIES[1]))
+            self.assertEqual(cache.from_openurl(QUERIES[2], openurl=False),
+                             from_openurl(QUERIES[2], openurl=False))
+
+    def test_results_are_copies(self):
+        with DiskParseCache(self.path) as cache:
+            a, b = cache.parse_many([QUERIES[0], QUERIES[0]])
+            a['author'] = 'changed'
+            self.assertFalse(a is b)
+            self.assertEqual(cache.from_openurl(QUERIES[0]), from_openurl(QUERIES[0]))
+
+    def test_eviction(self):
+        with DiskParseCache(self.path, maxsize=2) as cache:
+            list(cache.parse_many(QUERIES[:2]))
+            #Touch the first query so the second is the oldest.
+            cache.from_openurl(QUERIES[0])
+            cache.from_openurl(QUERIES[2])
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(cache.evictions, 1)
+            keys = [diskcache.query_key(diskcache.tokenize(q), True) for q in QUERIES]
+            self.assertEqual(sorted(cache.get_many(keys)), sorted([keys[0], keys[2]]))
+            #An evicted query is parsed again rather than found by its alias.
+            misses = cache.misses
+            self.assertEqual(cache.from_openurl(QUERIES[1]), from_openurl(QUERIES[1]))
+            self.assertEqual(cache.misses, misses + 1)
+
+    def test_put_many_counts_new_keys(self):
+        bibs = [from_openurl(q) for q in QUERIES]
+        with DiskParseCache(self.path, maxsize=2) as cache:
+            cache.put_many([('a', bibs[0]), ('b', bibs[1])])
+            #Replacing a stored key doesn't grow the cache.
+            cache.put_many([('a', bibs[2])])
+            self.assertEqual((len(cache), cache.evictions), (2, 0))
+            self.assertEqual(cache.get_many(['a']), {'a': bibs[2]})
+            cache.put_many([('c', bibs[0])])
+            self.assertEqual((len(cache), cache.evictions), (2, 1))
+            self.assertEqual(sorted(cache.get_many(['a', 'b', 'c'])), ['a', 'c'])
+        with DiskParseCache(self.path) as cache:
+            self.assertEqual(len(cache), 2)
+            cache.clear()
+            self.assertEqual(len(cache), 0)
+
+    def test_version_invalidates(self):
+        with DiskParseCache(self.path) as cache:
+            list(cache.parse_many(QUERIES))
+        version = diskcache.PARSER_VERSION
+        diskcache.PARSER_VERSION = version + 1
+        try:
+            with DiskParseCache(self.path) as cache:
+                self.assertEqual(len(cache), 0)
+        finally:
+            diskcache.PARSER_VERSION = version
+
+
+def suite():
+    suite1 = unittest.makeSuite(TestDiskParseCache, 'test')
+    return unittest.TestSuite((suite1,))
+
+if __name__ == '__main__':
+    unittest.main()
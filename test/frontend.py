@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import threading
+import unittest
+from multiprocessing import TimeoutError
+from Queue import Full
+
+from bibjsontools.frontend import Metrics, PendingParse, ResolverFrontEnd, percentile
+from bibjsontools.openurl import from_openurl
+
+QUERIES = [
+    u'volume=16&genre=article&spage=538&sid=EBSCO:aph&title=Current+Pharmaceutical+Design&date=20100211&issue=5&issn=13816128&atitle=Targeting',
+    u'sid=google&auinit=S&aulast=Maffeis&atitle=An+operational+semantics+for+JavaScript&id=doi:10.1007/978-3-540-89330-1_22',
+    u'isbn=9781429233231&title=Introduction+to+Genetic+Analysis.&genre=book',
+]
+
+class TestResolverFrontEnd(unittest.TestCase):
+
+    def setUp(self):
+        self.frontend = ResolverFrontEnd(workers=2, max_pending=2, timeout=10)
+
+    def tearDown(self):
+        self.frontend.close()
+
+    def test_parse(self):
+        self.assertEqual(self.frontend.parse(QUERIES[0]), from_openurl(QUERIES[0]))
+        d = {'isbn': ['9781429233231'], 'genre': ['book']}
+        self.assertEqual(self.frontend.parse(d)['identifier'],
+                         [{'type': 'isbn', 'id': '9781429233231'}])
+
+    def test_parse_batch_keeps_order(self):
+        out = list(self.frontend.parse_batch(QUERIES * 5))
+        self.assertEqual(out, [from_openurl(q) for q in QUERIES * 5])
+        metrics = self.frontend.metrics.snapshot()
+        self.assertEqual(metrics['completed'], 15)
+        self.assertTrue(metrics['p99'] >= metrics['p50'] >= 0)
+
+    def test_callback_and_errors(self):
+        done = threading.Event()
+        seen = []
+
+        def callback(pending):
+            seen.append(pending.get())
+            done.set()
+
+        self.frontend.submit(QUERIES[1], callback=callback)
+        self.assertTrue(done.wait(10))
+        self.assertEqual(seen[0]['identifier'][0]['id'], 'doi:10.1007/978-3-540-89330-1_22')
+        self.assertRaises(TypeError, self.frontend.parse, None)
+        self.assertEqual(self.frontend.metrics.failed, 1)
+
+    def test_backpressure(self):
+        for i in range(self.frontend.max_pending):
+            self.frontend._slots.acquire()
+        self.assertRaises(Full, self.frontend.submit, QUERIES[0], block=False)
+        self.assertEqual(self.frontend.metrics.rejected, 1)
+
+    def test_timeout(self):
+        metrics = Metrics()
+        pending = PendingParse(metrics, 0.01)
+        self.assertRaises(TimeoutError, pending.get)
+        self.assertEqual(metrics.timed_out, 1)
+
+    def test_process_mode(self):
+        with ResolverFrontEnd(workers=1, mode='process', openurl=False) as frontend:
+            self.assertEqual(list(frontend.parse_batch(QUERIES)),
+                             [from_openurl(q, openurl=False) for q in QUERIES])
+        self.assertRaises(ValueError, ResolverFrontEnd, mode='fiber')
+
+    def test_percentile(self):
+        self.assertEqual(percentile(range(101), 99), 99)
+        self.assertEqual(percentile([], 50), None)
+
+
+def suite():
+    suite1 = unittest.makeSuite(TestResolverFrontEnd, 'test')
+    return unittest.TestSuite((suite1,))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from bibjsontools.index import BibIndex, dedupe, fingerprint, match_keys
+from bibjsontools.openurl import from_openurl
+
+class TestMatchKeys(unittest.TestCase):
+
+    def test_identifiers(self):
+        b = from_openurl(u'rft_id=info:doi/10.1039/B814549K&rft.issn=1757-9694&rft.volume=1&rft.issue=1&rft.spage=30&rft.atitle=X')
+        keys = match_keys(b)
+        self.assertTrue(('doi', u'doi:10.1039/b814549k') in keys)
+        self.assertTrue(('issn', u'1757-9694', u'1', u'1', u'30') in keys)
+
+    def test_fingerprint_fallback(self):
+        b = from_openurl(u'title=The+Blind+Assassin!&date=2000')
+        self.assertEqual(match_keys(b), [('title', u'theblindassassin', u'2000')])
+        self.assertEqual(fingerprint({'title': u'Unknown'}), None)
+
+
+class TestBibIndex(unittest.TestCase):
+
+    def test_groups_same_work(self):
+        records = [
+            ('a', from_openurl(u'rft_id=info:doi/10.1000/182&atitle=First')),
+            ('b', from_openurl(u'issn=17579694&volume=1&issue=1&spage=30&atitle=Other')),
+            ('c', from_openurl(u'doi=10.1000/182&rft.issn=1757-9694&rft.volume=1&rft.issue=1&rft.spage=30')),
+            ('d', from_openurl(u'isbn=0-87023-292-4&title=Necessity+for+ruins')),
+            ('e', from_openurl(u'rft.isbn=0870232924&title=Necessity+for+ruins,+and+other+topics')),
+            ('f', from_openurl(u'title=Medical+studies&date=2001')),
+            ('g', from_openurl(u'title=Medical+Studies.&date=2001')),
+            ('h', from_openurl(u'title=Medical+studies&date=2002')),
+        ]
+        clusters = sorted(sorted(c) for c in dedupe(iter(records)))
+        self.assertEqual(clusters, [['a', 'b', 'c'], ['d', 'e'], ['f', 'g'], ['h']])
+
+    def test_incremental_lookup(self):
+        index = BibIndex()
+        index.add(1, from_openurl(u'pmid=18539564'))
+        self.assertEqual(index.lookup(('pmid', u'info:pmid/18539564')), 1)
+        self.assertEqual(index.lookup(('pmid', u'info:pmid/1')), None)
+        self.assertEqual(index.find(from_openurl(u'rft_id=pmid:18539564')), set([1]))
+        self.assertEqual(index.add(2, from_openurl(u'rft_id=info:pmid/18539564')), 1)
+        self.assertEqual(sorted(index.cluster(2)), [1, 2])
+        self.assertEqual(len(index), 2)
+        self.assertRaises(ValueError, index.add, 2, {})
+
+
+def suite():
+    suite1 = unittest.makeSuite(TestMatchKeys, 'test')
+    suite2 = unittest.makeSuite(TestBibIndex, 'test')
+    return unittest.TestSuite((suite1, suite2))
+
+if __name__ == '__main__':
+    unittest.main()
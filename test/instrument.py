@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from bibjsontools import instrument
+from bibjsontools.openurl import BibJSONToOpenURL, OpenURLParser, from_openurl
+
+Q = u'rft_val_fmt=info:ofi/fmt:kev:mtx:journal&rft.spage=30&rft.epage=42&rft.title=INTEGRATIVE%20BIOLOGY&rft.aulast=Castillo&rft.date=2009&rft.atitle=Manipulation&rft.au=Svendsen%2C%20W&rft_id=info:doi/10%2E1039%2Fb814549k&rft.issn=1757-9694&rft.genre=article'
+
+class TestInstrument(unittest.TestCase):
+
+    def tearDown(self):
+        instrument.disable()
+
+    def test_counts_stages(self):
+        expected = from_openurl(Q)
+        stats = instrument.enable()
+        self.assertEqual([from_openurl(Q), from_openurl(Q)], [expected, expected])
+        snap = stats.snapshot()
+        for stage in ('tokenize', 'fold', 'identifiers', 'authors', 'pages',
+                      'pull_oclc', 'parse', 'openurl'):
+            self.assertEqual(snap[stage]['calls'], 2, stage)
+        self.assertTrue(snap['classify_identifier']['calls'] >= 2)
+        self.assertTrue(snap['parse']['seconds'] >= snap['identifiers']['seconds'])
+        self.assertTrue('identifiers' in stats.report())
+
+    def test_callbacks(self):
+        seen = []
+        with instrument.instrumented(lambda stage, secs: seen.append(stage)) as stats:
+            from_openurl(Q, openurl=False)
+        self.assertTrue('parse' in seen)
+        self.assertFalse('openurl' in seen)
+        self.assertEqual(instrument.stats, None)
+        #Nothing is recorded once disabled.
+        from_openurl(Q)
+        self.assertEqual(stats.snapshot()['parse']['calls'], 1)
+
+    def test_disable_restores_originals(self):
+        originals = [owner.__dict__[name] for stage, owner, name in instrument.STAGES]
+        instrument.enable()
+        self.assertFalse(OpenURLParser.__dict__['identifiers'] is originals[3])
+        stats = instrument.disable()
+        self.assertEqual([owner.__dict__[name] for stage, owner, name in instrument.STAGES],
+                         originals)
+        self.assertTrue(isinstance(stats, instrument.Stats))
+        self.assertEqual(instrument.disable(), None)
+        self.assertTrue(BibJSONToOpenURL.parse.__doc__)
+
+
+def suite():
+    suite1 = unittest.makeSuite(TestInstrument, 'test')
+    return unittest.TestSuite((suite1,))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from bibjsontools.normalize import (HAVE_NUMPY, MISSING, BatchNormalizer,
+                                    normalize_date, normalize_pages,
+                                    normalize_volume, raw_columns)
+
+class TestNormalize(unittest.TestCase):
+
+    def test_dates(self):
+        self.assertEqual(normalize_date(u'20100211'), u'2010-02-11')
+        self.assertEqual(normalize_date(u'2013-01-01'), u'2013-01-01')
+        self.assertEqual(normalize_date(u'2013-01-01T00:00:00Z'), u'2013-01-01')
+        self.assertEqual(normalize_date(u'2010/2/5'), u'2010-02-05')
+        self.assertEqual(normalize_date(u'201002'), u'2010-02')
+        self.assertEqual(normalize_date(u'2008'), u'2008')
+        #Impossible days and months are dropped.
+        self.assertEqual(normalize_date(u'2010-02-30'), u'2010-02')
+        self.assertEqual(normalize_date(u'1998-99'), u'1998')
+        self.assertEqual(normalize_date(u'Feb. 2010'), u'2010-02')
+        self.assertEqual(normalize_date(u'Spring 2009'), u'2009')
+        self.assertEqual(normalize_date(u'02/11/2010'), u'2010')
+        self.assertEqual(normalize_date(u'n.d.'), None)
+        self.assertEqual(normalize_date(None), None)
+
+    def test_pages(self):
+        self.assertEqual(normalize_pages(u'538'), (538, MISSING))
+        self.assertEqual(normalize_pages(u'30', u'42'), (30, 42))
+        self.assertEqual(normalize_pages(u'?', u'EOA'), (MISSING, MISSING))
+        self.assertEqual(normalize_pages(None, None, u'25 - 57'), (25, 57))
+        self.assertEqual(normalize_pages(None, None, u'S12–S20'), (12, 20))
+        self.assertEqual(normalize_pages(None, None, u'pp. 33'), (33, MISSING))
+        self.assertEqual(normalize_pages(u'30', None, u'30-42'), (30, 42))
+        #Abbreviated end pages.
+        self.assertEqual(normalize_pages(u'123', u'45'), (123, 145))
+        self.assertEqual(normalize_pages(None, None, u'1198-201'), (1198, 1201))
+        self.assertEqual(normalize_pages(u'199', u'5'), (199, MISSING))
+        #Start page from a single page in pages, end page from epage.
+        self.assertEqual(normalize_pages(None, u'71', u'361'), (361, 371))
+        self.assertEqual(normalize_pages(None, u'5', u'100'), (100, 105))
+        self.assertEqual(normalize_pages(None, u'120', u'100'), (100, 120))
+
+    def test_volumes(self):
+        self.assertEqual(normalize_volume(u'16'), 16)
+        self.assertEqual(normalize_volume(u'vol. 16'), 16)
+        self.assertEqual(normalize_volume(u'16(5)'), 16)
+        self.assertEqual(normalize_volume(u'XIV'), 14)
+        self.assertEqual(normalize_volume(u'Suppl'), MISSING)
+        self.assertEqual(normalize_volume(None), MISSING)
+
+
+class TestBatchNormalizer(unittest.TestCase):
+
+    QUERIES = [
+        u'volume=16&genre=article&spage=538&date=20100211&issue=5&issn=13816128&atitle=Targeting',
+        u'rft.spage=30&rft.epage=42&rft.date=2009&rft.volume=1&rft.genre=article',
+        u'',
+        u'genre=bookitem&isbn=9781402032899&date=2005&pages=25-57',
+        u'genre=book&isbn=9781429233231&title=Introduction+to+Genetic+Analysis.',
+    ]
+
+    def test_lists(self):
+        normalizer = BatchNormalizer(arrays=False)
+        cols = normalizer.normalize(**raw_columns(self.QUERIES))
+        self.assertEqual(cols['date'], [u'2010-02-11', u'2009', u'2005', None])
+        self.assertEqual(cols['year'], [2010, 2009, 2005, MISSING])
+        self.assertEqual(cols['volume'], [16, 1, MISSING, MISSING])
+        self.assertEqual(cols['start_page'], [538, 30, 25, MISSING])
+        self.assertEqual(cols['end_page'], [MISSING, 42, 57, MISSING])
+
+    def test_memo(self):
+        normalizer = BatchNormalizer(arrays=False, memo_size=2)
+        dates, years = normalizer.dates([u'2009', u'2010', u'2009', u'2011', u'2011'])
+        self.assertEqual(years, [2009, 2010, 2009, 2011, 2011])
+        self.assertEqual(sorted(normalizer._memos['date']), [u'2009', u'2010'])
+        starts, ends = normalizer.pages([u'1', u'1'], [u'9', u'9'])
+        self.assertEqual((starts, ends), ([1, 1], [9, 9]))
+        self.assertEqual(len(normalizer._memos['pages']), 1)
+
+    def test_pages_from_single_page(self):
+        cols = BatchNormalizer(arrays=False).normalize(spage=[None, u'1'], epage=[u'5', u'2'],
+                                                       pages=[u'100', None])
+        self.assertEqual(cols, {'start_page': [100, 1], 'end_page': [105, 2]})
+
+    def test_pages_only(self):
+        cols = BatchNormalizer(arrays=False).normalize(pages=[u'25-57', None])
+        self.assertEqual(cols, {'start_page': [25, MISSING], 'end_page': [57, MISSING]})
+
+    if HAVE_NUMPY:
+        def test_numpy(self):
+            import numpy
+            cols = BatchNormalizer().normalize(**raw_columns(self.QUERIES))
+            self.assertEqual(cols['start_page'].dtype, numpy.int64)
+            self.assertEqual(list(cols['start_page'][cols['year'] >= 2009]), [538, 30])
+            self.assertEqual(cols['date'][0], u'2010-02-11')
+
+        def test_numpy_large_values(self):
+            starts, ends = BatchNormalizer().pages([u'3000000000', u'99999999999999999999'])
+            self.assertEqual(list(starts), [3000000000, MISSING])
+            volumes = BatchNormalizer(arrays=False).volumes([u'99999999999999999999'])
+            self.assertEqual(volumes, [99999999999999999999])
+    else:
+        def test_arrays_need_numpy(self):
+            self.assertRaises(ImportError, BatchNormalizer, arrays=True)
+            self.assertEqual(BatchNormalizer().arrays, False)
+
+
+def suite():
+    suite1 = unittest.makeSuite(TestNormalize, 'test')
+    suite2 = unittest.makeSuite(TestBatchNormalizer, 'test')
+    return unittest.TestSuite((suite1, suite2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -16,6 +16,13 @@ from bibjsontools import from_openurl
 from bibjsontools import from_dict
 from bibjsontools import to_openurl
 from bibjsontools import OpenURLParser
+from bibjsontools import parse_many
+from bibjsontools import from_openurl_stream
+from bibjsontools.openurl import KEY_ALIASES
+from bibjsontools.openurl import PARSED_KEYS
+from bibjsontools.openurl import tokenize
+from bibjsontools.openurl import classify_identifier
+from bibjsontools.openurl import LazyBibJSON
 
 class TestFromOpenURL(unittest.TestCase):
 
@@ -348,12 +355,325 @@ class TestFromDict(unittest.TestCase):
         b = from_dict(qdict)
         self.assertEqual(b['title'], 'Unknown')
 
+class TestParseMany(unittest.TestCase):
+
+    def test_matches_from_openurl(self):
+        queries = [
+            u'sid=google&auinit=S&aulast=Maffeis&atitle=An+operational+semantics+for+JavaScript&id=doi:10.1007/978-3-540-89330-1_22',
+            u'',
+            u'title=Medical+studies&stitle=Med+studies',
+        ]
+        bibs = list(parse_many(queries))
+        self.assertEqual(len(bibs), 2)
+        self.assertEqual(bibs[0], from_openurl(queries[0]))
+        self.assertEqual(bibs[1], from_openurl(queries[2]))
+
+    def test_stream(self):
+        from StringIO import StringIO
+        log = StringIO('genre=book&title=A+book\n\neissn=15414159&pages=125-141\n')
+        bibs = from_openurl_stream(log)
+        self.assertEqual(bibs.next()['title'], 'A book')
+        self.assertEqual(bibs.next()['pages'], '125-141')
+        self.assertRaises(StopIteration, bibs.next)
+
+class TestKeyAliases(unittest.TestCase):
+
+    def test_precedence_matches_find_key(self):
+        queries = [
+            u'rft_val_fmt=info:ofi/fmt:kev:mtx:journal&rft.title=JOURNAL%20OF%20THE%20AMERICAN%20CERAMIC%20SOCIETY&rft.btitle=JOURNAL%20OF%20THE%20AMERICAN%20CERAMIC%20SOCIETY&rft.atitle=ELASTIC%20PROPERTIES&title=Short&stitle=S&rft.stitle=RS&sid=x&rfr_id=y&id=z',
+            u'title=Medical+studies&stitle=Med+studies&isbn=1&rft.isbn=2+3&pages=1-2&rft.spage=4',
+        ]
+        for q in queries:
+            op = OpenURLParser(q)
+            for field, keys in KEY_ALIASES.items():
+                self.assertEqual(op._field(field), op._find_key(keys))
+                self.assertEqual(op._field_values(field), op._find_repeating_key(keys))
+                self.assertEqual(op._field_items(field), op._find_key_values(keys))
+
+    def test_blank_value_wins(self):
+        #A blank value from a dict still takes precedence, as before.
+        op = OpenURLParser('', query_dict={'rft.atitle': [u''], 'rft.btitle': [u'Book']})
+        self.assertEqual(op._field('title'), u'')
+
+class TestPartialParse(unittest.TestCase):
+
+    q = u'rft_val_fmt=info:ofi/fmt:kev:mtx:journal&rfr_id=info:sid/www.isinet.com:WoK:UA&rft.spage=30&rft.issue=1&rft.epage=42&rft.title=INTEGRATIVE%20BIOLOGY&rft.aulast=Castillo&rft.date=2009&rft.volume=1&rft.stitle=INTEGR%20BIOL&rft.atitle=Manipulation%20of%20biological%20samples&rft.au=Svendsen%2C%20W&rft_id=info:doi/10%2E1039%2Fb814549k&rft.issn=1757-9694&rft.genre=article'
+
+    def test_only_requested_facets(self):
+        op = OpenURLParser(self.q)
+        d = op.parse_fields(['identifier'])
+        self.assertEqual(d.keys(), ['identifier'])
+        self.assertEqual(op._cache.keys(), ['identifiers'])
+        self.assertEqual(op.identifiers(), d['identifier'])
+
+    def test_results_dont_share_facets(self):
+        op = OpenURLParser(self.q)
+        first = op.parse(openurl=False)
+        first['identifier'][0]['id'] = 'changed'
+        first['author'].append({'name': 'Extra'})
+        first['journal']['name'] = 'changed'
+        partial = op.parse_fields(['identifier', 'author', 'journal'])
+        partial['identifier'].pop()
+        self.assertEqual(op.parse(openurl=False), from_openurl(self.q, openurl=False))
+
+    def test_matches_parse(self):
+        full = from_openurl(self.q)
+        fields = ['title', 'journal', 'year', 'pages', '_openurl']
+        d = OpenURLParser(self.q).parse_fields(fields)
+        for k in fields:
+            self.assertEqual(d[k], full[k])
+
+    def test_required_keys(self):
+        d = OpenURLParser(u'issn=1234').parse_fields(['title', 'volume'])
+        self.assertEqual(d, {'title': u'Unknown'})
+
+    def test_cache_reset_on_load(self):
+        op = OpenURLParser(u'genre=book')
+        self.assertEqual(op.type, 'book')
+        op.load(u'genre=article')
+        self.assertEqual(op.type, 'article')
+
+class TestLazyOpenURL(unittest.TestCase):
+
+    q = u'sid=google&auinit=S&aulast=Maffeis&atitle=An+operational+semantics+for+JavaScript&id=doi:10.1007/978-3-540-89330-1_22'
+
+    def test_omit(self):
+        b = from_openurl(self.q, openurl=False)
+        self.assertTrue('_openurl' not in b)
+        self.assertEqual(b['title'], u'An operational semantics for JavaScript')
+
+    def test_lazy_not_built_until_used(self):
+        b = from_openurl(self.q, openurl='lazy')
+        self.assertEqual(b['type'], 'article')
+        self.assertFalse(dict.__contains__(b, '_openurl'))
+        self.assertEqual(b['_openurl'], from_openurl(self.q)['_openurl'])
+
+    def test_lazy_matches_eager(self):
+        eager = from_openurl(self.q)
+        self.assertEqual(from_openurl(self.q, openurl='lazy'), eager)
+        self.assertEqual(eager, from_openurl(self.q, openurl='lazy'))
+        self.assertEqual(from_openurl(self.q, openurl='lazy').get('_openurl'), eager['_openurl'])
+        self.assertEqual(sorted(from_openurl(self.q, openurl='lazy').keys()), sorted(eager.keys()))
+
+    def test_lazy_json(self):
+        eager = from_openurl(self.q)
+        lazy = from_openurl(self.q, openurl='lazy')
+        self.assertEqual(json.loads(json.dumps(lazy)), json.loads(json.dumps(eager)))
+
+    def test_lazy_copy(self):
+        import copy
+        eager = from_openurl(self.q)
+        for c in (from_openurl(self.q, openurl='lazy').copy(),
+                  copy.copy(from_openurl(self.q, openurl='lazy'))):
+            self.assertEqual(type(c), dict)
+            self.assertEqual(c, eager)
+        #dict() reads the underlying dict, so _openurl is only there once built.
+        lazy = from_openurl(self.q, openurl='lazy')
+        self.assertFalse('_openurl' in dict(lazy))
+        lazy['_openurl']
+        self.assertEqual(dict(lazy), eager)
+
+    def test_lazy_caller_openurl(self):
+        #A supplied _openurl isn't replaced when the dict is later iterated.
+        b = from_openurl(self.q, openurl='lazy')
+        b.update({'_openurl': 'mine'})
+        b.keys()
+        self.assertEqual(b['_openurl'], 'mine')
+        b = from_openurl(self.q, openurl='lazy')
+        b.update(_openurl='mine')
+        b.items()
+        self.assertEqual(b['_openurl'], 'mine')
+        b = LazyBibJSON(from_openurl(self.q, openurl=False), _openurl='mine')
+        b.values()
+        self.assertEqual(b['_openurl'], 'mine')
+        #_openurl is already present, built on demand.
+        b = from_openurl(self.q, openurl='lazy')
+        self.assertEqual(b.setdefault('_openurl', 'mine'), from_openurl(self.q)['_openurl'])
+
+class TestTokenize(unittest.TestCase):
+
+    queries = [
+        u'rft.pub=W+H+Freeman+%26+Co&rft.btitle=Introduction+to+Genetic+Analysis.&rft_val_fmt=info%3Aofi%2Ffmt%3Akev%3Amtx%3Abook&isbn=9781429233231&req_dat=%3Csessionid%3E0%3C%2Fsessionid%3E&pid=%3Caccession+number%3E277200522%3C%2Faccession+number%3E&rft.date=2008&genre=book&rfe_dat=%3Caccessionnumber%3E277200522%3C%2Faccessionnumber%3E&id=doi%3A&rft.genre=book',
+        u'volume=16&genre=article&spage=538&sid=EBSCO:aph&title=Current+Pharmaceutical+Design&issn=13816128&pid=&atitle=Targeting+%ce%b17+Nicotinic',
+        u'ctx_ver=Z39.88-2004&amp;rfr_id=info:sid/summon.serialssolutions.com&amp;rft.genre=news&amp;rft.atitle=The easy way&amp;rft.au=Joe Swift',
+        u'rft.isbn=0870232924&rft.isbn=9780870232923&isbn=1+2&rft.au=A&rft.au=B;rft.au=C',
+        u'\n?ctx_ver=Z39.88-2004&rft.title=Lute+Suite&rft_id=info:doi/\n',
+        u'rft%2Eatitle=Encoded+key&rft.btitle=Book',
+        u'rft.atitle&atitle=a=b&&=x&title=',
+        u"rft.title=Elective delivery at 34⁰(/)⁷ weeks' gestation&pmid=20934682&genre=journal",
+        'atitle=Les+Mis%C3%A9rables&rft.au=%E6%97%A5',
+    ]
+
+    def test_matches_parse_qs(self):
+        for q in self.queries:
+            if isinstance(q, unicode):
+                #Escapes in unicode queries are read as UTF-8.
+                expected = dict((k.decode('utf-8'), [i.decode('utf-8') for i in v])
+                                for k, v in parse_qs(q.encode('utf-8')).items())
+            else:
+                expected = parse_qs(q)
+            expected = dict((k, v) for k, v in expected.items() if k in PARSED_KEYS)
+            self.assertEqual(tokenize(q), expected)
+            for k, v in tokenize(q).items():
+                self.assertEqual([type(i) for i in v], [type(i) for i in expected[k]])
+
+    def test_unicode_escapes(self):
+        self.assertEqual(tokenize(u'atitle=Caf%C3%A9')['atitle'], [u'Caf\xe9'])
+        #Escapes that aren't UTF-8 are read as Latin-1.
+        self.assertEqual(tokenize(u'atitle=Caf%E9')['atitle'], [u'Caf\xe9'])
+        self.assertEqual(tokenize('atitle=Caf%C3%A9')['atitle'], ['Caf\xc3\xa9'])
+        self.assertEqual(from_openurl(u'atitle=Caf%C3%A9')['_openurl'],
+                         from_openurl('atitle=Caf%C3%A9')['_openurl'])
+
+    def test_skips_unused_keys(self):
+        self.assertEqual(tokenize(u'req_dat=%3Cx%3E&checksum=1&issn=1234'), {u'issn': [u'1234']})
+
+class TestClassifyIdentifier(unittest.TestCase):
+
+    def test_forms(self):
+        cases = [
+            (u'info:doi/10.1039/b814549k', ('doi', u'doi:10.1039/b814549k')),
+            (u'doi:10.1007/978-3-540-89330-1_22', ('doi', u'doi:10.1007/978-3-540-89330-1_22')),
+            (u'http://dx.doi.org/10.1000/182', ('doi', u'doi:10.1000/182')),
+            (u'10.1000/182', ('doi', u'doi:10.1000/182')),
+            (u'info:pmid/1757671', ('pmid', u'info:pmid/1757671')),
+            (u'pmid:18539564', ('pmid', u'info:pmid/18539564')),
+            (u'info:oclcnum/43287739', ('oclc', u'43287739')),
+            (u'(OCoLC)ocm43287739', ('oclc', u'43287739')),
+            (u'(OCoLC)43287739', ('oclc', u'43287739')),
+            (u'http://www.worldcat.org/oclc/678061209', ('oclc', u'678061209')),
+            (u'urn:ISBN:978-0-385-47572-3', ('isbn', u'9780385475723')),
+            (u'urn:ISSN:1175-5652', ('issn', u'1175-5652')),
+            (u'issn 0002782x', ('issn', u'0002-782X')),
+            (u'eissn:15414159', ('eissn', u'1541-4159')),
+            (u'info:sid/Brown-Vufind', None),
+            (u'doi:', None),
+            (u'info:doi/', None),
+        ]
+        for value, expected in cases:
+            self.assertEqual(classify_identifier(value), expected, value)
+
+    def test_prefix_not_stripped_as_characters(self):
+        #lstrip('info:doi/') used to eat the start of the DOI as well.
+        self.assertEqual(classify_identifier(u'info:doi/no-such-doi'),
+                         ('doi', u'doi:no-such-doi'))
+
+    def test_hint(self):
+        self.assertEqual(classify_identifier(u'18539564'), None)
+        self.assertEqual(classify_identifier(u'18539564', 'pmid'),
+                         ('pmid', u'info:pmid/18539564'))
+
+    def test_identifiers_from_keys(self):
+        b = from_openurl(u'pmid=18539564&doi=10.1000/182&rft_id=urn:ISBN:9781429233231&rft_id=info:pmid/1757671')
+        self.assertEqual(b['identifier'], [
+            {'type': 'pmid', 'id': u'info:pmid/1757671'},
+            {'type': 'doi', 'id': u'doi:10.1000/182'},
+            {'type': 'pmid', 'id': u'18539564'},
+        ])
+
+class TestAuthors(unittest.TestCase):
+
+    def test_positional_pairs(self):
+        q = u'aulast=Castillo&aufirst=Jaime&aulast=Svendsen&aufirst=Winnie&auinitm=E&rft.atitle=X'
+        self.assertEqual(from_openurl(q)['author'], [
+            {'name': u'Castillo, Jaime', 'lastname': u'Castillo', 'firstname': u'Jaime', '_minitial': u'E'},
+            {'name': u'Svendsen, Winnie', 'lastname': u'Svendsen', 'firstname': u'Winnie'},
+        ])
+
+    def test_pairs_within_key_family(self):
+        q = u'rft.aulast=Barrie&rft.aufirst=James&aulast=Barrie&aufirst=J'
+        names = [a['name'] for a in from_openurl(q)['author']]
+        self.assertEqual(names, [u'Barrie, James', u'Barrie, J'])
+        #Bare first names are used when there are no rft. ones.
+        q = u'rft.aulast=Barrie&aufirst=J'
+        self.assertEqual(from_openurl(q)['author'][0]['name'], u'Barrie, J')
+
+    def test_many_authors(self):
+        q = u'&'.join([u'rft.au=Author%d' % i for i in range(500)] * 2)
+        authors = from_openurl(q)['author']
+        self.assertEqual(len(authors), 500)
+        self.assertEqual(authors[499], {'name': u'Author499'})
+
+
+class TestKEVSerializer(unittest.TestCase):
+
+    bib = {'type': 'article', 'title': u'Caf\xe9 society', 'year': '2009',
+           'journal': {'name': u'Journal of things'},
+           'author': [{'name': u'Castillo, J'}, {'name': u'Svendsen, W'}],
+           'identifier': [{'type': 'issn', 'id': '1757-9694'},
+                          {'type': 'eissn', 'id': '1757-9708'},
+                          {'type': 'doi', 'id': 'doi:10.1039/b814549kdoi'},
+                          {'type': 'pmid', 'id': '18539564'}]}
+
+    def test_keeps_all_authors_and_identifiers(self):
+        qdict = parse_qs(to_openurl(self.bib))
+        self.assertEqual(qdict['rft.au'], ['Castillo, J', 'Svendsen, W'])
+        self.assertEqual(qdict['rft_id'], ['info:doi/10.1039/b814549kdoi', 'info:pmid/18539564'])
+        self.assertEqual(qdict['rft.eissn'], ['1757-9708'])
+
+    def test_stable_order(self):
+        ourl = to_openurl(self.bib)
+        self.assertTrue(ourl.startswith('ctx_ver=Z39.88-2004&rft_val_fmt=info%3Aofi/fmt%3Akev%3Amtx%3Ajournal&rfr_id=info%3Asid/&rft.genre=article&rft.atitle=Caf%C3%A9+society&'))
+        reordered = dict(reversed(self.bib.items()))
+        self.assertEqual(to_openurl(reordered), ourl)
+
+    def test_quoting(self):
+        from bibjsontools.openurl import quote_value
+        import urllib
+        for v in ('Plain text-1.0_/x', u'Journal of things', 'a&b=c', u'\u2014 dash'):
+            encoded = v.encode('utf-8') if isinstance(v, unicode) else v
+            self.assertEqual(quote_value(v), urllib.quote_plus(encoded, safe='/'))
+        self.assertTrue(isinstance(quote_value(u'ascii'), str))
+
+    def test_quoting_cache(self):
+        import warnings
+        from bibjsontools import openurl
+        size = openurl.QUOTED_CACHE_SIZE
+        openurl.QUOTED_CACHE_SIZE = 3
+        try:
+            openurl._QUOTED.clear()
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', UnicodeWarning)
+                self.assertEqual(openurl.quote_value('Caf\xe9'), 'Caf%E9')
+                self.assertEqual(openurl.quote_value(u'Caf\xe9'), 'Caf%C3%A9')
+                self.assertEqual(openurl.quote_value('Caf\xe9'), 'Caf%E9')
+            self.assertEqual(len(openurl._QUOTED), 2)
+            for v in ('a', 'b', 'c', 'd'):
+                openurl.quote_value(v)
+            #Filling the cache starts it over rather than freezing it.
+            self.assertEqual(sorted(v for t, v in openurl._QUOTED), ['b', 'c', 'd'])
+        finally:
+            openurl.QUOTED_CACHE_SIZE = size
+            openurl._QUOTED.clear()
+
+    def test_write(self):
+        from StringIO import StringIO
+        from bibjsontools.openurl import BibJSONToOpenURL, write_openurls
+        buf = StringIO()
+        BibJSONToOpenURL(self.bib).write(buf)
+        self.assertEqual(buf.getvalue(), to_openurl(self.bib))
+        buf = StringIO()
+        self.assertEqual(write_openurls([self.bib, self.bib], buf, base='http://resolver'), 2)
+        lines = buf.getvalue().splitlines()
+        self.assertEqual(lines, ['http://resolver?' + to_openurl(self.bib)] * 2)
+
+
 def suite():
     suite1 = unittest.makeSuite(TestFromOpenURL, 'test')
     suite2 = unittest.makeSuite(TestToOpenURL, 'test')
     suite3 = unittest.makeSuite(TestFromDict, 'test')
     suite4 = unittest.makeSuite(TestThesisToOpenURL, 'test')
-    all = unittest.TestSuite((suite1, suite2, suite3, suite4))
+    suite5 = unittest.makeSuite(TestParseMany, 'test')
+    suite6 = unittest.makeSuite(TestKeyAliases, 'test')
+    suite7 = unittest.makeSuite(TestPartialParse, 'test')
+    suite8 = unittest.makeSuite(TestLazyOpenURL, 'test')
+    suite9 = unittest.makeSuite(TestTokenize, 'test')
+    suite10 = unittest.makeSuite(TestClassifyIdentifier, 'test')
+    suite11 = unittest.makeSuite(TestAuthors, 'test')
+    suite12 = unittest.makeSuite(TestKEVSerializer, 'test')
+    all = unittest.TestSuite((suite1, suite2, suite3, suite4, suite5, suite6,
+                              suite7, suite8, suite9, suite10, suite11,
+                              suite12))
     return all
 
 if __name__ == '__main__':
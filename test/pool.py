@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from bibjsontools.openurl import from_openurl, parse_many
+from bibjsontools.pool import InternPool
+
+Q = u'volume=16&genre=article&spage=538&sid=EBSCO:aph&title=Current+Pharmaceutical+Design&date=20100211&issue=5&issn=13816128&atitle=Targeting'
+
+class TestInternPool(unittest.TestCase):
+
+    def test_intern(self):
+        pool = InternPool()
+        a = u''.join([u'EBSCO', u':aph'])
+        b = u''.join([u'EBSCO', u':aph'])
+        self.assertFalse(a is b)
+        self.assertTrue(pool.intern(a) is a)
+        self.assertTrue(pool.intern(b) is a)
+        self.assertEqual(pool.intern(None), None)
+        self.assertEqual(pool.intern(u''), u'')
+        stats = pool.stats
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 0.5))
+
+    def test_keeps_type(self):
+        pool = InternPool()
+        pool.intern('book')
+        self.assertTrue(isinstance(pool.intern(u'book'), unicode))
+
+    def test_lru_eviction(self):
+        pool = InternPool(maxsize=2)
+        for v in (u'a', u'b', u'a', u'c'):
+            pool.intern(v)
+        self.assertTrue(u'a' in pool)
+        self.assertFalse(u'b' in pool)
+        self.assertEqual(len(pool), 2)
+        self.assertEqual(pool.evictions, 1)
+
+    def test_parse_shares_values(self):
+        pool = InternPool()
+        a, b = parse_many([Q, Q], pool=pool)
+        self.assertEqual(a, from_openurl(Q))
+        for k in ('_rfr', 'volume', 'issue', 'year'):
+            self.assertTrue(a[k] is b[k])
+        self.assertTrue(a['journal']['name'] is b['journal']['name'])
+        self.assertFalse(a['title'] is b['title'])
+        self.assertTrue(pool.stats['hit_rate'] > 0.4)
+
+
+def suite():
+    suite1 = unittest.makeSuite(TestInternPool, 'test')
+    return unittest.TestSuite((suite1,))
+
+if __name__ == '__main__':
+    unittest.main()
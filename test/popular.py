@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import os
+import random
+import unittest
+
+from bibjsontools import popular
+from bibjsontools.openurl import OpenURLParser
+from bibjsontools.popular import (CountMinSketch, ExactCounts, HeavyHitters,
+                                  SpaceSaving, count_works, work_key)
+
+DOI_ARTICLE = u'rft_id=info:doi/10.1039/B814549K&rft.issn=1757-9694&rft.volume=1&rft.issue=1&rft.spage=30&rft.atitle=Manipulation'
+QUERIES = [
+    DOI_ARTICLE,
+    u'doi=10.1039/b814549k&atitle=Manipulation+of+biological+samples',
+    u'issn=17579694&volume=1&issue=1&spage=30&atitle=Other',
+    u'sid=info:sid/sersol:RefinerQuery&genre=bookitem&isbn=9781402032899&atitle=Finding+Keys&spage=25',
+    u'sid=info:sid/sersol:RefinerQuery&genre=bookitem&isbn=9781402032899&atitle=Another+Chapter&spage=60',
+    u'title=The+Blind+Assassin!&date=2000',
+    u'title=the+blind+assassin&date=2000',
+    u'sid=google',
+    u'',
+]
+
+def _skewed(n, seed=0):
+    #Key i turns up about 1/(i+1) as often as key 0.
+    rand = random.Random(seed)
+    return ['work%d' % int(rand.paretovariate(1.0)) for i in range(n)]
+
+class TestWorkKey(unittest.TestCase):
+
+    def key(self, query):
+        return work_key(OpenURLParser(query))
+
+    def test_keys(self):
+        self.assertEqual(self.key(DOI_ARTICLE), u'doi:10.1039/b814549k')
+        self.assertEqual(self.key(QUERIES[1]), u'doi:10.1039/b814549k')
+        self.assertEqual(self.key(QUERIES[2]), u'issn:1757-9694:1:1:30')
+        self.assertEqual(self.key(QUERIES[5]), u'title:theblindassassin:2000')
+        self.assertEqual(self.key(QUERIES[7]), None)
+
+    def test_chapters_are_separate_works(self):
+        self.assertEqual(self.key(QUERIES[3]), u'isbn:9781402032899:25')
+        self.assertEqual(self.key(QUERIES[4]), u'isbn:9781402032899:60')
+        self.assertEqual(self.key(u'isbn=9781402032899&genre=book&spage=25'),
+                         u'isbn:9781402032899')
+
+
+class TestSketches(unittest.TestCase):
+
+    def test_space_saving_never_undercounts(self):
+        keys = _skewed(20000)
+        exact = ExactCounts()
+        summary = SpaceSaving(20)
+        for k in keys:
+            exact.add(k)
+            summary.add(k)
+        self.assertTrue(len(summary) <= 40)
+        for key, count, error in summary.most_common():
+            self.assertTrue(count - error <= exact[key] <= count)
+        #The heaviest keys are kept, in order.
+        top = [k for k, c, e in summary.most_common(3)]
+        self.assertEqual(top, [k for k, c in exact.most_common(3)])
+
+    def test_space_saving_merge(self):
+        keys = _skewed(20000)
+        whole = ExactCounts(keys)
+        left, right = SpaceSaving(20), SpaceSaving(20)
+        for k in keys[:10000]:
+            left.add(k)
+        for k in keys[10000:]:
+            right.add(k)
+        left.update(right)
+        self.assertTrue(len(left) <= 20)
+        for key, count, error in left.most_common():
+            self.assertTrue(whole[key] <= count)
+        self.assertEqual(left.most_common(1)[0][0], whole.most_common(1)[0][0])
+
+    def test_count_min(self):
+        keys = _skewed(5000)
+        exact = ExactCounts(keys)
+        a, b = CountMinSketch(width=256), CountMinSketch(width=256)
+        for k in keys[:2500]:
+            a.add(k)
+        for k in keys[2500:]:
+            b.add(k)
+        a.update(b)
+        for key, count in exact.iteritems():
+            self.assertTrue(a.estimate(key) >= count)
+        self.assertEqual(a.estimate(u'work1'), a.estimate('work1'))
+        self.assertRaises(ValueError, a.update, CountMinSketch(width=128))
+        self.assertRaises(ValueError, CountMinSketch, depth=6)
+
+    def test_heavy_hitters(self):
+        keys = _skewed(20000)
+        exact = ExactCounts(keys)
+        hh = HeavyHitters(size=20, width=1024)
+        for k in keys:
+            hh.add(k)
+        for key, count in hh.most_common(5):
+            self.assertTrue(count >= exact[key])
+        self.assertEqual([k for k, c in hh.most_common(3)],
+                         [k for k, c in exact.most_common(3)])
+
+
+class TestCountWorks(unittest.TestCase):
+
+    def test_count(self):
+        counts, stats = count_works(QUERIES * 3)
+        self.assertEqual(counts[u'doi:10.1039/b814549k'], 6)
+        self.assertEqual(counts[u'title:theblindassassin:2000'], 6)
+        self.assertEqual(counts[u'issn:1757-9694:1:1:30'], 3)
+        self.assertEqual(stats, {'records': 27, 'skipped': 6})
+
+    def test_workers_match_single_process(self):
+        queries = QUERIES * 50
+        single = count_works(queries)
+        sharded = count_works(queries, workers=2, chunk_size=7)
+        self.assertEqual(single, sharded)
+
+    def test_sketch(self):
+        counts, stats = count_works(QUERIES * 10, workers=2, chunk_size=5, sketch_size=2)
+        exact, stats = count_works(QUERIES * 10)
+        self.assertTrue(isinstance(counts, HeavyHitters))
+        for key, n in counts.most_common(2):
+            self.assertEqual(n, exact[key])
+
+    def test_dead_worker(self):
+        count_queries = popular.count_queries
+        def die(*args):
+            os._exit(1)
+        popular.count_queries = die
+        try:
+            #Dies while chunks are still being handed out, and after.
+            for queries, chunk_size in ((QUERIES * 20, 1), (QUERIES, 1000)):
+                self.assertRaises(RuntimeError, count_works, queries,
+                                  workers=2, chunk_size=chunk_size)
+        finally:
+            popular.count_queries = count_queries
+
+    def test_bytes_input(self):
+        counts, stats = count_works([q.encode('utf-8') for q in QUERIES])
+        self.assertEqual(counts, count_works(QUERIES)[0])
+
+    def test_non_ascii_title(self):
+        queries = ['genre=article&atitle=Caf%C3%A9&date=2001',
+                   u'genre=article&atitle=Caf%C3%A9&date=2001',
+                   u'genre=article&atitle=Caf\xe9&date=2001',
+                   'genre=article&atitle=Caf\xc3\xa9&date=2001']
+        counts, stats = count_works(queries)
+        self.assertEqual(dict(counts), {u'title:caf\xe9:2001': 4})
+
+
+def suite():
+    suite1 = unittest.makeSuite(TestWorkKey, 'test')
+    suite2 = unittest.makeSuite(TestSketches, 'test')
+    suite3 = unittest.makeSuite(TestCountWorks, 'test')
+    return unittest.TestSuite((suite1, suite2, suite3))
+
+if __name__ == '__main__':
+    unittest.main()
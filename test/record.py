@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import pickle
+import unittest
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from bibjsontools import ris
+from bibjsontools.openurl import BibJSONToOpenURL, from_openurl, parse_many
+from bibjsontools.record import BibRecord
+
+QUERIES = [
+    u'rft_val_fmt=info:ofi/fmt:kev:mtx:journal&rfr_id=info:sid/www.isinet.com:WoK:UA&rft.spage=30&rft.issue=1&rft.epage=42&rft.title=INTEGRATIVE%20BIOLOGY&rft.aulast=Castillo&url_ctx_fmt=info:ofi/fmt:kev:mtx:ctx&rft.date=2009&rft.volume=1&url_ver=Z39.88-2004&rft.stitle=INTEGR%20BIOL&rft.atitle=Manipulation%20of%20biological%20samples%20using%20micro%20and%20nano%20techniques&rft.au=Svendsen%2C%20W&rft_id=info:doi/10%2E1039%2Fb814549k&rft.auinit=J&rft.issn=1757-9694&rft.genre=article',
+    u'sid=info:sid/sersol:RefinerQuery&genre=bookitem&isbn=9781402032899&&title=The+roots+of+educational+change&atitle=Finding+Keys+to+School+Change%3A+A+40-Year+Odyssey&volume=&part=&issue=&date=2005&spage=25&epage=57&aulast=Miles&aufirst=Matthew',
+    u'issn=1040676X&aulast=Wallace&title=Chronicle%20of%20Philanthropy&volume=17&epage=23&atitle=Where%20Should%20the%20Money%20Go%3F&date=2005&spage=9&issue=24&aufirst=%20Nicole',
+]
+
+class TestBibRecord(unittest.TestCase):
+
+    def test_matches_dict(self):
+        for q in QUERIES:
+            d = from_openurl(q)
+            rec = from_openurl(q, record_class=BibRecord)
+            self.assertTrue(isinstance(rec, BibRecord))
+            self.assertEqual(rec.to_dict(), d)
+            self.assertEqual(rec, d)
+            self.assertEqual(json.loads(rec.to_json()), json.loads(json.dumps(d)))
+
+    def test_access(self):
+        rec = from_openurl(QUERIES[0], openurl=False, record_class=BibRecord)
+        self.assertEqual(rec['type'], 'article')
+        self.assertEqual(rec.journal['shortcode'], u'INTEGR BIOL')
+        self.assertEqual(rec['identifier'][0]['type'], 'doi')
+        self.assertTrue(isinstance(rec.author, tuple))
+        self.assertEqual(rec.get('publisher'), None)
+        self.assertFalse('_openurl' in rec)
+        self.assertRaises(KeyError, rec.__getitem__, 'publisher')
+        self.assertRaises(AttributeError, setattr, rec, 'other', 1)
+
+    def test_shared_strings(self):
+        a, b = parse_many(QUERIES[:1] * 2, record_class=BibRecord)
+        self.assertTrue(a.type is b.type)
+        self.assertTrue(a._rfr is b._rfr)
+        self.assertTrue(a.identifier[0].type is b.identifier[0].type)
+
+    def test_lazy_openurl(self):
+        rec = from_openurl(QUERIES[1], openurl='lazy', record_class=BibRecord)
+        self.assertEqual(rec['_openurl'], from_openurl(QUERIES[1])['_openurl'])
+
+    def test_consumers(self):
+        for q in QUERIES:
+            d = from_openurl(q, openurl=False)
+            rec = from_openurl(q, openurl=False, record_class=BibRecord)
+            self.assertEqual(BibJSONToOpenURL(rec).parse(), BibJSONToOpenURL(d).parse())
+            self.assertEqual(sorted(ris.tags(rec)), sorted(ris.tags(d)))
+
+    def test_extra_keys(self):
+        d = from_openurl(QUERIES[2], openurl=False)
+        d['keyword'] = [u'Fiction', u'Canada']
+        d['author'][0]['email'] = u'n@example.org'
+        d['identifier'].append({'type': 'isbn', 'id': u'9780385475723', 'note': u'pbk'})
+        d['journal']['publisher'] = u'Chronicle'
+        rec = BibRecord.from_bibjson(d, openurl=False)
+        self.assertEqual(rec['keyword'], [u'Fiction', u'Canada'])
+        self.assertTrue('keyword' in rec.keys())
+        self.assertEqual(rec.author[0]['email'], u'n@example.org')
+        self.assertEqual(rec.to_dict(), d)
+        self.assertEqual(pickle.loads(pickle.dumps(rec, 2)), d)
+        self.assertRaises(KeyError, rec.__getitem__, 'abstract')
+
+    def test_pickle(self):
+        rec = from_openurl(QUERIES[0], record_class=BibRecord)
+        for protocol in (0, 2):
+            self.assertEqual(pickle.loads(pickle.dumps(rec, protocol)), rec)
+
+
+def suite():
+    suite1 = unittest.makeSuite(TestBibRecord, 'test')
+    return unittest.TestSuite((suite1,))
+
+if __name__ == '__main__':
+    unittest.main()
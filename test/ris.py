@@ -40,9 +40,117 @@ class TestFromOpenURL(unittest.TestCase):
 
 
 
+class TestRepeatedTags(unittest.TestCase):
+
+	def test_all_authors_and_identifiers(self):
+		q = 'rft.pub=Univ+Of+Mass+Press&rft.au=Jackson%2C+John&rft.au=Smith%2C+Jane&rft.btitle=Necessity+for+ruins&rft.isbn=0870232924+9780870232923&rft.issn=1234-5678&rft.genre=book'
+		bib = from_openurl(q)
+		chunks = ris_chunker(ris.convert(bib))
+		self.assertEqual(chunks[0], ('TY', 'BOOK'))
+		self.assertEqual([v for k, v in chunks if k == 'AU'], ['Jackson, John', 'Smith, Jane'])
+		sn = [v for k, v in chunks if k == 'SN']
+		self.assertEqual(sorted(sn), ['0870232924', '1234-5678', '9780870232923'])
+
+	def test_keywords(self):
+		bib = {'type': 'article', 'title': 'A', 'keyword': ['one', 'two']}
+		tags = ris.tags(bib)
+		self.assertEqual(tags[0], ('TY', 'JOUR'))
+		self.assertEqual(sorted(tags[1:]), [('KW', 'one'), ('KW', 'two'), ('TI', 'A')])
+
+class TestWriteRIS(unittest.TestCase):
+
+	def setUp(self):
+		self.bibs = [
+			from_openurl(u'rft.genre=book&rft.btitle=The+blind+assassin&rft.au=Atwood%2C+Margaret'),
+			from_openurl(u'genre=article&atitle=Les+Mis\xe9rables&title=Natural+Resources+Forum&issn=01650203'),
+		]
+
+	def test_write(self):
+		from StringIO import StringIO
+		out = StringIO()
+		count = ris.write_ris(iter(self.bibs), out)
+		self.assertEqual(count, 2)
+		records = out.getvalue().split('ER  - \n')
+		self.assertEqual(records[-1], '')
+		self.assertTrue(records[0].startswith('TY  - BOOK\n'))
+		self.assertTrue(records[1].startswith('TY  - JOUR\n'))
+		self.assertTrue(('TI', 'The blind assassin') in ris_chunker(records[0]))
+		self.assertTrue(('TI', u'Les Mis\xe9rables'.encode('utf-8')) in ris_chunker(records[1]))
+
+	def test_iter_matches_convert(self):
+		lines = list(ris.iter_ris(self.bibs[:1], encoding=None))
+		self.assertEqual(lines[-1], 'ER  - \n')
+		self.assertEqual(''.join(lines[:-1]), ris.convert(self.bibs[0]))
+
+class TestReadRIS(unittest.TestCase):
+
+	def test_round_trip(self):
+		from StringIO import StringIO
+		q = 'volume=26&genre=article&spage=293&epage=301&sid=EBSCO:aph&title=Natural+Resources+Forum&date=20021101&issue=4&issn=01650203&atitle=Forest+products&aulast=Smith&aufirst=John&id=doi:10.1111/x'
+		bib = from_openurl(q)
+		out = StringIO()
+		ris.write_ris([bib], out)
+		back = list(ris.read_ris(StringIO(out.getvalue())))
+		self.assertEqual(len(back), 1)
+		back = back[0]
+		for k in ('type', 'title', 'journal', 'volume', 'issue', 'year', 'pages'):
+			self.assertEqual(back[k], bib[k])
+		self.assertEqual(back['author'][0]['name'], 'Smith, John')
+		self.assertTrue({'type': 'issn', 'id': '01650203'} in back['identifier'])
+		self.assertTrue({'type': 'doi', 'id': 'doi:10.1111/x'} in back['identifier'])
+
+	def test_multiple_records(self):
+		text = [
+			'\xef\xbb\xbfTY  - BOOK\r\n',
+			'TI  - The blind assassin\r\n',
+			'AU  - Atwood, Margaret\r\n',
+			'SN  - 9780385475723\r\n',
+			'KW  - Fiction\r\n',
+			'KW  - Canada\r\n',
+			'ER  - \r\n',
+			'\r\n',
+			'TY  - CHAP\n',
+			'TI  - A very long\n',
+			'  chapter title\n',
+			'T2  - The handbook\n',
+			'SP  - 25\n',
+			'EP  - 57\n',
+			'ER  -\n',
+		]
+		book, chapter = list(ris.read_ris(iter(text)))
+		self.assertEqual(book['type'], 'book')
+		self.assertEqual(book['author'], [{'name': 'Atwood, Margaret', 'lastname': 'Atwood', 'firstname': 'Margaret'}])
+		self.assertEqual(book['identifier'], [{'type': 'isbn', 'id': '9780385475723'}])
+		self.assertEqual(book['keyword'], ['Fiction', 'Canada'])
+		self.assertEqual(chapter['type'], 'inbook')
+		self.assertEqual(chapter['title'], 'A very long chapter title')
+		self.assertEqual(chapter['journal'], {'name': 'The handbook'})
+		self.assertEqual(chapter['pages'], '25 - 57')
+
+	def test_text_file(self):
+		import io
+		import os
+		import shutil
+		import tempfile
+		tmp = tempfile.mkdtemp()
+		try:
+			path = os.path.join(tmp, 'export.ris')
+			with open(path, 'wb') as f:
+				f.write('\xef\xbb\xbfTY  - JOUR\r\nT1  - Caf\xc3\xa9 culture\r\nER  - \r\n')
+			with io.open(path, encoding='utf-8') as f:
+				records = list(ris.read_ris(f))
+		finally:
+			shutil.rmtree(tmp)
+		self.assertEqual(len(records), 1)
+		self.assertEqual(records[0]['type'], 'article')
+		self.assertEqual(records[0]['title'], u'Caf\xe9 culture')
+
 def suite():
     suite1 = unittest.makeSuite(TestFromOpenURL, 'test')
-    return suite1
+    suite2 = unittest.makeSuite(TestWriteRIS, 'test')
+    suite3 = unittest.makeSuite(TestRepeatedTags, 'test')
+    suite4 = unittest.makeSuite(TestReadRIS, 'test')
+    return unittest.TestSuite((suite1, suite2, suite3, suite4))
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from bibjsontools import scan
+from bibjsontools.openurl import from_openurl
+from bibjsontools.scan import LogScanner
+
+ARTICLE = 'volume=16&genre=article&spage=538&sid=EBSCO:aph&title=Current+Pharmaceutical+Design&date=20100211&issue=5&issn=13816128'
+BOOK = 'ctx_ver=Z39.88-2004&rft.genre=book&rft.btitle=The+blind+assassin&rft.aulast=Atwood'
+DISSERTATION = 'rft.genre=dissertations+%26+theses&rft.title=Rights+for+the+Voiceless&rft.au=Mangla%2C+Akshay'
+
+LOG = ''.join([
+    '10.0.0.1 - - [01/Mar/2014:10:00:00] "GET /static/site.css HTTP/1.1" 200 512 "-" "Mozilla/5.0"\n',
+    '10.0.0.2 - - [01/Mar/2014:10:00:01] "GET /openurl?%s HTTP/1.1" 200 2048 "-" "Mozilla/5.0"\n' % ARTICLE,
+    '10.0.0.3 - - [01/Mar/2014:10:00:02] "GET /search?q=subgenre%3Djazz HTTP/1.1" 200 99\n',
+    'http://resolver.example.edu/sfx?%s\r\n' % BOOK,
+    '\n',
+    DISSERTATION,
+])
+
+class TestScanBuffer(unittest.TestCase):
+
+    def test_offsets(self):
+        found = [LOG[s:e] for s, e in scan.scan_buffer(LOG)]
+        self.assertEqual(found, [ARTICLE, BOOK, DISSERTATION])
+
+    def test_marker_must_start_a_parameter(self):
+        self.assertEqual(list(scan.scan_buffer('q=subgenre=jazz&xrft.au=x\n')), [])
+
+    def test_custom_markers(self):
+        found = [LOG[s:e] for s, e in scan.scan_buffer(LOG, markers=['sid='])]
+        self.assertEqual(found, [ARTICLE])
+
+
+class TestLogScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp, name)
+        if name.endswith('.gz'):
+            handle = gzip.open(path, 'wb')
+        else:
+            handle = open(path, 'wb')
+        handle.write(data)
+        handle.close()
+        return path
+
+    def test_plain(self):
+        scanner = LogScanner()
+        path = self.write('access.log', LOG)
+        queries = list(scanner.queries([path]))
+        self.assertEqual(queries, [ARTICLE, BOOK, DISSERTATION])
+        self.assertEqual(set(type(q) for q in queries), set([str]))
+        self.assertEqual(scanner.bytes_scanned, len(LOG))
+        self.assertEqual(scanner.lines_matched, 3)
+        self.assertTrue('MB/sec' in scanner.report())
+
+    def test_gzip_matches_plain(self):
+        #A small block size splits lines across reads.
+        scanner = LogScanner(block_size=7)
+        path = self.write('access.log.gz', (LOG + '\n') * 3)
+        self.assertEqual(list(scanner.queries([path])), [ARTICLE, BOOK, DISSERTATION] * 3)
+        self.assertEqual(scanner.bytes_scanned, (len(LOG) + 1) * 3)
+
+    def test_empty_file(self):
+        scanner = LogScanner()
+        paths = [self.write('empty.log', ''), self.write('access.log', LOG)]
+        self.assertEqual(len(list(scanner.queries(paths))), 3)
+
+    def test_parse(self):
+        path = self.write('access.log', LOG)
+        bibs = list(LogScanner().parse([path], openurl=False))
+        self.assertEqual(bibs, [from_openurl(q, openurl=False)
+                                for q in (ARTICLE, BOOK, DISSERTATION)])
+
+
+def suite():
+    suite1 = unittest.makeSuite(TestScanBuffer, 'test')
+    suite2 = unittest.makeSuite(TestLogScanner, 'test')
+    return unittest.TestSuite((suite1, suite2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#Slow or optional modules each import must not pull in.
+HEAVY = ('urllib', 'socket', 'ssl', 'numpy', 'multiprocessing', 'sqlite3',
+         'hashlib', 'mmap', 'asyncio')
+
+def imported_by(statement):
+    """
+    Modules a statement imports in a fresh interpreter.
+    """
+    code = ('import sys; before = set(k for k, v in sys.modules.items() if v)\n'
+            '%s\n'
+            'print " ".join(k for k, v in sys.modules.items() if v and k not in before)'
+            % statement)
+    proc = subprocess.Popen([sys.executable, '-c', code], cwd=ROOT, stdout=subprocess.PIPE)
+    return set(proc.communicate()[0].split())
+
+class TestStartup(unittest.TestCase):
+
+    def assertLight(self, statement):
+        heavy = imported_by(statement) & set(HEAVY)
+        self.assertEqual(heavy, set(), '%r imports %s' % (statement, ', '.join(sorted(heavy))))
+
+    def test_package_is_lazy(self):
+        self.assertEqual(imported_by('import bibjsontools'), set(['bibjsontools']))
+
+    def test_exports_load_on_use(self):
+        loaded = imported_by('import bibjsontools; bibjsontools.from_openurl')
+        self.assertTrue('bibjsontools.openurl' in loaded)
+        self.assertFalse('bibjsontools.ris' in loaded)
+        self.assertTrue('bibjsontools.ris' in imported_by('from bibjsontools import ris'))
+
+    def test_no_heavy_imports(self):
+        for module in ('openurl', 'ris', 'cli', 'columns', 'normalize', 'record', 'index'):
+            self.assertLight('import bibjsontools.%s' % module)
+
+
+class TestLazyPackage(unittest.TestCase):
+
+    def test_exports(self):
+        import bibjsontools
+        from bibjsontools import openurl
+        self.assertTrue(bibjsontools.from_openurl is openurl.from_openurl)
+        #Every public openurl name is still reachable from the package.
+        self.assertTrue(bibjsontools.REQUIRED_KEYS is openurl.REQUIRED_KEYS)
+        self.assertRaises(AttributeError, getattr, bibjsontools, 'no_such_name')
+        self.assertRaises(AttributeError, getattr, bibjsontools, '_private')
+        self.assertTrue('ris' in dir(bibjsontools))
+
+    def test_star_import(self):
+        from bibjsontools import openurl
+        names = {}
+        exec 'from bibjsontools import *' in names
+        for name in ('from_openurl', 'LazyBibJSON', 'REQUIRED_KEYS', 'KEY_ALIASES',
+                     'classify_identifier'):
+            self.assertTrue(names[name] is getattr(openurl, name))
+        self.assertFalse('re' in names)
+
+    def test_star_import_loads_openurl_only(self):
+        loaded = imported_by('from bibjsontools import *')
+        self.assertTrue('bibjsontools.openurl' in loaded)
+        self.assertFalse('bibjsontools.ris' in loaded)
+
+
+def suite():
+    suite1 = unittest.makeSuite(TestStartup, 'test')
+    suite2 = unittest.makeSuite(TestLazyPackage, 'test')
+    return unittest.TestSuite((suite1, suite2))
+
+if __name__ == '__main__':
+    unittest.main()